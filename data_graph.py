@@ -0,0 +1,111 @@
+"""
+Which views and derived values a change to the data affects.
+
+Every view (a tab's table, the calendar shading, a chart) and every derived
+value (a day's totals, the recommender index) is a node that names what it
+reads: worksheets, other nodes, or plain inputs such as the selected date. A
+node can read a source only for some keys, e.g. the Meal_Plan rows of one day
+or the recipes planned on it, so a change elsewhere leaves it alone.
+
+A change is reported with ``invalidate(source, keys)``. Nothing is recomputed
+then: the nodes reading those keys, and the nodes reading them, are marked
+dirty along with what changed. Derived values are recomputed when next read,
+and dirty views are redrawn by ``flush``, which the GUI schedules once per
+event-loop turn however many changes arrive in it (a rename touches three
+sheets but redraws each view once). A view that is not on screen stays dirty
+until a flush finds it shown.
+"""
+
+# Keys of a change or subscription meaning "any row"
+ALL = None
+
+class Node:
+    __slots__ = ("name", "compute", "reads", "active", "is_view", "dirty", "changes", "value")
+
+    def __init__(self, name, compute, reads, active, is_view):
+        self.name = name
+        self.compute = compute
+        self.reads = reads
+        self.active = active
+        self.is_view = is_view
+        # Derived values are computed on first read; views wait for a change to draw
+        self.dirty = not is_view
+        # {source: keys changed, or ALL} since the node last ran; None when everything is new
+        self.changes = None if not is_view else {}
+        self.value = None
+
+class DataGraph:
+    """Dependency graph of views and derived values over worksheets and inputs.
+
+    ``schedule(flush)`` should arrange for ``flush`` to run soon (e.g. on the next
+    turn of the event loop); without it views are redrawn as soon as they are
+    invalidated.
+    """
+
+    def __init__(self, schedule=None):
+        self.schedule = schedule
+        self.nodes = {}
+        self.readers = {}
+        self.flush_scheduled = False
+
+    def derived(self, name, compute, reads):
+        """Add a value, compute(changes), recomputed when read after something in ``reads`` changed.
+
+        ``reads`` maps each source (sheet, input or node name) to ALL or to a
+        function returning the keys of it the node depends on right now, as any
+        container (a range of day numbers is fine).
+        """
+        self._add(Node(name, compute, reads, None, False))
+
+    def view(self, name, render, reads, active=None):
+        """Add a view, render(changes), redrawn by ``flush`` while ``active()`` says it is shown"""
+        self._add(Node(name, render, reads, active, True))
+
+    def _add(self, node):
+        self.nodes[node.name] = node
+        for source in node.reads:
+            self.readers.setdefault(source, []).append(node)
+
+    def value(self, name):
+        node = self.nodes[name]
+        if node.dirty:
+            changes, node.changes, node.dirty = node.changes, {}, False
+            node.value = node.compute(changes)
+        return node.value
+
+    def invalidate(self, source, keys=ALL):
+        """Mark the nodes that read ``keys`` of ``source`` (any of them when ALL) as out of date"""
+        keys = None if keys is ALL else set(keys)
+        for node in self.readers.get(source, []):
+            wanted = node.reads[source]
+            if keys is None or wanted is ALL or self._wants(wanted(), keys):
+                self._mark(node, source, keys)
+        if not self.flush_scheduled and any(node.is_view and node.dirty for node in self.nodes.values()):
+            if self.schedule is None:
+                self.flush()
+            else:
+                self.flush_scheduled = True
+                self.schedule(self.flush)
+
+    @staticmethod
+    def _wants(wanted, keys):
+        return any(key in wanted for key in keys)
+
+    def _mark(self, node, source, keys):
+        if node.changes is not None:
+            known = node.changes.get(source, set())
+            node.changes[source] = None if keys is None or known is None else known | keys
+        node.dirty = True
+        for reader in self.readers.get(node.name, []):
+            self._mark(reader, node.name, None)
+
+    def flush(self):
+        """Redraw the dirty views that are shown, in the order they were added"""
+        self.flush_scheduled = False
+        for node in list(self.nodes.values()):
+            if node.is_view and node.dirty and (node.active is None or node.active()):
+                changes, node.changes, node.dirty = node.changes, {}, False
+                try:
+                    node.compute(changes)
+                except Exception as e:
+                    print(f"Error updating {node.name}: {e}")
@@ -0,0 +1,141 @@
+"""
+Read-only binary store of reference foods (e.g. a national food composition table).
+
+Large catalogs do not belong in the Ingredients sheet: downloading and parsing
+tens of thousands of rows on every dialog open costs seconds and hundreds of MB.
+A store file is built once with ``meal_prep_cli.py build-food-db`` and opened
+with mmap, so only the pages a lookup touches are ever read:
+
+    header        magic, food count, nutrient count and section offsets
+    metadata      JSON with the nutrient column names
+    nutrients     float64 array, one fixed-width row per food id
+    name offsets  uint64 start of each name in the names section (count + 1)
+    order         uint32 food ids sorted by case-folded name
+    names         UTF-8 names, concatenated
+
+Values are per 100g, like the Ingredients sheet. The user's own ingredients
+stay in Sheets and take precedence over reference foods of the same name.
+"""
+
+import os
+import json
+import mmap
+import struct
+import bisect
+import numpy as np
+
+FOOD_STORE_FILE = "food_database.nfdb"
+
+MAGIC = b"NUTRDB01"
+HEADER = struct.Struct("<8sIIQQQQQQ")
+ALIGNMENT = 8
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+class FoodStore:
+    """Memory-mapped reference food store; food ids are row numbers in the file"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, count, nutrient_count, meta_offset, meta_length, nutrients_offset,
+         name_offsets_offset, order_offset, self.names_offset) = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            self.mm.close()
+            raise ValueError(f"{path} is not a food database file")
+
+        self.count = count
+        self.nutrients = json.loads(self.mm[meta_offset:meta_offset + meta_length])["nutrients"]
+        self.values = np.frombuffer(self.mm, dtype="<f8", count=count * nutrient_count,
+                                    offset=nutrients_offset).reshape(count, nutrient_count)
+        self.name_offsets = np.frombuffer(self.mm, dtype="<u8", count=count + 1, offset=name_offsets_offset)
+        self.order = np.frombuffer(self.mm, dtype="<u4", count=count, offset=order_offset)
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        # The arrays are views into the map and must go before it can be closed
+        self.values = self.name_offsets = self.order = None
+        self.mm.close()
+
+    def name(self, food_id):
+        start = self.names_offset + int(self.name_offsets[food_id])
+        end = self.names_offset + int(self.name_offsets[food_id + 1])
+        return self.mm[start:end].decode("utf-8")
+
+    def _folded_name_at(self, position):
+        return self.name(int(self.order[position])).casefold()
+
+    def lookup(self, name):
+        """Food id for a name (case-insensitive), or None"""
+        folded = name.casefold()
+        position = bisect.bisect_left(range(self.count), folded, key=self._folded_name_at)
+        if position < self.count and self._folded_name_at(position) == folded:
+            return int(self.order[position])
+        return None
+
+    def search(self, prefix, limit=200):
+        """Names of foods starting with ``prefix`` (case-insensitive), in name order"""
+        folded = prefix.casefold()
+        position = bisect.bisect_left(range(self.count), folded, key=self._folded_name_at)
+        names = []
+        while position < self.count and len(names) < limit:
+            name = self.name(int(self.order[position]))
+            if not name.casefold().startswith(folded):
+                break
+            names.append(name)
+            position += 1
+        return names
+
+    def macros(self, food_id):
+        """Nutrient values of a food per 100g, in ``self.nutrients`` order"""
+        return np.array(self.values[food_id])
+
+def build_food_store(path, foods, nutrients):
+    """Write a store file from (name, values) pairs; later duplicates of a name are dropped"""
+    names, rows, seen = [], [], set()
+    for name, values in foods:
+        name = str(name).strip()
+        if not name or name.casefold() in seen:
+            continue
+        seen.add(name.casefold())
+        names.append(name)
+        rows.append(values)
+
+    count = len(names)
+    meta = json.dumps({"nutrients": list(nutrients)}).encode()
+    values = np.asarray(rows, dtype="<f8").reshape(count, len(nutrients))
+    encoded = [name.encode("utf-8") for name in names]
+    name_offsets = np.zeros(count + 1, dtype="<u8")
+    np.cumsum([len(name) for name in encoded], out=name_offsets[1:])
+    order = np.array(sorted(range(count), key=lambda i: names[i].casefold()), dtype="<u4")
+
+    meta_offset = HEADER.size
+    nutrients_offset = _aligned(meta_offset + len(meta))
+    name_offsets_offset = _aligned(nutrients_offset + values.nbytes)
+    order_offset = _aligned(name_offsets_offset + name_offsets.nbytes)
+    names_offset = _aligned(order_offset + order.nbytes)
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, count, len(nutrients), meta_offset, len(meta), nutrients_offset,
+                            name_offsets_offset, order_offset, names_offset))
+        for offset, data in ((meta_offset, meta), (nutrients_offset, values.tobytes()),
+                             (name_offsets_offset, name_offsets.tobytes()), (order_offset, order.tobytes()),
+                             (names_offset, b"".join(encoded))):
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(data)
+    return count
+
+def open_food_store(path=FOOD_STORE_FILE):
+    """The reference food store if one has been built, otherwise None"""
+    if not os.path.exists(path):
+        return None
+    try:
+        return FoodStore(path)
+    except (OSError, ValueError) as e:
+        print(f"Error opening food database {path}: {e}")
+        return None
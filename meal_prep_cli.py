@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+"""
+meal-prep - command line interface for the Nutrition Meal Planner
+
+Runs reports and batch jobs against the Google Sheets database without
+starting the GUI (no PySide6 or matplotlib is imported), e.g. from cron:
+
+    python3 meal_prep_cli.py report --from 2024-01-01 --to 2024-01-31
+    python3 meal_prep_cli.py recompute-recipes
+    python3 meal_prep_cli.py export --output backup.json
+    python3 meal_prep_cli.py import Ingredients foods.csv
+    python3 meal_prep_cli.py serve --port 8765
+    python3 meal_prep_cli.py stamp-versions
+    python3 meal_prep_cli.py archive --months 3
+    python3 meal_prep_cli.py build-food-db foods.csv
+    python3 meal_prep_cli.py add-nutrient "Fiber (g)"
+    python3 meal_prep_cli.py formula-totals
+    python3 meal_prep_cli.py benchmark-totals Rice --repeat 5
+    python3 meal_prep_cli.py render-report --from 2024-01-01 --to 2024-12-31 --output 2024.pdf
+    python3 meal_prep_cli.py copy-meals --from 2024-01-01 --to 2024-01-07 --target 2024-01-08 --repeat 3
+    python3 meal_prep_cli.py apply-template "Cutting week" --target 2024-02-05
+"""
+
+import sys
+import csv
+import json
+import argparse
+import math
+import os
+import statistics
+import time
+from datetime import date
+
+from nutrition_core import (GoogleSheetsManager, SHEET_NAMES, INGREDIENT_NUTRITION_KEYS,
+                            DEFAULT_ARCHIVE_MONTHS, IntegrityError, archive_cutoff, daily_totals, recompute_recipe_nutrition,
+                            meals_between, template_meals, repeat_meals, new_version, sheet_range)
+from nutrition_tables import parse_float, display_value, table_type
+from food_store import FOOD_STORE_FILE, build_food_store, open_food_store
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {number}")
+    return number
+
+def connect(args):
+    sheets_manager = GoogleSheetsManager(args.credentials)
+    if not sheets_manager.spreadsheet:
+        sys.exit("Could not connect to Google Sheets")
+    return sheets_manager
+
+def cmd_report(args):
+    if args.end < args.start:
+        sys.exit("--to must not be before --from")
+
+    sheets_manager = connect(args)
+    tables = sheets_manager.get_tables_batch(sheets_manager.meal_plan_sheets(args.start, args.end) + ["Recipes"])
+    totals = daily_totals(sheets_manager.get_meal_plan(args.start, args.end), tables["Recipes"], args.start, args.end)
+    rows = [[date_str] + [round(value, 1) for value in values] for date_str, values in totals.items()]
+    report_columns = ["Date"] + tables["Recipes"].nutrients
+
+    if args.format == "json":
+        json.dump([dict(zip(report_columns, row)) for row in rows], sys.stdout, indent=2)
+        print()
+    elif args.format == "csv":
+        writer = csv.writer(sys.stdout)
+        writer.writerow(report_columns)
+        writer.writerows(rows)
+    else:
+        print("".join(f"{column:>18}" for column in report_columns))
+        for row in rows:
+            print(f"{row[0]:>18}" + "".join(f"{value:>18.1f}" for value in row[1:]))
+        averages = [sum(row[i] for row in rows) / len(rows) for i in range(1, len(report_columns))]
+        print(f"{'Average':>18}" + "".join(f"{value:>18.1f}" for value in averages))
+    return 0
+
+def cmd_render_report(args):
+    if args.end < args.start:
+        sys.exit("--to must not be before --from")
+
+    from report_renderer import render_report
+    sheets_manager = connect(args)
+    tables = sheets_manager.get_tables_batch(sheets_manager.meal_plan_sheets(args.start, args.end) + ["Recipes"])
+    paths = render_report(sheets_manager.get_meal_plan(args.start, args.end), tables["Recipes"], args.start, args.end,
+                          args.output, title=args.title, dpi=args.dpi, workers=args.workers)
+    print(f"Wrote {', '.join(paths) if len(paths) == 1 else f'{len(paths)} pages to {args.output}'}")
+    return 0
+
+def cmd_recompute_recipes(args):
+    sheets_manager = connect(args)
+    tables = sheets_manager.get_tables_batch(["Recipes", "Recipe_Ingredients", "Ingredients"])
+    updates = recompute_recipe_nutrition(
+        tables["Recipes"],
+        tables["Recipe_Ingredients"],
+        tables["Ingredients"],
+        recipe_names=set(args.recipe) if args.recipe else None,
+        food_store=open_food_store(args.food_db)
+    )
+
+    recipes = tables["Recipes"]
+    # Sheets keeps formula totals up to date by itself
+    formula_totals = recipes.formula_totals
+    computed = [row for row in updates if formula_totals[row - 2]]
+    for row in computed:
+        del updates[row]
+    if computed:
+        print(f"{len(computed)} recipes have formula totals and are left to Sheets")
+    for row in updates.values():
+        print(f"{row[0]}: " + ", ".join(f"{column} {value}" for column, value in zip(recipes.header, row)
+                                        if column in recipes.nutrient_columns))
+    if not updates:
+        print("All recipe totals are up to date")
+        return 0
+    if args.dry_run:
+        print(f"{len(updates)} recipes would be updated")
+        return 0
+    if not sheets_manager.update_rows("Recipes", updates):
+        return 1
+    print(f"{len(updates)} recipes updated")
+    return 0
+
+def cmd_export(args):
+    sheets_manager = connect(args)
+    sheet_names = args.sheet or SHEET_NAMES
+    tables = sheets_manager.get_tables_batch(sheet_names)
+    data = {sheet_name: table.to_records() for sheet_name, table in tables.items()}
+
+    if args.format == "json":
+        with open(args.output, "w") as f:
+            json.dump(data, f, indent=2)
+        print(f"Exported {len(sheet_names)} sheets to {args.output}")
+        return 0
+
+    # CSV: one file per sheet inside the output directory
+    os.makedirs(args.output, exist_ok=True)
+    for sheet_name, records in data.items():
+        header = tables[sheet_name].header
+        path = os.path.join(args.output, f"{sheet_name}.csv")
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows([record.get(column, "") for column in header] for record in records)
+        print(f"Exported {len(records)} rows to {path}")
+    return 0
+
+def import_value(table, column, value):
+    """A CSV or JSON value as it should be stored: numeric columns as numbers when they parse"""
+    if table.is_number_column(column) and str(value).strip():
+        number = parse_float(value)
+        if math.isfinite(number):
+            return display_value(number)
+    return value
+
+def cmd_import(args):
+    if args.input.endswith(".json"):
+        with open(args.input) as f:
+            records = json.load(f)
+        if isinstance(records, dict):
+            records = records.get(args.sheet, [])
+    else:
+        with open(args.input, newline="") as f:
+            records = list(csv.DictReader(f))
+
+    sheets_manager = connect(args)
+    header = sheets_manager.get_header(args.sheet)
+    if not header:
+        sys.exit(f"Worksheet {args.sheet} not found or has no header row")
+
+    # Numbers go in as numbers (RAW would keep CSV text as text, which formula totals skip),
+    # and every row gets a version stamp so edits from the application can compare-and-set it
+    table = table_type(args.sheet).from_values([header])
+    rows = [table.stamped([import_value(table, column, record.get(column, "")) for column in header], new_version())
+            for record in records]
+    if not rows:
+        print("Nothing to import")
+        return 0
+    if not sheets_manager.add_rows(args.sheet, rows):
+        return 1
+    print(f"Imported {len(rows)} rows into {args.sheet}")
+    return 0
+
+def cmd_stamp_versions(args):
+    sheets_manager = connect(args)
+    for sheet_name in args.sheet or SHEET_NAMES:
+        try:
+            count = sheets_manager.stamp_versions(sheet_name)
+        except Exception as e:
+            print(f"Error stamping {sheet_name}: {e}")
+            return 1
+        print(f"{sheet_name}: {count} rows stamped")
+    return 0
+
+def cmd_archive(args):
+    cutoff = archive_cutoff(date.today(), args.months)
+    sheets_manager = connect(args)
+    try:
+        moved = sheets_manager.archive_meal_plan(cutoff, dry_run=args.dry_run)
+    except Exception as e:
+        print(f"Error archiving meals: {e}")
+        return 1
+    for year, count in sorted(moved.items()):
+        print(f"Meal_Plan_{year}: {count} meals")
+    verb = "would be archived" if args.dry_run else "archived"
+    print(f"{sum(moved.values())} meals before {cutoff} {verb}")
+    return 0
+
+def cmd_build_food_db(args):
+    # "Source column=Ingredients header" pairs; plain source columns stand for the default nutrients in order
+    entries = args.nutrient_columns.split(",") if args.nutrient_columns else INGREDIENT_NUTRITION_KEYS
+    source_columns, nutrient_columns = [], []
+    for i, entry in enumerate(entries):
+        source, _, target = entry.partition("=")
+        if not target and i >= len(INGREDIENT_NUTRITION_KEYS):
+            sys.exit(f"--nutrient-columns: give the Ingredients column for {source!r} as {source}=<column>")
+        source_columns.append(source.strip())
+        nutrient_columns.append(target.strip() or INGREDIENT_NUTRITION_KEYS[i])
+    with open(args.input, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        missing = [column for column in [args.name_column] + source_columns if column not in (reader.fieldnames or [])]
+        if missing:
+            sys.exit(f"Columns not found in {args.input}: {', '.join(missing)}")
+        foods = ((row[args.name_column], [parse_float(row[column]) for column in source_columns]) for row in reader)
+        # Stored under the Ingredients sheet headers whatever the source calls them
+        count = build_food_store(args.output, foods, nutrient_columns)
+    print(f"Wrote {count} foods to {args.output}")
+    return 0
+
+def cmd_add_nutrient(args):
+    sheets_manager = connect(args)
+    try:
+        added = sheets_manager.add_nutrient(args.nutrient)
+    except Exception as e:
+        print(f"Error adding nutrient: {e}")
+        return 1
+    for column in added:
+        print(f"Added column {column}")
+    if not added:
+        print(f"{args.nutrient} is already tracked")
+    return 0
+
+def cmd_formula_totals(args):
+    sheets_manager = connect(args)
+    try:
+        if args.remove:
+            count = sheets_manager.remove_formula_totals()
+        else:
+            count = sheets_manager.install_formula_totals(set(args.recipe) if args.recipe else None)
+    except Exception as e:
+        print(f"Error changing recipe totals: {e}")
+        return 1
+    if args.remove:
+        print(f"{count} recipes switched back to stored totals")
+    else:
+        print(f"{count} recipes now have their totals computed by Sheets")
+    return 0
+
+def cmd_benchmark_totals(args):
+    """Round trips, bytes and time for an ingredient edit to reach its recipes' totals,
+    computed by this client (download, recompute, write back) or by Sheets formulas
+    (write the ingredient, read the totals back)"""
+    sheets_manager = connect(args)
+    tables = sheets_manager.get_tables_batch(["Recipes", "Recipe_Ingredients", "Ingredients"])
+    ingredients, recipes, lines = tables["Ingredients"], tables["Recipes"], tables["Recipe_Ingredients"]
+    if args.ingredient not in ingredients.index:
+        sys.exit(f"No ingredient named {args.ingredient!r}")
+    ingredient_row = ingredients.index[args.ingredient]
+    # The benchmark saves the ingredient unchanged, so the sheet ends as it started
+    ingredient_update = {ingredient_row + 2: ingredients.rows()[ingredient_row]}
+    recipe_names = {lines.recipe[row] for row in lines.rows_with("Ingredient Name", args.ingredient)}
+    recipe_rows = sorted(recipes.index[name] for name in recipe_names if name in recipes.index)
+    if not recipe_rows:
+        sys.exit(f"No recipe uses {args.ingredient!r}")
+
+    def client_side():
+        sheets_manager.update_rows("Ingredients", ingredient_update)
+        fresh = sheets_manager.get_tables_batch(["Recipes", "Recipe_Ingredients", "Ingredients"])
+        rows = fresh["Recipes"].rows()
+        # Written back whether or not they changed, as after an edit that changed them
+        updates = {row + 2: rows[row] for row in recipe_rows}
+        updates.update(recompute_recipe_nutrition(fresh["Recipes"], fresh["Recipe_Ingredients"], fresh["Ingredients"], recipe_names))
+        sheets_manager.update_rows("Recipes", updates)
+
+    def sheet_side():
+        sheets_manager.update_rows("Ingredients", ingredient_update)
+        sheets_manager.spreadsheet.values_batch_get([sheet_range("Recipes", f"{row + 2}:{row + 2}") for row in recipe_rows])
+
+    from sheets_transport import RequestCounter
+    session = sheets_manager.gc.http_client.session
+    print(f"{args.ingredient} is used by {len(recipe_rows)} recipes; {len(recipes)} recipes, "
+          f"{len(lines)} ingredient lines, {len(ingredients)} ingredients")
+    print(f"{'path':<20}{'requests':>10}{'received':>14}{'seconds':>10}")
+    for name, path in [("client-side", client_side), ("sheet formulas", sheet_side)]:
+        runs = []
+        for run in range(1, args.repeat + 1):
+            with RequestCounter(session) as counter:
+                start = time.perf_counter()
+                path()
+                seconds = time.perf_counter() - start
+            runs.append((counter.requests, counter.received / 1024, seconds))
+            print(f"{f'{name} #{run}':<20}{runs[-1][0]:>10}{runs[-1][1]:>11.1f} kB{seconds:>10.2f}")
+        requests, received, seconds = (statistics.median(column) for column in zip(*runs))
+        print(f"{f'{name} median':<20}{requests:>10g}{received:>11.1f} kB{seconds:>10.2f}")
+    formula_recipes = int(recipes.formula_totals[recipe_rows].sum())
+    if formula_recipes < len(recipe_rows):
+        print(f"Only {formula_recipes} of these recipes have formula totals; run formula-totals for the sheet path to update them")
+    return 0
+
+def add_planned_meals(sheets_manager, rows, dry_run):
+    """Append copied meals to Meal_Plan with a single request (or only list them)"""
+    if dry_run:
+        for row in rows:
+            print("  ".join(str(cell) for cell in row))
+        print(f"{len(rows)} meals would be added")
+        return 0
+    meal_plan = sheets_manager.get_table("Meal_Plan")
+    if rows and not sheets_manager.add_rows("Meal_Plan", [meal_plan.stamped(row, new_version()) for row in rows]):
+        return 1
+    print(f"{len(rows)} meals added")
+    return 0
+
+def cmd_copy_meals(args):
+    end = args.end or args.start
+    if end < args.start:
+        sys.exit("--to must not be before --from")
+    sheets_manager = connect(args)
+    sheets_manager.get_tables_batch(sheets_manager.meal_plan_sheets(args.start, end))
+    meals = meals_between(sheets_manager.get_meal_plan(args.start, end), args.start, end)
+    rows = repeat_meals(meals, (end - args.start).days + 1, args.target, args.repeat, args.scale)
+    return add_planned_meals(sheets_manager, rows, args.dry_run)
+
+def cmd_save_template(args):
+    end = args.end or args.start
+    if end < args.start:
+        sys.exit("--to must not be before --from")
+    sheets_manager = connect(args)
+    sheets_manager.get_tables_batch(sheets_manager.meal_plan_sheets(args.start, end))
+    meals = meals_between(sheets_manager.get_meal_plan(args.start, end), args.start, end)
+    if not meals:
+        sys.exit(f"No meals planned from {args.start} to {end}")
+    try:
+        sheets_manager.save_template(args.name, meals, (end - args.start).days + 1)
+    except IntegrityError as e:
+        sys.exit(str(e))
+    except Exception as e:
+        print(f"Error saving template: {e}")
+        return 1
+    print(f"Saved {len(meals)} meals as template '{args.name}'")
+    return 0
+
+def cmd_apply_template(args):
+    sheets_manager = connect(args)
+    templates = sheets_manager.get_templates()
+    if args.name not in templates.names:
+        sys.exit(f"No template named '{args.name}'. Templates: {', '.join(templates.names) or 'none'}")
+    meals, length = template_meals(templates, args.name)
+    return add_planned_meals(sheets_manager, repeat_meals(meals, length, args.target, args.repeat, args.scale), args.dry_run)
+
+def cmd_delete_template(args):
+    sheets_manager = connect(args)
+    try:
+        count = sheets_manager.delete_template(args.name)
+    except Exception as e:
+        print(f"Error deleting template: {e}")
+        return 1
+    print(f"Deleted template '{args.name}'" if count else f"No template named '{args.name}'")
+    return 0
+
+def cmd_serve(args):
+    from meal_prep_server import serve
+    serve(connect(args), host=args.host, port=args.port, refresh_interval=args.refresh, verbose=args.verbose)
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="meal-prep", description="Nutrition Meal Planner command line tools")
+    parser.add_argument("--credentials", default="service_account_key.json",
+                        help="service account key file (default: %(default)s)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    report = subparsers.add_parser("report", help="daily nutrition totals over a date range")
+    report.add_argument("--from", dest="start", type=date.fromisoformat, default=date.today(), help="first day (YYYY-MM-DD)")
+    report.add_argument("--to", dest="end", type=date.fromisoformat, default=date.today(), help="last day (YYYY-MM-DD)")
+    report.add_argument("--format", choices=["table", "csv", "json"], default="table")
+    report.set_defaults(func=cmd_report)
+
+    render = subparsers.add_parser("render-report", help="render a PDF or PNG nutrition report for a date range")
+    render.add_argument("--from", dest="start", type=date.fromisoformat, required=True, help="first day (YYYY-MM-DD)")
+    render.add_argument("--to", dest="end", type=date.fromisoformat, required=True, help="last day (YYYY-MM-DD)")
+    render.add_argument("--output", required=True, help="PDF file, or directory for one PNG per page")
+    render.add_argument("--title", default="Nutrition Report")
+    render.add_argument("--dpi", type=int, default=100)
+    render.add_argument("--workers", type=int, help="rendering processes (default: one per CPU)")
+    render.set_defaults(func=cmd_render_report)
+
+    recompute = subparsers.add_parser("recompute-recipes", help="recalculate recipe totals from their ingredients")
+    recompute.add_argument("--recipe", action="append", help="only this recipe (repeatable)")
+    recompute.add_argument("--dry-run", action="store_true", help="show changes without writing them")
+    recompute.add_argument("--food-db", default=FOOD_STORE_FILE, help="reference food database (default: %(default)s, if present)")
+    recompute.set_defaults(func=cmd_recompute_recipes)
+
+    export = subparsers.add_parser("export", help="export worksheets to JSON or CSV")
+    export.add_argument("--output", required=True, help="JSON file, or directory for CSV files")
+    export.add_argument("--sheet", action="append", choices=SHEET_NAMES, help="only this sheet (repeatable)")
+    export.add_argument("--format", choices=["json", "csv"], default="json")
+    export.set_defaults(func=cmd_export)
+
+    import_ = subparsers.add_parser("import", help="append rows from a CSV or JSON file to a worksheet")
+    import_.add_argument("sheet", choices=SHEET_NAMES)
+    import_.add_argument("input", help="CSV file with a header row, or JSON list of records")
+    import_.set_defaults(func=cmd_import)
+
+    stamp = subparsers.add_parser("stamp-versions",
+                                  help="add the Version column used to detect conflicting edits from several devices")
+    stamp.add_argument("--sheet", action="append", choices=SHEET_NAMES, help="only this sheet (repeatable)")
+    stamp.set_defaults(func=cmd_stamp_versions)
+
+    archive = subparsers.add_parser("archive", help="move old meals from Meal_Plan into yearly archive sheets")
+    archive.add_argument("--months", type=int, default=DEFAULT_ARCHIVE_MONTHS,
+                         help="keep this many whole months before the current one in Meal_Plan (default: %(default)s)")
+    archive.add_argument("--dry-run", action="store_true", help="only count the meals that would move")
+    archive.set_defaults(func=cmd_archive)
+
+    food_db = subparsers.add_parser("build-food-db", help="build the reference food database from a CSV food table")
+    food_db.add_argument("input", help="CSV file with one food per row, nutrient values per 100g")
+    food_db.add_argument("--output", default=FOOD_STORE_FILE, help="database file (default: %(default)s)")
+    food_db.add_argument("--name-column", default="Ingredient Name", help="column holding the food name")
+    food_db.add_argument("--nutrient-columns", help="comma separated calories, protein, carbohydrate and fat columns, "
+                                                    "then any others as 'Source column=Ingredients column' "
+                                                    "(default: the Ingredients sheet headers)")
+    food_db.set_defaults(func=cmd_build_food_db)
+
+    nutrient = subparsers.add_parser("add-nutrient", help="track another nutrient by adding its Ingredients and Recipes columns")
+    nutrient.add_argument("nutrient", help='nutrient and unit, e.g. "Fiber (g)" or "Sodium (mg)"')
+    nutrient.set_defaults(func=cmd_add_nutrient)
+
+    formulas = subparsers.add_parser("formula-totals",
+                                     help="have Sheets compute recipe totals from their ingredients with formulas")
+    formulas.add_argument("--recipe", action="append", help="only this recipe (repeatable)")
+    formulas.add_argument("--remove", action="store_true", help="turn every formula total back into a stored number")
+    formulas.set_defaults(func=cmd_formula_totals)
+
+    benchmark = subparsers.add_parser("benchmark-totals",
+                                      help="compare round trips of client-side and formula recipe totals for an ingredient edit")
+    benchmark.add_argument("ingredient", help="ingredient to save unchanged; at least one recipe must use it")
+    benchmark.add_argument("--repeat", type=positive_int, default=3, help="runs of each path, median time shown (default: %(default)s)")
+    benchmark.set_defaults(func=cmd_benchmark_totals)
+
+    copy = subparsers.add_parser("copy-meals", help="copy the meals of a day or week to other dates in one request")
+    copy.add_argument("--from", dest="start", type=date.fromisoformat, required=True, help="first day to copy (YYYY-MM-DD)")
+    copy.add_argument("--to", dest="end", type=date.fromisoformat, help="last day to copy (default: --from)")
+    copy.add_argument("--target", type=date.fromisoformat, required=True, help="day the first copy starts")
+    copy.add_argument("--repeat", type=int, default=1, help="number of copies, back to back (default: %(default)s)")
+    copy.add_argument("--scale", type=float, default=1.0, help="multiply every portion by this (default: %(default)s)")
+    copy.add_argument("--dry-run", action="store_true", help="list the meals without adding them")
+    copy.set_defaults(func=cmd_copy_meals)
+
+    save_template = subparsers.add_parser("save-template", help="save the meals of a date range as a named template")
+    save_template.add_argument("name")
+    save_template.add_argument("--from", dest="start", type=date.fromisoformat, required=True, help="first day (YYYY-MM-DD)")
+    save_template.add_argument("--to", dest="end", type=date.fromisoformat, help="last day (default: --from)")
+    save_template.set_defaults(func=cmd_save_template)
+
+    apply_template = subparsers.add_parser("apply-template", help="add the meals of a saved template from a date")
+    apply_template.add_argument("name")
+    apply_template.add_argument("--target", type=date.fromisoformat, required=True, help="day the template starts")
+    apply_template.add_argument("--repeat", type=int, default=1, help="number of copies, back to back (default: %(default)s)")
+    apply_template.add_argument("--scale", type=float, default=1.0, help="multiply every portion by this (default: %(default)s)")
+    apply_template.add_argument("--dry-run", action="store_true", help="list the meals without adding them")
+    apply_template.set_defaults(func=cmd_apply_template)
+
+    delete_template = subparsers.add_parser("delete-template", help="delete a saved template")
+    delete_template.add_argument("name")
+    delete_template.set_defaults(func=cmd_delete_template)
+
+    serve = subparsers.add_parser("serve", help="read-only JSON API over a shared cache of the sheets")
+    serve.add_argument("--host", default="127.0.0.1", help="address to bind (use 0.0.0.0 for other devices)")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--refresh", type=float, default=60, help="seconds between Sheets refreshes (default: %(default)s)")
+    serve.add_argument("--verbose", action="store_true", help="log every request")
+    serve.set_defaults(func=cmd_serve)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""
+Read-only local HTTP API for the Nutrition Meal Planner.
+
+One process owns the Google Sheets connection and keeps a snapshot of every
+worksheet in memory; household devices query this service instead of hitting
+Sheets directly. Endpoints (all JSON, GET/HEAD only):
+
+    /recipes
+    /ingredients
+    /meals?from=YYYY-MM-DD&to=YYYY-MM-DD
+    /totals?from=YYYY-MM-DD&to=YYYY-MM-DD
+
+Responses carry an ETag derived from the snapshot contents, so clients sending
+If-None-Match get a 304 until the data actually changes.
+"""
+
+import json
+import hashlib
+import threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+import numpy as np
+
+from nutrition_core import SHEET_NAMES, daily_totals
+from nutrition_tables import MealPlanTable
+
+MAX_RANGE_DAYS = 3660
+MAX_CACHED_RESPONSES = 512
+
+class NutritionDataCache:
+    """Snapshot of all worksheets shared by every request.
+
+    Only the refresh thread talks to Google Sheets; request handlers read the
+    current snapshot, which is replaced as a whole. The only thing added to a
+    snapshot afterwards is its memo of rendered responses, which handler
+    threads share under ``lock``.
+    """
+
+    def __init__(self, sheets_manager, refresh_interval=60):
+        self.sheets_manager = sheets_manager
+        self.refresh_interval = refresh_interval
+        self.snapshot = None
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self):
+        try:
+            # Archive sheets appear whenever old meals are archived
+            self.sheets_manager.worksheet_titles(refresh=True)
+            archive_names = self.sheets_manager.archive_sheet_names()
+            tables = self.sheets_manager.get_tables_batch(SHEET_NAMES + archive_names)
+        except Exception as e:
+            print(f"Error refreshing data: {e}")
+            return False
+
+        # Serve archived meals as if they were still in Meal_Plan
+        tables["Meal_Plan"] = MealPlanTable.concatenate([tables.pop(name) for name in ["Meal_Plan"] + archive_names])
+        records = {sheet_name: table.to_records() for sheet_name, table in tables.items()}
+        encoded = json.dumps(records, sort_keys=True, default=str).encode()
+        etag = '"' + hashlib.sha1(encoded).hexdigest() + '"'
+        if self.snapshot is None or self.snapshot["etag"] != etag:
+            self.snapshot = {"tables": tables, "records": records, "etag": etag, "responses": {}}
+        return True
+
+    def response(self, snapshot, request_path):
+        """JSON body answering a request path from ``snapshot``, or None if the endpoint is unknown.
+
+        Bodies are memoised per snapshot; rendering happens outside the lock, so
+        two threads may both render a path the first time it is asked for.
+        Raises ValueError for an invalid query.
+        """
+        responses = snapshot["responses"]
+        with self.lock:
+            body = responses.get(request_path)
+        if body is not None:
+            return body
+        url = urlsplit(request_path)
+        payload = render_endpoint(snapshot, url.path.rstrip("/") or "/", parse_qs(url.query))
+        if payload is None:
+            return None
+        body = json.dumps(payload, default=str).encode()
+        with self.lock:
+            if len(responses) >= MAX_CACHED_RESPONSES:
+                responses.clear()
+            responses[request_path] = body
+        return body
+
+    def start(self):
+        self.refresh()
+        self._thread = threading.Thread(target=self._run, name="sheets-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh()
+
+def parse_range(query):
+    today = date.today()
+    start = date.fromisoformat(query.get("from", [today.isoformat()])[0])
+    end = date.fromisoformat(query.get("to", [start.isoformat()])[0])
+    if end < start or (end - start).days > MAX_RANGE_DAYS:
+        raise ValueError(f"Invalid date range {start} to {end}")
+    return start, end
+
+def render_endpoint(snapshot, path, query):
+    """Build the JSON payload for an endpoint, or None if the path is unknown"""
+    tables = snapshot["tables"]
+    if path == "/recipes":
+        return snapshot["records"]["Recipes"]
+    if path == "/ingredients":
+        return snapshot["records"]["Ingredients"]
+    if path == "/meals":
+        start, end = parse_range(query)
+        meal_plan = tables["Meal_Plan"]
+        rows = np.flatnonzero(meal_plan.between(start, end))
+        rows = rows[np.argsort(meal_plan.day[rows], kind="stable")]
+        return [snapshot["records"]["Meal_Plan"][row] for row in rows.tolist()]
+    if path == "/totals":
+        start, end = parse_range(query)
+        totals = daily_totals(tables["Meal_Plan"], tables["Recipes"], start, end)
+        columns = tables["Recipes"].nutrient_columns
+        return [dict(date=date_str, **{column: round(value, 2) for column, value in zip(columns, values)})
+                for date_str, values in totals.items()]
+    if path == "/":
+        return {"endpoints": ["/recipes", "/ingredients", "/meals?from=&to=", "/totals?from=&to="]}
+    return None
+
+class NutritionRequestHandler(BaseHTTPRequestHandler):
+    server_version = "MealPrep/1.0"
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without this keep-alive clients
+    # stall on delayed ACKs for every response
+    disable_nagle_algorithm = True
+
+    def do_HEAD(self):
+        self.do_GET(send_body=False)
+
+    def do_GET(self, send_body=True):
+        snapshot = self.server.cache.snapshot
+        if snapshot is None:
+            self.send_json(503, {"error": "Data not loaded yet"}, send_body=send_body)
+            return
+
+        # Resolve the request first: an unknown endpoint or bad range is an error whatever the client has cached
+        try:
+            body = self.server.cache.response(snapshot, self.path)
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)}, send_body=send_body)
+            return
+        if body is None:
+            self.send_json(404, {"error": f"Unknown endpoint {urlsplit(self.path).path}"}, send_body=send_body)
+            return
+
+        etag = snapshot["etag"]
+        if etag in (tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def send_json(self, status, payload, send_body=True):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+def serve(sheets_manager, host="127.0.0.1", port=8765, refresh_interval=60, verbose=False):
+    cache = NutritionDataCache(sheets_manager, refresh_interval)
+    cache.start()
+
+    server = ThreadingHTTPServer((host, port), NutritionRequestHandler)
+    server.daemon_threads = True
+    server.cache = cache
+    server.verbose = verbose
+    print(f"Serving nutrition data on http://{host}:{port}/ (refresh every {refresh_interval}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cache.stop()
+        server.server_close()
@@ -0,0 +1,1124 @@
+"""
+GUI-free core of the Nutrition Meal Planner.
+
+Everything in here can be used without PySide6 or matplotlib: the Google Sheets
+access layer and the nutrition computations shared by the desktop application
+and the command line tool.
+"""
+
+import numbers
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import numpy as np
+
+from nutrition_tables import (table_type, parse_float, display_value, is_marked, MealPlanTable, MealTemplatesTable, VERSION_COLUMN,
+                              FORMULA_TOTALS_COLUMN, MEAL_PLAN_ARCHIVE_PREFIX, ingredient_column, ingredient_nutrient,
+                              recipe_column, recipe_nutrient)
+
+SHEET_NAMES = ["Recipes", "Ingredients", "Recipe_Ingredients", "Meal_Plan"]
+
+# Nutrients of a new database; more are added as column pairs (see add_nutrient)
+INGREDIENT_NUTRITION_KEYS = ["Calories (per 100g)", "Protein (g per 100g)", "Carbohydrates (g per 100g)", "Fat (g per 100g)"]
+RECIPE_NUTRITION_KEYS = ["Total Calories", "Total Protein (g)", "Total Carbohydrates (g)", "Total Fat (g)"]
+RECIPE_PORTION_KEY = "Portion Size (e.g., servings)"
+MEAL_PORTION_KEY = "Portion Size (for the meal plan, referring to the recipe's portion size)"
+RECIPE_INGREDIENT_UNIT_KEY = "Unit (of ingredient, e.g., grams, ml)"
+
+# Row ranges of progressive sheet downloads (see iter_table_chunks) and how many are requested at once
+CHUNK_ROWS = 500
+CHUNK_WORKERS = 4
+
+# Saved meal templates live in their own sheet, created when the first one is saved
+MEAL_TEMPLATES_SHEET = "Meal_Templates"
+
+# Meals older than this many whole months are moved out of Meal_Plan by archive_meal_plan
+DEFAULT_ARCHIVE_MONTHS = 3
+
+class WriteConflict(Exception):
+    """A row was changed or deleted on another device since this client read it"""
+
+    def __init__(self, sheet_name, version):
+        super().__init__(f"The {sheet_name} row was changed or deleted on another device")
+        self.sheet_name = sheet_name
+        self.version = version
+
+class IntegrityError(Exception):
+    """A change would break or duplicate the names other sheets use to refer to a recipe or ingredient"""
+
+# Columns in other sheets that refer to a recipe or ingredient by name
+# (Meal_Plan references include the meal plan archive sheets)
+REFERENCES = {
+    "Recipes": [("Recipe_Ingredients", "Recipe Name"), ("Meal_Plan", "Recipe Name")],
+    "Ingredients": [("Recipe_Ingredients", "Ingredient Name")],
+}
+KEY_COLUMNS = {"Recipes": "Recipe Name", "Ingredients": "Ingredient Name"}
+
+def reference_column(sheet_name, ref_sheet):
+    """Column of ``ref_sheet`` (the meal plan's, for an archive sheet) naming rows of ``sheet_name``"""
+    if ref_sheet.startswith(MEAL_PLAN_ARCHIVE_PREFIX):
+        ref_sheet = "Meal_Plan"
+    return dict(REFERENCES[sheet_name])[ref_sheet]
+
+def sheet_range(sheet_name, a1):
+    return "'" + sheet_name.replace("'", "''") + "'!" + a1
+
+def column_letters(column):
+    """A1 letters of a 1-based column number"""
+    letters = ""
+    while column:
+        column, remainder = divmod(column - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+def row_runs(rows):
+    """Sorted row numbers grouped into [start, end) runs of consecutive rows"""
+    runs = []
+    for row in sorted(rows):
+        if runs and runs[-1][1] == row:
+            runs[-1][1] = row + 1
+        else:
+            runs.append([row, row + 1])
+    return runs
+
+def delete_rows_requests(sheet_id, rows):
+    """deleteDimension requests removing table rows (0-based, below the header), bottom-up
+    so earlier ranges keep their positions"""
+    return [{"deleteDimension": {"range": {"sheetId": sheet_id, "dimension": "ROWS",
+                                           "startIndex": start + 1, "endIndex": end + 1}}}
+            for start, end in reversed(row_runs(rows))]
+
+def cell_data(value, formula=False):
+    """CellData entering a formula, or any other value exactly as given (as RAW does)"""
+    if formula:
+        return {"userEnteredValue": {"formulaValue": value}}
+    if isinstance(value, bool):
+        return {"userEnteredValue": {"boolValue": value}}
+    if isinstance(value, numbers.Real):
+        return {"userEnteredValue": {"numberValue": float(value)}} if value == value else {}
+    if value is None or value == "":
+        return {}
+    return {"userEnteredValue": {"stringValue": str(value)}}
+
+def row_data(rows, formulas=None):
+    """RowData of ``rows``; ``formulas`` gives per row the positions to enter as formulas"""
+    return [{"values": [cell_data(value, formulas is not None and column in formulas[i]) for column, value in enumerate(row)]}
+            for i, row in enumerate(rows)]
+
+def update_cells_request(sheet_id, row, column, rows, formulas=None):
+    """updateCells request writing ``rows`` with their first cell at (row, column), 0-based"""
+    return {"updateCells": {"start": {"sheetId": sheet_id, "rowIndex": row, "columnIndex": column},
+                            "rows": row_data(rows, formulas), "fields": "userEnteredValue"}}
+
+def append_cells_request(sheet_id, rows, formulas=None):
+    """appendCells request adding ``rows`` below the last row with data"""
+    return {"appendCells": {"sheetId": sheet_id, "rows": row_data(rows, formulas), "fields": "userEnteredValue"}}
+
+def new_version():
+    return uuid.uuid4().hex[:12]
+
+class GoogleSheetsManager:
+    def __init__(self, service_account_file="service_account_key.json"):
+        self.scopes = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
+        self.service_account_file = service_account_file
+        self.gc = None
+        self.spreadsheet = None
+        self.cache = {}
+        self.pending_writes = {}
+        # Local writes ever begun per sheet, so a download can tell whether one happened while it ran
+        self.local_writes = {}
+        self.worksheets = {}
+        self.connect()
+
+    def connect(self):
+        try:
+            import gspread
+            from sheets_transport import PooledHTTPClient
+            self.close()
+            self.gc = gspread.service_account(filename=self.service_account_file, scopes=self.scopes,
+                                              http_client=PooledHTTPClient)
+            self.spreadsheet = self.gc.open("Nutrition Meal Planner Database")
+            self.worksheets = {}
+            return True
+        except Exception as e:
+            print(f"Error connecting to Google Sheets: {e}")
+            return False
+
+    def close(self):
+        """Stop the token refresher and release the pooled connections"""
+        http_client = getattr(self.gc, "http_client", None)
+        if hasattr(http_client, "token_refresher"):
+            http_client.close()
+
+    def get_worksheet(self, sheet_name):
+        try:
+            if sheet_name not in self.worksheets:
+                # One metadata request resolves every worksheet handle for the session
+                self.worksheets = {worksheet.title: worksheet for worksheet in self.spreadsheet.worksheets()}
+            return self.worksheets[sheet_name]
+        except Exception as e:
+            print(f"Error getting worksheet {sheet_name}: {e}")
+            return None
+
+    def worksheet_titles(self, refresh=False):
+        if refresh or not self.worksheets:
+            self.worksheets = {worksheet.title: worksheet for worksheet in self.spreadsheet.worksheets()}
+        return list(self.worksheets)
+
+    def archive_sheet_names(self, start_date=None, end_date=None):
+        """Existing meal plan archive sheets, optionally only those for years in a date range"""
+        names = sorted(title for title in self.worksheet_titles()
+                       if title.startswith(MEAL_PLAN_ARCHIVE_PREFIX) and title[len(MEAL_PLAN_ARCHIVE_PREFIX):].isdigit())
+        if start_date is not None:
+            names = [name for name in names if start_date.year <= int(name[len(MEAL_PLAN_ARCHIVE_PREFIX):]) <= end_date.year]
+        return names
+
+    def meal_plan_sheets(self, start_date, end_date):
+        """Meal_Plan followed by the archive sheets that can hold meals between the two dates"""
+        return ["Meal_Plan"] + self.archive_sheet_names(start_date, end_date)
+
+    def get_meal_plan(self, start_date, end_date, cached_only=False):
+        """Meal plan table covering a date range, reading archive sheets only when the range needs them.
+
+        Rows of Meal_Plan itself come first, so row numbers below len(get_table("Meal_Plan"))
+        still address that sheet. With ``cached_only`` archives that were not
+        downloaded yet are left out instead of being fetched.
+        """
+        archives = [name for name in self.archive_sheet_names(start_date, end_date)
+                    if not cached_only or name in self.cache]
+        return MealPlanTable.concatenate([self.get_table("Meal_Plan")] + [self.get_table(name) for name in archives])
+
+    def get_table(self, sheet_name, refresh=False):
+        """Typed table for a sheet, downloaded only when not cached or when refresh is set"""
+        if refresh or sheet_name not in self.cache:
+            worksheet = self.get_worksheet(sheet_name)
+            if not worksheet:
+                return table_type(sheet_name).from_values([])
+            return self.store_table(sheet_name, table_type(sheet_name).from_values(worksheet.get_all_values()))
+        return self.cache[sheet_name]
+
+    def get_all_data(self, sheet_name):
+        return self.get_table(sheet_name, refresh=True).to_records()
+
+    def get_tables_batch(self, sheet_names):
+        """Fetch several worksheets with a single values.batchGet request.
+
+        Returns {sheet_name: table}; the tables also replace the cached copies.
+        """
+        ranges = ["'" + sheet_name.replace("'", "''") + "'" for sheet_name in sheet_names]
+        response = self.spreadsheet.values_batch_get(ranges)
+
+        value_ranges = response.get("valueRanges", [])
+        tables = {}
+        for i, sheet_name in enumerate(sheet_names):
+            values = value_ranges[i].get("values", []) if i < len(value_ranges) else []
+            tables[sheet_name] = self.store_table(sheet_name, table_type(sheet_name).from_values(values))
+        return tables
+
+    def iter_table_chunks(self, sheet_name, chunk_rows=CHUNK_ROWS, workers=CHUNK_WORKERS):
+        """Download a worksheet in fixed-size row ranges, yielding (header, rows) per chunk in sheet order.
+
+        The first range includes the header, so the first rows are available after
+        one round trip. The following ranges, up to the sheet's row count, are
+        requested ``workers`` at a time and yielded as soon as all earlier ones are.
+        Closing the generator cancels the ranges not requested yet; a complete
+        download replaces the cached table like get_table(refresh=True), unless
+        the sheet was edited locally since the download started.
+        """
+        worksheet = self.get_worksheet(sheet_name)
+        if not worksheet:
+            return
+        writes = self.local_writes.get(sheet_name, 0)
+        values = self.spreadsheet.values_get(sheet_range(sheet_name, f"1:{chunk_rows}")).get("values", [])
+        if not values:
+            self.store_table(sheet_name, table_type(sheet_name).from_values([]), writes)
+            return
+        header, rows = values[0], values[1:]
+        yield header, rows
+
+        def fetch(start):
+            return self.spreadsheet.values_get(sheet_range(sheet_name, f"{start}:{start + chunk_rows - 1}")).get("values", [])
+
+        # Ranges come back without their trailing blank rows; those only count if more rows follow
+        blank = chunk_rows - len(values)
+        start = chunk_rows + 1
+        futures = deque()
+        pool = ThreadPoolExecutor(max_workers=workers)
+        try:
+            while True:
+                while len(futures) < workers and start <= worksheet.row_count:
+                    futures.append(pool.submit(fetch, start))
+                    start += chunk_rows
+                if not futures:
+                    if blank:
+                        break
+                    # The last range was full: rows were added since the row count was read
+                    futures.append(pool.submit(fetch, start))
+                    start += chunk_rows
+                chunk = futures.popleft().result()
+                if not chunk:
+                    blank += chunk_rows
+                    continue
+                chunk = [[] for _ in range(blank)] + chunk
+                blank = chunk_rows - (len(chunk) - blank)
+                rows.extend(chunk)
+                yield header, chunk
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        self.store_table(sheet_name, table_type(sheet_name)(header, rows), writes)
+
+    def get_header(self, sheet_name):
+        worksheet = self.get_worksheet(sheet_name)
+        if worksheet:
+            return worksheet.row_values(1)
+        return []
+
+    def store_table(self, sheet_name, table, writes=None):
+        """Cache a freshly downloaded table and return the copy callers should show.
+
+        While local changes to a sheet are waiting for their write to be confirmed,
+        the local copy stays authoritative: the download predates those writes.
+        The same goes for a long download (``writes`` is local_writes for the
+        sheet when it started) that a local write began after, even if confirmed.
+        """
+        stale = writes is not None and self.local_writes.get(sheet_name, 0) != writes
+        if (self.pending_writes.get(sheet_name) or stale) and sheet_name in self.cache:
+            return self.cache[sheet_name]
+        self.cache[sheet_name] = table
+        return table
+
+    def invalidate_cache(self, sheet_name=None):
+        if sheet_name is None:
+            for name in list(self.cache):
+                self.invalidate_cache(name)
+        elif not self.pending_writes.get(sheet_name):
+            self.cache.pop(sheet_name, None)
+
+    def begin_local_write(self, sheet_name, table):
+        """Install a locally modified table ahead of the write that will confirm it"""
+        self.cache[sheet_name] = table
+        self.pending_writes[sheet_name] = self.pending_writes.get(sheet_name, 0) + 1
+        self.local_writes[sheet_name] = self.local_writes.get(sheet_name, 0) + 1
+
+    def end_local_write(self, sheet_name, rollback_table=None):
+        """Mark one local write as confirmed, or undo it by restoring ``rollback_table``"""
+        remaining = self.pending_writes.get(sheet_name, 1) - 1
+        if remaining:
+            self.pending_writes[sheet_name] = remaining
+        else:
+            self.pending_writes.pop(sheet_name, None)
+        if rollback_table is not None:
+            self.cache[sheet_name] = rollback_table
+
+    def add_row(self, sheet_name, data):
+        worksheet = self.get_worksheet(sheet_name)
+        if worksheet:
+            try:
+                self.append_sheet_rows(worksheet, sheet_name, [data])
+                self.invalidate_cache(sheet_name)
+                return True
+            except Exception as e:
+                print(f"Error adding row to {sheet_name}: {e}")
+        return False
+
+    def add_rows(self, sheet_name, rows):
+        """Append many rows with a single request"""
+        worksheet = self.get_worksheet(sheet_name)
+        if worksheet:
+            try:
+                self.append_sheet_rows(worksheet, sheet_name, rows)
+                self.invalidate_cache(sheet_name)
+                return True
+            except Exception as e:
+                print(f"Error adding rows to {sheet_name}: {e}")
+        return False
+
+    def append_sheet_rows(self, worksheet, sheet_name, rows):
+        """Append rows with one request, RAW or as typed cells when some are formulas (see sheet_rows)"""
+        rows, formulas = self.sheet_rows(sheet_name, rows)
+        if any(formulas):
+            self.spreadsheet.batch_update({"requests": [append_cells_request(worksheet.id, rows, formulas)]})
+        else:
+            worksheet.append_rows(rows, value_input_option="RAW")
+
+    def locate_row(self, sheet_name, row_index, version):
+        """Compare-and-set check before writing a row the client read with stamp ``version``.
+
+        Costs one cell read when the row is still where the client saw it, and one
+        column read when rows above it were added or removed on another device.
+        Raises WriteConflict if no row carries that stamp any more.
+        """
+        worksheet = self.get_worksheet(sheet_name)
+        table = self.cache.get(sheet_name)
+        header = table.header if table is not None else worksheet.row_values(1)
+        column = header.index(VERSION_COLUMN) + 1
+        if worksheet.cell(row_index, column).value == version:
+            return row_index
+        versions = worksheet.col_values(column)
+        if version in versions:
+            return versions.index(version) + 1
+        raise WriteConflict(sheet_name, version)
+
+    def update_row(self, sheet_name, row_index, data, expected_version=None):
+        """Overwrite a row; with ``expected_version`` only if nobody else changed it first.
+
+        The row goes out as one ranged write straight after locate_row's check,
+        so another device's edit can only slip in during that one round trip.
+        """
+        if expected_version and self.get_worksheet(sheet_name):
+            try:
+                row_index = self.locate_row(sheet_name, row_index, expected_version)
+            except WriteConflict:
+                raise
+            except Exception as e:
+                print(f"Error updating row in {sheet_name}: {e}")
+                return False
+        return self.update_rows(sheet_name, {row_index: data})
+
+    def update_rows(self, sheet_name, rows_by_index):
+        """Overwrite several whole rows ({row_index: data}) with a single batch request"""
+        worksheet = self.get_worksheet(sheet_name)
+        if worksheet:
+            try:
+                from gspread.utils import rowcol_to_a1
+                rows, formulas = self.sheet_rows(sheet_name, rows_by_index.values())
+                if any(formulas):
+                    self.spreadsheet.batch_update({"requests": [
+                        update_cells_request(worksheet.id, row_index - 1, 0, [data], [row_formulas])
+                        for row_index, data, row_formulas in zip(rows_by_index, rows, formulas)]})
+                else:
+                    worksheet.batch_update([
+                        {"range": f"{rowcol_to_a1(row_index, 1)}:{rowcol_to_a1(row_index, len(data))}", "values": [data]}
+                        for row_index, data in zip(rows_by_index, rows)
+                    ], raw=True)
+                self.invalidate_cache(sheet_name)
+                return True
+            except Exception as e:
+                print(f"Error updating rows in {sheet_name}: {e}")
+        return False
+
+    def delete_row(self, sheet_name, row_index, expected_version=None):
+        worksheet = self.get_worksheet(sheet_name)
+        if worksheet:
+            try:
+                if expected_version:
+                    row_index = self.locate_row(sheet_name, row_index, expected_version)
+                worksheet.delete_rows(row_index)
+                self.invalidate_cache(sheet_name)
+                return True
+            except WriteConflict:
+                raise
+            except Exception as e:
+                print(f"Error deleting row from {sheet_name}: {e}")
+        return False
+
+    def stamp_versions(self, sheet_name):
+        """Add the version column to a sheet if missing and stamp every unstamped row.
+
+        Returns the number of rows stamped.
+        """
+        from gspread.utils import rowcol_to_a1
+        worksheet = self.get_worksheet(sheet_name)
+        values = worksheet.get_all_values()
+        if not values:
+            return 0
+        header = values[0]
+        updates = []
+        if VERSION_COLUMN in header:
+            column = header.index(VERSION_COLUMN) + 1
+        else:
+            column = len(header) + 1
+            updates.append({"range": rowcol_to_a1(1, column), "values": [[VERSION_COLUMN]]})
+
+        for row_index, row in enumerate(values[1:], start=2):
+            if len(row) < column or not row[column - 1]:
+                updates.append({"range": rowcol_to_a1(row_index, column), "values": [[new_version()]]})
+        if updates:
+            worksheet.batch_update(updates)
+            self.invalidate_cache(sheet_name)
+        return len(updates) - (VERSION_COLUMN not in header)
+
+    def add_columns(self, sheet_name, columns):
+        """Append header cells for ``columns`` not yet in a sheet; returns the ones added"""
+        from gspread.utils import rowcol_to_a1
+        worksheet = self.get_worksheet(sheet_name)
+        header = worksheet.row_values(1)
+        new_columns = [column for column in columns if column not in header]
+        if not new_columns:
+            return []
+        width = len(header) + len(new_columns)
+        if worksheet.col_count < width:
+            worksheet.add_cols(width - worksheet.col_count)
+        worksheet.batch_update([{"range": f"{rowcol_to_a1(1, len(header) + 1)}:{rowcol_to_a1(1, width)}",
+                                 "values": [new_columns]}])
+        self.invalidate_cache(sheet_name)
+        return new_columns
+
+    def add_nutrient(self, nutrient):
+        """Start tracking a nutrient such as "Fiber (g)" by adding its Ingredients and Recipes columns"""
+        return (self.add_columns("Ingredients", [ingredient_column(nutrient)]) +
+                self.add_columns("Recipes", [recipe_column(nutrient)]))
+
+    def cached_header(self, sheet_name):
+        return self.cache[sheet_name].header if sheet_name in self.cache else self.get_header(sheet_name)
+
+    def sheet_rows(self, sheet_name, rows):
+        """Rows as they are written to Sheets, and per row the positions holding formulas.
+
+        Recipes marked in FORMULA_TOTALS_COLUMN get the total_formulas in place of
+        the totals worked out here, which the cached table keeps showing. Only
+        those cells are entered as formulas; everything else is stored as it is,
+        so a name such as "=x" or "-5" stays text.
+        """
+        rows = [list(row) for row in rows]
+        formulas = [set() for _ in rows]
+        if sheet_name != "Recipes":
+            return rows, formulas
+        header = self.cached_header("Recipes")
+        if FORMULA_TOTALS_COLUMN not in header:
+            return rows, formulas
+        mark = header.index(FORMULA_TOTALS_COLUMN)
+        marked = [i for i, row in enumerate(rows) if mark < len(row) and is_marked(row[mark])]
+        if not marked:
+            return rows, formulas
+        total_cells = total_formulas(header, self.cached_header("Recipe_Ingredients"), self.cached_header("Ingredients"))
+        positions = {header.index(column): formula for column, formula in total_cells.items()}
+        for i in marked:
+            for position, formula in positions.items():
+                if position < len(rows[i]):
+                    rows[i][position] = formula
+                    formulas[i].add(position)
+        return rows, formulas
+
+    def write_cells(self, sheet_name, header, rows, cells, formulas=()):
+        """Write {column: [value per row]} into ``rows`` (0-based below the header, ascending)
+        with one batchUpdate request, one range per column and run of consecutive rows.
+        Columns in ``formulas`` are entered as formulas, all others as they are."""
+        sheet_id = self.get_worksheet(sheet_name).id
+        requests = []
+        for column, values in cells.items():
+            position = header.index(column)
+            offset = 0
+            for start, end in row_runs(rows):
+                block = [[value] for value in values[offset:offset + end - start]]
+                requests.append(update_cells_request(sheet_id, start + 1, position, block,
+                                                     [{0}] * len(block) if column in formulas else None))
+                offset += end - start
+        if requests:
+            self.spreadsheet.batch_update({"requests": requests})
+            self.invalidate_cache(sheet_name)
+
+    def install_formula_totals(self, recipe_names=None):
+        """Have Sheets compute recipe totals from the ingredient lines from now on.
+
+        Adds FORMULA_TOTALS_COLUMN to Recipes if needed, then marks every recipe
+        that has ingredient lines (only ``recipe_names``, if given) and puts
+        total_formulas in its total cells, all in one batch request. Ingredient
+        edits then reach the totals without any client downloading or writing
+        them. Returns the number of recipes switched over.
+        """
+        self.add_columns("Recipes", [FORMULA_TOTALS_COLUMN])
+        tables = self.get_tables_batch(["Recipes", "Recipe_Ingredients", "Ingredients"])
+        recipes = tables["Recipes"]
+        used = set(tables["Recipe_Ingredients"].recipe)
+        rows = [row for row, name in enumerate(recipes.name)
+                if name in used and (recipe_names is None or name in recipe_names)]
+        formulas = total_formulas(recipes.header, tables["Recipe_Ingredients"].header, tables["Ingredients"].header)
+        cells = {column: [formula] * len(rows) for column, formula in formulas.items()}
+        cells[FORMULA_TOTALS_COLUMN] = ["yes"] * len(rows)
+        self.write_cells("Recipes", recipes.header, rows, cells, formulas=set(formulas))
+        return len(rows)
+
+    def remove_formula_totals(self):
+        """Turn the formula totals of install_formula_totals back into plain numbers
+        (their current values) and unmark the recipes; returns how many there were"""
+        recipes = self.get_table("Recipes", refresh=True)
+        if FORMULA_TOTALS_COLUMN not in recipes.header:
+            return 0
+        rows = np.flatnonzero(recipes.formula_totals).tolist()
+        cells = {column: [display_value(recipes.column(column)[row]) for row in rows] for column in recipes.nutrient_columns}
+        cells[FORMULA_TOTALS_COLUMN] = [""] * len(rows)
+        self.write_cells("Recipes", recipes.header, rows, cells)
+        return len(rows)
+
+    def update_cached_rows(self, sheet_name, rows_by_index):
+        """Show rows that Sheets computes itself (formula totals) in the cached table without writing them"""
+        if sheet_name in self.cache:
+            self.cache[sheet_name] = self.cache[sheet_name].with_rows(
+                {row_index - 2: data for row_index, data in rows_by_index.items()})
+
+    def archive_meal_plan(self, before, dry_run=False):
+        """Move meals dated before ``before`` from Meal_Plan into per-year archive sheets.
+
+        Rows are appended to the archives before they are deleted from Meal_Plan
+        (all deletions in one batch request), so an interrupted run can leave
+        duplicates but never loses meals. Returns {year: number of meals}.
+        """
+        worksheet = self.get_worksheet("Meal_Plan")
+        values = worksheet.get_all_values()
+        if len(values) < 2:
+            return {}
+        header, rows = values[0], values[1:]
+        meal_plan = MealPlanTable(header, rows)
+        old_rows = np.flatnonzero((meal_plan.day >= 0) & (meal_plan.day < before.toordinal())).tolist()
+
+        # Meals are copied as the typed table holds them (dates as text, portions as numbers) and written RAW
+        typed_rows = meal_plan.rows()
+        by_year = {}
+        for row in old_rows:
+            by_year.setdefault(meal_plan.date[row].year, []).append(typed_rows[row])
+        if dry_run or not by_year:
+            return {year: len(year_rows) for year, year_rows in by_year.items()}
+
+        titles = self.worksheet_titles(refresh=True)
+        for year, year_rows in sorted(by_year.items()):
+            name = MEAL_PLAN_ARCHIVE_PREFIX + str(year)
+            if name in titles:
+                archive = self.worksheets[name]
+            else:
+                archive = self.spreadsheet.add_worksheet(title=name, rows=1, cols=len(header))
+                self.worksheets[name] = archive
+                year_rows = [header] + year_rows
+            archive.append_rows(year_rows, value_input_option="RAW")
+            self.invalidate_cache(name)
+
+        self.spreadsheet.batch_update({"requests": delete_rows_requests(worksheet.id, old_rows)})
+        self.invalidate_cache("Meal_Plan")
+        return {year: len(year_rows) for year, year_rows in by_year.items()}
+
+    def locate_rows(self, sheet_name, rows, expected_versions, column, value):
+        """Where table rows (0-based below the header) the client read at ``rows`` are
+        now, as {cached row: row}; the compare-and-set check of locate_row for many rows.
+
+        ``expected_versions`` are the stamps the rows were read with; they are looked
+        up in one read of the version column, wherever the rows are now, and
+        WriteConflict is raised if one of them was changed or deleted on another
+        device. Without stamps ``column`` is read fresh instead, and the rows now
+        holding ``value`` are taken in order, unless there are more or fewer of
+        them than the client read.
+        """
+        worksheet = self.get_worksheet(sheet_name)
+        header = self.cached_header(sheet_name)
+        if expected_versions and VERSION_COLUMN in header and all(expected_versions):
+            stamps = worksheet.col_values(header.index(VERSION_COLUMN) + 1)[1:]
+            positions = {version: row for row, version in enumerate(stamps)}
+            for version in expected_versions:
+                if version not in positions:
+                    raise WriteConflict(sheet_name, version)
+            return {row: positions[version] for row, version in zip(rows, expected_versions)}
+        values = worksheet.col_values(header.index(column) + 1)[1:]
+        found = [row for row, cell in enumerate(values) if cell == value]
+        if len(found) != len(rows):
+            raise WriteConflict(sheet_name, None)
+        return dict(zip(rows, found))
+
+    def recipe_line_rows(self, recipe_name, expected_versions=None):
+        """Table rows (0-based below the header) now holding a recipe's ingredient lines.
+
+        ``expected_versions`` are the stamps the client read the lines with (see
+        locate_rows). Without them all lines now carrying the recipe name are
+        returned, as cached positions may be out of date.
+        """
+        if expected_versions is not None and all(expected_versions):
+            return sorted(self.locate_rows("Recipe_Ingredients", range(len(expected_versions)), expected_versions,
+                                           "Recipe Name", recipe_name).values())
+        header = self.cached_header("Recipe_Ingredients")
+        names = self.get_worksheet("Recipe_Ingredients").col_values(header.index("Recipe Name") + 1)[1:]
+        return [row for row, name in enumerate(names) if name == recipe_name]
+
+    def clear_recipe_ingredients(self, recipe_name, expected_versions=None):
+        """Delete all ingredient lines of a recipe (see recipe_line_rows) in one batch request"""
+        return self.save_recipe_lines(recipe_name, expected_versions, [])
+
+    def save_recipe_lines(self, recipe_name, expected_versions, lines, recipe=None):
+        """Replace a recipe's ingredient lines (see recipe_line_rows) with ``lines`` in
+        a single batchUpdate request, which also writes the recipe row when ``recipe``
+        = (row_index, data, expected_version) is given, e.g. with its new totals"""
+        worksheet = self.get_worksheet("Recipe_Ingredients")
+        if worksheet:
+            try:
+                requests = delete_rows_requests(worksheet.id, self.recipe_line_rows(recipe_name, expected_versions))
+                if lines:
+                    requests.append(append_cells_request(worksheet.id, lines))
+                if recipe:
+                    row_index, data, expected_version = recipe
+                    if expected_version:
+                        row_index = self.locate_row("Recipes", row_index, expected_version)
+                    (data,), formulas = self.sheet_rows("Recipes", [data])
+                    requests.append(update_cells_request(self.get_worksheet("Recipes").id, row_index - 1, 0, [data], formulas))
+                if requests:
+                    self.spreadsheet.batch_update({"requests": requests})
+                self.invalidate_cache("Recipe_Ingredients")
+                if recipe:
+                    self.invalidate_cache("Recipes")
+                return True
+            except WriteConflict:
+                raise
+            except Exception as e:
+                print(f"Error saving ingredients of {recipe_name}: {e}")
+        return False
+
+    def references(self, sheet_name, name):
+        """Rows of other sheets that refer to a recipe or ingredient: {sheet: (column, rows)}.
+
+        Uses the reverse indexes of the cached tables; archive sheets not loaded
+        yet are fetched together in one request.
+        """
+        sheets = []
+        for ref_sheet, column in REFERENCES.get(sheet_name, []):
+            names = [ref_sheet] + self.archive_sheet_names() if ref_sheet == "Meal_Plan" else [ref_sheet]
+            sheets.extend((name, column) for name in names)
+        missing = [name for name, _ in sheets if name not in self.cache]
+        if missing:
+            self.get_tables_batch(missing)
+
+        found = {}
+        for ref_sheet, column in sheets:
+            rows = self.get_table(ref_sheet).rows_with(column, name)
+            if rows:
+                found[ref_sheet] = (column, rows)
+        return found
+
+    def rename_plan(self, sheet_name, old_name, new_name):
+        """Cell changes renaming every reference to a recipe or ingredient, as
+        {sheet: {(row, column): value}}; changed rows get a new version stamp.
+
+        Raises IntegrityError if another row already has the new name.
+        """
+        if new_name in self.get_table(sheet_name).index:
+            raise IntegrityError(f"There is already an entry named '{new_name}' in {sheet_name}.")
+        plan = {}
+        for ref_sheet, (column, rows) in self.references(sheet_name, old_name).items():
+            stamped = VERSION_COLUMN in self.get_table(ref_sheet).header
+            cells = {}
+            for row in rows:
+                cells[(row, column)] = new_name
+                if stamped:
+                    cells[(row, VERSION_COLUMN)] = new_version()
+            plan[ref_sheet] = cells
+        return plan
+
+    def delete_plan(self, sheet_name, name):
+        """Rows to delete along with a recipe or ingredient: {sheet: rows}.
+
+        A recipe takes its ingredient lines and planned meals with it. Deleting
+        an ingredient that recipes still use, or a recipe that archived meals
+        refer to, raises IntegrityError instead.
+        """
+        references = self.references(sheet_name, name)
+        if sheet_name == "Ingredients" and references:
+            recipe_ingredients = self.get_table("Recipe_Ingredients")
+            recipes = sorted({recipe_ingredients.recipe[row] for row in references["Recipe_Ingredients"][1]})
+            raise IntegrityError(f"'{name}' is used in {len(recipes)} recipe(s): {', '.join(recipes)}. "
+                                 "Remove it from those recipes first.")
+        archived = sum(len(rows) for ref_sheet, (_, rows) in references.items()
+                       if ref_sheet.startswith(MEAL_PLAN_ARCHIVE_PREFIX))
+        if archived:
+            raise IntegrityError(f"'{name}' is part of {archived} archived meal(s) and cannot be deleted.")
+        return {ref_sheet: rows for ref_sheet, (_, rows) in references.items()}
+
+    def rename_with_references(self, sheet_name, row_index, data, plan, expected_version=None, name=None, versions=None):
+        """Write an edited row together with the reference changes of rename_plan,
+        all in a single batchUpdate request.
+
+        The referencing rows are found where they are now (see locate_rows) from
+        the old ``name`` and ``versions``, {sheet: stamps of the plan's rows in
+        order}, as the client read them.
+        """
+        try:
+            if expected_version:
+                row_index = self.locate_row(sheet_name, row_index, expected_version)
+            (data,), formulas = self.sheet_rows(sheet_name, [data])
+            requests = [update_cells_request(self.get_worksheet(sheet_name).id, row_index - 1, 0, [data], formulas)]
+            for ref_sheet, cells in plan.items():
+                rows = sorted({row for row, _ in cells})
+                moved = self.locate_rows(ref_sheet, rows, (versions or {}).get(ref_sheet),
+                                         reference_column(sheet_name, ref_sheet), name)
+                sheet_id = self.get_worksheet(ref_sheet).id
+                header = self.cached_header(ref_sheet)
+                for (row, column), value in cells.items():
+                    requests.append(update_cells_request(sheet_id, moved[row] + 1, header.index(column), [[value]]))
+            self.spreadsheet.batch_update({"requests": requests})
+            for ref_name in [sheet_name, *plan]:
+                self.invalidate_cache(ref_name)
+            return True
+        except WriteConflict:
+            raise
+        except Exception as e:
+            print(f"Error renaming in {sheet_name}: {e}")
+        return False
+
+    def delete_with_references(self, sheet_name, row_index, plan, expected_version=None, name=None, versions=None):
+        """Delete a row and the rows of delete_plan in a single batchUpdate request,
+        finding the referencing rows as rename_with_references does"""
+        try:
+            if expected_version:
+                row_index = self.locate_row(sheet_name, row_index, expected_version)
+            requests = delete_rows_requests(self.get_worksheet(sheet_name).id, [row_index - 2])
+            for ref_sheet, rows in plan.items():
+                rows = sorted(rows)
+                moved = self.locate_rows(ref_sheet, rows, (versions or {}).get(ref_sheet),
+                                         reference_column(sheet_name, ref_sheet), name)
+                requests.extend(delete_rows_requests(self.get_worksheet(ref_sheet).id, sorted(moved.values())))
+            self.spreadsheet.batch_update({"requests": requests})
+            for ref_name in [sheet_name, *plan]:
+                self.invalidate_cache(ref_name)
+            return True
+        except WriteConflict:
+            raise
+        except Exception as e:
+            print(f"Error deleting from {sheet_name}: {e}")
+        return False
+
+    def get_templates(self):
+        """The saved meal templates (an empty table until the first one is saved)"""
+        if MEAL_TEMPLATES_SHEET not in self.worksheet_titles():
+            return MealTemplatesTable.from_values([])
+        return self.get_table(MEAL_TEMPLATES_SHEET)
+
+    def save_template(self, name, meals, length):
+        """Save meals (see meals_between) as template ``name`` with a single append.
+
+        Raises IntegrityError if a template of that name exists already.
+        """
+        if self.get_templates().rows_with("Template Name", name):
+            raise IntegrityError(f"There is already a template named '{name}'.")
+        rows = [[name, offset + 1, meal_type, recipe, portion, length] for offset, meal_type, recipe, portion in meals]
+        if MEAL_TEMPLATES_SHEET in self.worksheet_titles(refresh=True):
+            worksheet = self.worksheets[MEAL_TEMPLATES_SHEET]
+        else:
+            header = [column for column, _ in MealTemplatesTable.schema.values()]
+            worksheet = self.spreadsheet.add_worksheet(title=MEAL_TEMPLATES_SHEET, rows=1, cols=len(header))
+            self.worksheets[MEAL_TEMPLATES_SHEET] = worksheet
+            rows = [header] + rows
+        worksheet.append_rows(rows, value_input_option="RAW")
+        self.invalidate_cache(MEAL_TEMPLATES_SHEET)
+
+    def delete_template(self, name):
+        """Delete every row of a template in one batchUpdate request"""
+        rows = self.get_templates().rows_with("Template Name", name)
+        if rows:
+            worksheet = self.get_worksheet(MEAL_TEMPLATES_SHEET)
+            self.spreadsheet.batch_update({"requests": delete_rows_requests(worksheet.id, rows)})
+            self.invalidate_cache(MEAL_TEMPLATES_SHEET)
+        return len(rows)
+
+# Share of the daily targets each meal type should cover when auto-planning
+DEFAULT_MEAL_SHARES = {"Breakfast": 0.25, "Lunch": 0.35, "Dinner": 0.30, "Snack": 0.10}
+# Daily calories, protein, carbohydrates and fat (g) planned for unless the user sets their own
+DEFAULT_DAILY_TARGETS = [2000.0, 150.0, 200.0, 65.0]
+
+def archive_cutoff(today, months=DEFAULT_ARCHIVE_MONTHS):
+    """First day of the month ``months`` months before the current one"""
+    month_index = today.year * 12 + today.month - 1 - months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+def build_recipe_matrix(recipes, excluded=()):
+    """Return recipe names and a (recipes x 4) array of per-portion calories/protein/carbs/fat"""
+    per_serving = recipes.per_serving
+    # Recipes without calculated nutrition can't help reach a target
+    usable = np.any(per_serving != 0, axis=1)
+    usable &= np.fromiter((bool(name) and name not in excluded for name in recipes.name), dtype=bool, count=len(recipes))
+    rows = np.flatnonzero(usable)
+    return [recipes.name[i] for i in rows], per_serving[rows]
+
+def auto_plan_meals(recipes, targets, start_date, end_date, meal_types=("Breakfast", "Lunch", "Dinner"),
+                    meal_shares=None, max_uses=2, excluded=(), min_portion=0.5, max_portion=3.0,
+                    portion_step=0.25, passes=3):
+    """Pick a recipe and portion for every meal slot between two dates so that each
+    day's calories/protein/carbs/fat stay as close as possible to the targets.
+
+    Every slot is chosen by scoring all candidate recipes at once: the best portion
+    for each candidate is solved in closed form (least squares on the deviation
+    relative to the targets) and the candidate with the smallest remaining error
+    wins. A few coordinate-descent passes then revisit each slot with the rest of
+    the day fixed. ``max_uses`` caps how often a recipe appears over the whole range
+    (0 means unlimited) and a recipe is never repeated on the same day.
+
+    Returns rows ready to append to the Meal_Plan sheet.
+    """
+    names, matrix = build_recipe_matrix(recipes, excluded)
+    meal_types = list(meal_types)
+    if not names or not meal_types or end_date < start_date:
+        return []
+
+    target = np.asarray(targets, dtype=np.float64)
+    # Deviations are measured relative to each target so grams and calories weigh the same
+    weights = 1.0 / np.where(target > 0, target, 1.0)
+    scaled = matrix * weights
+    goal_total = target * weights
+    norms = np.einsum("ij,ij->i", scaled, scaled)
+
+    meal_shares = meal_shares or DEFAULT_MEAL_SHARES
+    shares = np.array([meal_shares.get(meal_type, 1.0 / len(meal_types)) for meal_type in meal_types])
+    uses = np.zeros(len(names), dtype=np.int64)
+    plan_rows = []
+
+    for day_offset in range((end_date - start_date).days + 1):
+        day_str = (start_date + timedelta(days=day_offset)).strftime('%Y-%m-%d')
+        choices = [-1] * len(meal_types)
+        portions = [0.0] * len(meal_types)
+
+        for _ in range(passes):
+            for slot in range(len(meal_types)):
+                # Release the slot before re-solving it
+                if choices[slot] >= 0:
+                    uses[choices[slot]] -= 1
+                    choices[slot] = -1
+
+                planned = np.zeros_like(goal_total)
+                open_share = 0.0
+                for other, choice in enumerate(choices):
+                    if choice >= 0:
+                        planned += scaled[choice] * portions[other]
+                    else:
+                        open_share += shares[other]
+                goal = (goal_total - planned) * (shares[slot] / open_share)
+
+                best_portions = np.divide(scaled @ goal, norms, out=np.zeros_like(norms), where=norms > 0)
+                best_portions = np.clip(np.round(best_portions / portion_step) * portion_step, min_portion, max_portion)
+                residual = goal - scaled * best_portions[:, None]
+                errors = np.einsum("ij,ij->i", residual, residual)
+
+                if max_uses:
+                    errors[uses >= max_uses] = np.inf
+                for choice in choices:
+                    if choice >= 0:
+                        errors[choice] = np.inf
+
+                best = int(np.argmin(errors))
+                if not np.isfinite(errors[best]):
+                    continue
+                choices[slot] = best
+                portions[slot] = float(best_portions[best])
+                uses[best] += 1
+
+        for slot, meal_type in enumerate(meal_types):
+            if choices[slot] >= 0:
+                plan_rows.append([day_str, meal_type, names[choices[slot]], portions[slot]])
+
+    return plan_rows
+
+def meal_scales(meal_plan, recipes, mask):
+    """Recipe row and servings-eaten factor (meal portion / recipe servings) of each
+    selected meal whose recipe exists"""
+    rows = np.flatnonzero(mask)
+    recipe_rows = np.fromiter((recipes.index.get(meal_plan.recipe[i], -1) for i in rows), dtype=np.int64, count=len(rows))
+    found = recipe_rows >= 0
+    rows, recipe_rows = rows[found], recipe_rows[found]
+
+    portions = np.nan_to_num(meal_plan.portion[rows], nan=1.0)
+    servings = recipes.servings[recipe_rows]
+    servings = np.where(np.isfinite(servings) & (servings > 0), servings, 1.0)
+    return rows, recipe_rows, portions / servings
+
+def build_shopping_list(meal_plan, recipes, recipe_ingredients, start_date, end_date):
+    """Sum the ingredient quantities needed for every meal planned between two dates.
+
+    The servings eaten of each recipe over the range are summed first, then every
+    Recipe_Ingredients line is scaled by its recipe's factor in one array
+    operation and the results are summed per (ingredient, unit).
+
+    Returns a list of (ingredient, quantity, unit) tuples sorted by ingredient.
+    """
+    _, recipe_rows, scales = meal_scales(meal_plan, recipes, meal_plan.between(start_date, end_date))
+    recipe_scale = {}
+    for recipe_row, scale in zip(recipe_rows.tolist(), scales.tolist()):
+        name = recipes.name[recipe_row]
+        recipe_scale[name] = recipe_scale.get(name, 0.0) + scale
+
+    line_scales = np.fromiter((recipe_scale.get(name, 0.0) for name in recipe_ingredients.recipe),
+                              dtype=np.float64, count=len(recipe_ingredients))
+    amounts = np.nan_to_num(recipe_ingredients.quantity) * line_scales
+
+    totals = {}
+    for line in np.flatnonzero(line_scales).tolist():
+        key = (recipe_ingredients.ingredient[line], recipe_ingredients.unit[line])
+        totals[key] = totals.get(key, 0.0) + amounts[line]
+
+    return [(name, round(float(quantity), 2), unit)
+            for (name, unit), quantity in sorted(totals.items(), key=lambda item: (item[0][0].lower(), item[0][1]))]
+
+def ingredient_nutrients(names, ingredients, food_store=None):
+    """Per-100g values of every nutrient in ``ingredients.nutrients`` for ingredient names.
+
+    The user's Ingredients sheet is searched first, then the reference food store,
+    which supplies the nutrients it was built with (others count as zero).
+    Returns the (len(names) x nutrients) values and a mask of the names that were found.
+    """
+    rows = np.fromiter((ingredients.index.get(name, -1) for name in names), dtype=np.int64, count=len(names))
+    found = rows >= 0
+    values = np.zeros((len(names), len(ingredients.nutrients)))
+    values[found] = ingredients.nutrient_values[rows[found]]
+    if food_store is not None:
+        pairs = [(i, food_store.nutrients.index(column)) for i, column in enumerate(ingredients.nutrient_columns)
+                 if column in food_store.nutrients]
+        targets, sources = [i for i, _ in pairs], [j for _, j in pairs]
+        for i in np.flatnonzero(~found).tolist():
+            food_id = food_store.lookup(names[i])
+            if food_id is not None:
+                values[i, targets] = np.nan_to_num(food_store.macros(food_id)[sources])
+                found[i] = True
+    return values, found
+
+def calculate_recipe_totals(recipe_ingredients, ingredients, food_store=None):
+    """Total of every nutrient in ``ingredients.nutrients`` for a recipe.
+
+    ``recipe_ingredients`` are Recipe_Ingredients records, ``ingredients`` is the
+    IngredientsTable holding values per 100g and ``food_store`` an optional
+    FoodStore for reference foods not in the sheet.
+    """
+    values, _ = ingredient_nutrients([recipe_ing["Ingredient Name"] for recipe_ing in recipe_ingredients],
+                                     ingredients, food_store)
+    quantities = np.nan_to_num(np.array([parse_float(recipe_ing["Quantity"]) for recipe_ing in recipe_ingredients]))
+
+    # Calculate per 100g and scale by quantity
+    return ((quantities / 100.0) @ values if len(quantities) else np.zeros(values.shape[1])).tolist()
+
+def recipe_row_with_totals(recipe, nutrients, totals):
+    """Full Recipes row for the ``recipe`` record with the total column of each nutrient
+    replaced; nutrients the Recipes sheet has no column for are left out"""
+    row = dict(recipe)
+    for nutrient, total in zip(nutrients, totals):
+        if recipe_column(nutrient) in row:
+            row[recipe_column(nutrient)] = round(total, 2)
+    return list(row.values())
+
+def total_formulas(recipes_header, lines_header, ingredients_header):
+    """{Recipes total column: Sheets formula summing that nutrient over the recipe's ingredient lines}.
+
+    The formula text is the same in every row: it finds its recipe by
+    INDEX(name column, ROW()), so a client can write it into any row. Like
+    recompute_recipe_nutrition, quantities are grams of ingredients given per
+    100 g; lines naming an ingredient missing from the Ingredients sheet add
+    nothing, and a recipe without lines totals 0. Nutrients without a column in
+    both sheets are left out.
+    """
+    def letters(header, column):
+        return column_letters(header.index(column) + 1)
+
+    def lines(column):
+        letter = letters(lines_header, column)
+        return sheet_range("Recipe_Ingredients", f"${letter}$2:${letter}")
+
+    def ingredients(column):
+        letter = letters(ingredients_header, column)
+        return sheet_range("Ingredients", f"${letter}$2:${letter}")
+
+    name = letters(recipes_header, "Recipe Name")
+    match = f"{lines('Recipe Name')}=INDEX(${name}:${name},ROW())"
+    sources = {ingredient_nutrient(column): column for column in ingredients_header if ingredient_nutrient(column)}
+    formulas = {}
+    for column in recipes_header:
+        source = sources.get(recipe_nutrient(column))
+        if source:
+            formulas[column] = (f"=ARRAYFORMULA(IFERROR(ROUND(SUMPRODUCT(FILTER({lines('Quantity')},{match}),"
+                                f"XLOOKUP(FILTER({lines('Ingredient Name')},{match}),{ingredients('Ingredient Name')},"
+                                f"{ingredients(source)},0))/100,2),0))")
+    return formulas
+
+def recompute_recipe_nutrition(recipes, recipe_ingredients, ingredients, recipe_names=None, food_store=None):
+    """Recalculate recipe totals from their ingredients.
+
+    All nutrients are summed at once as one (recipes x nutrients) array. Returns
+    {sheet_row_index: updated_row} for the recipes whose stored totals changed,
+    ready for GoogleSheetsManager.update_rows.
+    """
+    line_recipes = np.fromiter((recipes.index.get(name, -1) for name in recipe_ingredients.recipe),
+                               dtype=np.int64, count=len(recipe_ingredients))
+    line_values, known = ingredient_nutrients(recipe_ingredients.ingredient, ingredients, food_store)
+    lines = line_recipes >= 0
+    has_lines = np.zeros(len(recipes), dtype=bool)
+    has_lines[line_recipes[lines]] = True
+
+    # Lines naming an unknown ingredient still mark the recipe but add nothing
+    lines &= known
+    totals = np.zeros((len(recipes), len(ingredients.nutrients)))
+    np.add.at(totals, line_recipes[lines],
+              line_values[lines] * (np.nan_to_num(recipe_ingredients.quantity[lines]) / 100.0)[:, None])
+
+    # Compare only the nutrients the Recipes sheet has a total column for
+    pairs = [(i, recipes.nutrients.index(nutrient)) for i, nutrient in enumerate(ingredients.nutrients)
+             if nutrient in recipes.nutrients]
+    computed, stored = [i for i, _ in pairs], [j for _, j in pairs]
+    differences = np.abs(np.round(totals[:, computed], 2) - recipes.nutrient_values[:, stored]) > 0.005
+
+    # Recipes without ingredient lines keep whatever totals were entered for them
+    changed = has_lines & np.any(differences, axis=1)
+    updates = {}
+    for i in np.flatnonzero(changed).tolist():
+        if recipe_names is None or recipes.name[i] in recipe_names:
+            updates[i + 2] = recipe_row_with_totals(recipes.record(i), ingredients.nutrients, totals[i].tolist())
+    return updates
+
+def meal_totals(meal_plan, recipes, mask):
+    """Amount of each nutrient in ``recipes.nutrients`` eaten across the meals selected by ``mask``"""
+    _, recipe_rows, scales = meal_scales(meal_plan, recipes, mask)
+    return (recipes.nutrient_values[recipe_rows] * scales[:, None]).sum(axis=0).tolist()
+
+def daily_total_values(meal_plan, recipes, start_date, end_date):
+    """(days x nutrients) array of the nutrition totals of every date in the range,
+    one column per nutrient in ``recipes.nutrients``"""
+    rows, recipe_rows, scales = meal_scales(meal_plan, recipes, meal_plan.between(start_date, end_date))
+    days = (end_date - start_date).days + 1
+    totals = np.zeros((days, len(recipes.nutrients)))
+    np.add.at(totals, meal_plan.day[rows] - start_date.toordinal(), recipes.nutrient_values[recipe_rows] * scales[:, None])
+    return totals
+
+def daily_totals(meal_plan, recipes, start_date, end_date):
+    """Per-day nutrition totals for every date in the range, as {date_str: totals}
+    with one value per nutrient in ``recipes.nutrients``"""
+    totals = daily_total_values(meal_plan, recipes, start_date, end_date)
+    days = len(totals)
+    return {(start_date + timedelta(days=offset)).strftime('%Y-%m-%d'): totals[offset].tolist() for offset in range(days)}
+
+def calendar_summary(meal_plan, recipes, start_date, end_date, rows=None):
+    """Number of meals and planned calories on each date in the range, as {date: [count, calories]}
+    for the dates that have meals. ``rows`` limits the pass to those meal plan rows, which lets a
+    calendar sum again only the days whose meals changed instead of the whole month."""
+    mask = meal_plan.between(start_date, end_date)
+    if rows is not None:
+        selected = np.zeros(len(meal_plan), dtype=bool)
+        selected[list(rows)] = True
+        mask &= selected
+    days = (end_date - start_date).days + 1
+    counts = np.bincount(meal_plan.day[mask] - start_date.toordinal(), minlength=days)
+    meal_rows, recipe_rows, scales = meal_scales(meal_plan, recipes, mask)
+    calories = np.bincount(meal_plan.day[meal_rows] - start_date.toordinal(),
+                           weights=recipes.macros[recipe_rows, 0] * scales, minlength=days)
+    return {start_date + timedelta(days=offset): [int(counts[offset]), float(calories[offset])]
+            for offset in np.flatnonzero(counts).tolist()}
+
+def meals_between(meal_plan, start_date, end_date):
+    """(day offset from start_date, meal type, recipe, portion) of every meal planned in the range, by date"""
+    rows = np.flatnonzero(meal_plan.between(start_date, end_date))
+    rows = rows[np.argsort(meal_plan.day[rows], kind="stable")].tolist()
+    portions = np.nan_to_num(meal_plan.portion, nan=1.0)
+    return [(int(meal_plan.day[row]) - start_date.toordinal(), meal_plan.meal_type[row], meal_plan.recipe[row],
+             float(portions[row])) for row in rows]
+
+def template_meals(templates, name):
+    """Meals of a saved template in the meals_between shape, and the template length in days"""
+    rows = templates.rows_with("Template Name", name)
+    days = np.nan_to_num(templates.day[rows], nan=1.0).astype(int)
+    lengths = templates.length[rows]
+    length = int(np.nanmax(lengths)) if len(rows) and np.isfinite(lengths).any() else int(days.max(initial=1))
+    portions = np.nan_to_num(templates.portion[rows], nan=1.0)
+    return [(int(day) - 1, templates.meal_type[row], templates.recipe[row], float(portion))
+            for row, day, portion in zip(rows, days, portions)], max(length, 1)
+
+def repeat_meals(meals, length, target_start, repeat=1, portion_scale=1.0):
+    """Meal plan rows placing ``meals`` (see meals_between) from target_start, ``repeat`` times
+    back to back (one every ``length`` days), with every portion multiplied by portion_scale"""
+    rows = []
+    for copy in range(repeat):
+        for offset, meal_type, recipe, portion in meals:
+            day = target_start + timedelta(days=copy * length + offset)
+            rows.append([day.strftime('%Y-%m-%d'), meal_type, recipe, round(portion * portion_scale, 2)])
+    return rows
+
+def copy_meals(meal_plan, start_date, end_date, target_start, repeat=1, portion_scale=1.0):
+    """Meal plan rows repeating the meals from start_date to end_date starting at target_start"""
+    return repeat_meals(meals_between(meal_plan, start_date, end_date), (end_date - start_date).days + 1,
+                        target_start, repeat, portion_scale)
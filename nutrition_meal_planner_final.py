@@ -1,4 +1,6 @@
 import sys
+import os
+import csv
 import json
 from datetime import datetime, date, timedelta
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
@@ -9,112 +11,430 @@ from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                                QTableWidget, QTableWidgetItem, QHeaderView,
                                QSpinBox, QDoubleSpinBox, QDateEdit, QMessageBox,
                                QDialog, QDialogButtonBox, QFormLayout, QScrollArea,
-                               QSplitter, QListWidget, QListWidgetItem, QCalendarWidget)
-from PySide6.QtCore import Qt, QTimer, QDate
-from PySide6.QtGui import QFont, QIcon, QAction
+                               QSplitter, QListWidget, QListWidgetItem, QCalendarWidget,
+                               QFileDialog, QInputDialog, QTableView)
+from PySide6.QtCore import Qt, QTimer, QDate, QObject, QRunnable, QThreadPool, Signal, QAbstractTableModel, QModelIndex
+from PySide6.QtGui import QFont, QIcon, QAction, QColor
 import qdarkstyle
-import gspread
 from googleapiclient.errors import HttpError
 import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas, NavigationToolbar2QT as NavigationToolbar
+import matplotlib.dates as mdates
 from matplotlib.figure import Figure
 import pandas as pd
+import numpy as np
+from nutrition_core import (GoogleSheetsManager, WriteConflict, IntegrityError, KEY_COLUMNS, DEFAULT_MEAL_SHARES, DEFAULT_DAILY_TARGETS,
+                            DEFAULT_ARCHIVE_MONTHS, archive_cutoff,
+                            auto_plan_meals, build_shopping_list, ingredient_nutrients, recipe_row_with_totals, recompute_recipe_nutrition,
+                            meal_totals, calendar_summary, meals_between, template_meals, repeat_meals, new_version)
+from nutrition_tables import VERSION_COLUMN, FORMULA_TOTALS_COLUMN, MEAL_PLAN_ARCHIVE_PREFIX, IngredientsTable, MealTemplatesTable, display_value, parse_float, table_type
+from ui_diagnostics import StallWatchdog, ActionProfiler
+from report_renderer import nutrient_colors
+from recipe_recommender import RecipeRecommender, meal_goal
+from table_query import TableQuery, parse_filter
+from nutrition_trends import daily_series, moving_average, min_max_indices
+from food_store import open_food_store
+from data_graph import ALL, DataGraph
+
+class LoadWorkerSignals(QObject):
+    finished = Signal(int, object)
+    failed = Signal(int, str)
+
+class LoadWorker(QRunnable):
+    def __init__(self, load_id, fetch):
+        super().__init__()
+        self.load_id = load_id
+        self.fetch = fetch
+        self.signals = LoadWorkerSignals()
 
-class GoogleSheetsManager:
-    def __init__(self, service_account_file="service_account_key.json"):
-        self.scopes = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
-        self.service_account_file = service_account_file
-        self.gc = None
-        self.spreadsheet = None
-        self.connect()
-
-    def connect(self):
+    def run(self):
         try:
-            self.gc = gspread.service_account(filename=self.service_account_file, scopes=self.scopes)
-            self.spreadsheet = self.gc.open("Nutrition Meal Planner Database")
-            return True
+            result = self.fetch()
         except Exception as e:
-            print(f"Error connecting to Google Sheets: {e}")
-            return False
+            self.signals.failed.emit(self.load_id, str(e))
+            return
+        self.signals.finished.emit(self.load_id, result)
+
+class LoadScheduler(QObject):
+    """Debounces UI-triggered sheet loads and runs them off the GUI thread.
+
+    Each consumer (e.g. the dashboard) names the sheets it needs and a callback.
+    Requests from the same consumer within ``delay_ms`` collapse into one, a load
+    already in flight for the same (or a larger) set of sheets is shared instead of
+    starting another, and a result is only delivered if no newer request from that
+    consumer has been made since - superseded results are dropped. Every load,
+    superseded or not, is announced through ``loaded`` since it refreshed the cache.
+    """
+    loaded = Signal(object)
+    load_failed = Signal(str)
+
+    def __init__(self, sheets_manager, parent=None, delay_ms=250):
+        super().__init__(parent)
+        self.sheets_manager = sheets_manager
+        self.delay_ms = delay_ms
+        self.pool = QThreadPool(self)
+        self.timers = {}
+        self.pending = {}
+        self.latest = {}
+        self.in_flight = {}
+        self.next_id = 0
+
+    def request(self, consumer, sheet_names, callback=None, delay_ms=None):
+        self.next_id += 1
+        self.latest[consumer] = self.next_id
+        self.pending[consumer] = (self.next_id, tuple(sheet_names), callback)
+
+        timer = self.timers.get(consumer)
+        if timer is None:
+            timer = QTimer(self)
+            timer.setSingleShot(True)
+            timer.timeout.connect(lambda consumer=consumer: self.start_load(consumer))
+            self.timers[consumer] = timer
+        timer.start(self.delay_ms if delay_ms is None else delay_ms)
+
+    def cancel(self, consumer):
+        """Drop any pending or in-flight result for a consumer"""
+        self.next_id += 1
+        self.latest[consumer] = self.next_id
+        self.pending.pop(consumer, None)
+        if consumer in self.timers:
+            self.timers[consumer].stop()
+
+    def start_load(self, consumer):
+        if consumer not in self.pending:
+            return
+        ticket, sheet_names, callback = self.pending.pop(consumer)
+        waiter = (consumer, ticket, callback)
+
+        for load in self.in_flight.values():
+            if set(sheet_names) <= load["sheets"]:
+                load["waiters"].append(waiter)
+                return
+
+        self.next_id += 1
+        load_id = self.next_id
+        worker = LoadWorker(load_id, lambda: self.sheets_manager.get_tables_batch(list(sheet_names)))
+        worker.signals.finished.connect(self.load_finished)
+        worker.signals.failed.connect(self.load_error)
+        self.in_flight[load_id] = {"sheets": frozenset(sheet_names), "waiters": [waiter], "worker": worker}
+        self.pool.start(worker)
+
+    def load_finished(self, load_id, tables):
+        load = self.in_flight.pop(load_id, None)
+        if load is None:
+            return
+        self.loaded.emit(tables)
+        for consumer, ticket, callback in load["waiters"]:
+            if self.latest.get(consumer) == ticket and callback is not None:
+                callback(tables)
+
+    def load_error(self, load_id, message):
+        load = self.in_flight.pop(load_id, None)
+        if load and any(self.latest.get(consumer) == ticket for consumer, ticket, _ in load["waiters"]):
+            self.load_failed.emit(message)
+
+class ChunkWorkerSignals(QObject):
+    chunk = Signal(int, object, object)
+    finished = Signal(int)
+    failed = Signal(int, str)
 
-    def get_worksheet(self, sheet_name):
+class ChunkWorker(QRunnable):
+    """Runs GoogleSheetsManager.iter_table_chunks and passes every chunk on as it arrives"""
+
+    def __init__(self, load_id, sheets_manager, sheet_name):
+        super().__init__()
+        self.load_id = load_id
+        self.sheets_manager = sheets_manager
+        self.sheet_name = sheet_name
+        self.cancelled = False
+        self.signals = ChunkWorkerSignals()
+
+    def run(self):
+        chunks = self.sheets_manager.iter_table_chunks(self.sheet_name)
         try:
-            return self.spreadsheet.worksheet(sheet_name)
+            for header, rows in chunks:
+                if self.cancelled:
+                    # Closing the generator stops the ranges not requested yet
+                    chunks.close()
+                    return
+                self.signals.chunk.emit(self.load_id, header, rows)
         except Exception as e:
-            print(f"Error getting worksheet {sheet_name}: {e}")
-            return None
+            self.signals.failed.emit(self.load_id, str(e))
+            return
+        self.signals.finished.emit(self.load_id)
 
-    def get_all_data(self, sheet_name):
-        worksheet = self.get_worksheet(sheet_name)
-        if worksheet:
-            return worksheet.get_all_records()
-        return []
+class ProgressiveLoader(QObject):
+    """Streams large sheets into their views chunk by chunk.
 
-    def add_row(self, sheet_name, data):
-        worksheet = self.get_worksheet(sheet_name)
-        if worksheet:
-            try:
-                worksheet.append_row(data)
-                return True
-            except Exception as e:
-                print(f"Error adding row to {sheet_name}: {e}")
-        return False
+    ``on_chunk(header, rows, first)`` is called on the GUI thread for every range
+    of rows as soon as it arrives, so the first screenful shows after one round
+    trip, and ``on_finished(table)`` once the whole sheet is cached. Loading a
+    sheet again, or cancel(), abandons the earlier load.
+    """
+    load_failed = Signal(str)
 
-    def update_row(self, sheet_name, row_index, data):
-        worksheet = self.get_worksheet(sheet_name)
-        if worksheet:
-            try:
-                for col_index, value in enumerate(data, start=1):
-                    worksheet.update_cell(row_index, col_index, value)
-                return True
-            except Exception as e:
-                print(f"Error updating row in {sheet_name}: {e}")
-        return False
-
-    def delete_row(self, sheet_name, row_index):
-        worksheet = self.get_worksheet(sheet_name)
-        if worksheet:
+    def __init__(self, sheets_manager, parent=None):
+        super().__init__(parent)
+        self.sheets_manager = sheets_manager
+        self.pool = QThreadPool(self)
+        self.loads = {}
+        self.next_id = 0
+
+    def load(self, sheet_name, on_chunk, on_finished=None):
+        self.cancel(sheet_name)
+        self.next_id += 1
+        worker = ChunkWorker(self.next_id, self.sheets_manager, sheet_name)
+        worker.signals.chunk.connect(self.chunk_arrived)
+        worker.signals.finished.connect(self.load_finished)
+        worker.signals.failed.connect(self.load_error)
+        self.loads[sheet_name] = {"id": self.next_id, "worker": worker, "on_chunk": on_chunk,
+                                  "on_finished": on_finished, "first": True}
+        self.pool.start(worker)
+
+    def cancel(self, sheet_name):
+        load = self.loads.pop(sheet_name, None)
+        if load:
+            load["worker"].cancelled = True
+
+    def is_loading(self, sheet_name):
+        return sheet_name in self.loads
+
+    def find(self, load_id):
+        for sheet_name, load in self.loads.items():
+            if load["id"] == load_id:
+                return sheet_name, load
+        return None, None
+
+    def chunk_arrived(self, load_id, header, rows):
+        _, load = self.find(load_id)
+        if load:
+            load["on_chunk"](header, rows, load["first"])
+            load["first"] = False
+
+    def load_finished(self, load_id):
+        sheet_name, load = self.find(load_id)
+        if load:
+            del self.loads[sheet_name]
+            if load["on_finished"]:
+                load["on_finished"](self.sheets_manager.get_table(sheet_name))
+
+    def load_error(self, load_id, message):
+        sheet_name, load = self.find(load_id)
+        if load:
+            del self.loads[sheet_name]
+            self.load_failed.emit(message)
+
+class OptimisticWriter(QObject):
+    """Applies edits to the cached tables at once and confirms them with Sheets in the background.
+
+    Writes run one at a time in submission order, so row numbers computed from the
+    local tables match the sheet when each write reaches it. A failed write puts
+    back the table as it was before that edit and reports ``write_failed``; once
+    no other writes to the sheet are outstanding, ``reconcile_needed`` asks for a
+    fresh download so edits queued behind the failed one show up again.
+
+    Rows are stamped with a new version on every add and update, and updates and
+    deletes only go through if the row still carries the version this client
+    read (see GoogleSheetsManager.locate_row). Otherwise the edit is undone the
+    same way and reported through ``write_conflict`` instead.
+    """
+    changed = Signal(str, object)
+    write_failed = Signal(str, str)
+    write_conflict = Signal(str)
+    reconcile_needed = Signal(str)
+
+    def __init__(self, sheets_manager, parent=None):
+        super().__init__(parent)
+        self.sheets_manager = sheets_manager
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.pending = {}
+        self.stale = set()
+        self.next_id = 0
+
+    def submit(self, sheet_name, apply_local, write_remote, description, touched=None):
+        self.submit_changes({sheet_name: apply_local}, write_remote, description,
+                            {sheet_name: touched} if touched else None)
+
+    def submit_changes(self, changes, write_remote, description, touched=None):
+        """Apply {sheet_name: apply_local} to the cached tables and confirm them all
+        with one remote write (e.g. a rename that cascades to other sheets).
+
+        ``touched`` gives, per sheet, the rows the edit changes as (rows before,
+        rows after); ``changed`` then reports the keys of those rows (see
+        SheetTable.change_keys) instead of the whole sheet.
+        """
+        touched = touched or {}
+        previous = {sheet_name: self.sheets_manager.get_table(sheet_name) for sheet_name in changes}
+        for sheet_name, apply_local in changes.items():
+            self.sheets_manager.begin_local_write(sheet_name, apply_local(previous[sheet_name]))
+        for sheet_name in changes:
+            keys = None
+            if sheet_name in touched:
+                before, after = touched[sheet_name]
+                old_keys = previous[sheet_name].change_keys(before)
+                new_keys = self.sheets_manager.get_table(sheet_name).change_keys(after)
+                if old_keys is not None:
+                    keys = old_keys | new_keys
+            self.changed.emit(sheet_name, keys)
+
+        def confirm():
             try:
-                worksheet.delete_rows(row_index)
-                return True
-            except Exception as e:
-                print(f"Error deleting row from {sheet_name}: {e}")
-        return False
+                return write_remote()
+            except WriteConflict as e:
+                return e
+
+        self.next_id += 1
+        worker = LoadWorker(self.next_id, confirm)
+        # Kept alive by self.pending so queued writes can still be withdrawn after a failure
+        worker.setAutoDelete(False)
+        worker.signals.finished.connect(self.write_finished)
+        worker.signals.failed.connect(self.write_error)
+        self.pending[self.next_id] = (previous, description, worker)
+        self.pool.start(worker)
+
+    def add_rows(self, sheet_name, rows, description):
+        table = self.sheets_manager.get_table(sheet_name)
+        rows = [table.stamped(row, new_version()) for row in rows]
+        self.submit(sheet_name, lambda table: table.appended(rows),
+                    lambda: self.sheets_manager.add_rows(sheet_name, rows), description,
+                    ((), range(len(table), len(table) + len(rows))))
+
+    def update_row(self, sheet_name, row_index, data, description):
+        table = self.sheets_manager.get_table(sheet_name)
+        expected_version = table.version(row_index - 2)
+        data = table.stamped(data, new_version())
+        self.submit(sheet_name, lambda table: table.replaced(row_index - 2, data),
+                    lambda: self.sheets_manager.update_row(sheet_name, row_index, data, expected_version), description,
+                    ([row_index - 2], [row_index - 2]))
+
+    def update_rows(self, sheet_name, rows_by_index, description):
+        """Overwrite several rows ({row_index: data}) with one batch write, e.g. recomputed recipe totals"""
+        table = self.sheets_manager.get_table(sheet_name)
+        rows_by_index = {row_index: table.stamped(data, new_version()) for row_index, data in rows_by_index.items()}
+        rows = [row_index - 2 for row_index in rows_by_index]
+        self.submit(sheet_name, lambda table: table.with_rows({row_index - 2: data for row_index, data in rows_by_index.items()}),
+                    lambda: self.sheets_manager.update_rows(sheet_name, rows_by_index), description, (rows, rows))
+
+    def rename_row(self, sheet_name, row_index, data, plan, description):
+        """update_row for a recipe or ingredient whose name changed, carrying the new
+        name over to the referencing rows in ``plan`` (see rename_plan)"""
+        table = self.sheets_manager.get_table(sheet_name)
+        expected_version = table.version(row_index - 2)
+        old_name = table.column(KEY_COLUMNS[sheet_name])[row_index - 2]
+        data = table.stamped(data, new_version())
+        changes = {sheet_name: lambda table: table.replaced(row_index - 2, data)}
+        touched = {sheet_name: ([row_index - 2], [row_index - 2])}
+        for ref_sheet, cells in plan.items():
+            changes[ref_sheet] = lambda table, cells=cells: table.with_cells(cells)
+            rows = {row for row, _ in cells}
+            touched[ref_sheet] = (rows, rows)
+        versions = self.linked_versions({ref_sheet: rows for ref_sheet, (rows, _) in touched.items() if ref_sheet != sheet_name})
+        self.submit_changes(changes, lambda: self.sheets_manager.rename_with_references(
+            sheet_name, row_index, data, plan, expected_version, old_name, versions), description, touched)
+
+    def linked_versions(self, plan_rows):
+        """Stamps of the referencing rows of a plan ({sheet: rows}) in row order, as read here"""
+        return {ref_sheet: [self.sheets_manager.get_table(ref_sheet).version(row) for row in sorted(rows)]
+                for ref_sheet, rows in plan_rows.items()}
+
+    def replace_recipe_lines(self, recipe_name, lines, recipe_data, description):
+        """Replace a recipe's ingredient lines and write ``recipe_data`` (e.g. its new
+        totals, None to leave the recipe as it is) as one edit with one remote write"""
+        line_table = self.sheets_manager.get_table("Recipe_Ingredients")
+        old_rows = list(line_table.rows_with("Recipe Name", recipe_name))
+        expected_versions = [line_table.version(row) for row in old_rows]
+        lines = [line_table.stamped(line, new_version()) for line in lines]
+        first = len(line_table) - len(old_rows)
+        changes = {"Recipe_Ingredients": lambda table: table.removed(*old_rows).appended(lines)}
+        touched = {"Recipe_Ingredients": (old_rows, range(first, first + len(lines)))}
+        recipes = self.sheets_manager.get_table("Recipes")
+        i = recipes.index.get(recipe_name)
+        recipe = None
+        if recipe_data is not None and i is not None:
+            data = recipes.stamped(recipe_data, new_version())
+            changes["Recipes"] = lambda table: table.replaced(i, data)
+            touched["Recipes"] = ([i], [i])
+            recipe = (i + 2, data, recipes.version(i))
+        self.submit_changes(changes, lambda: self.sheets_manager.save_recipe_lines(
+            recipe_name, expected_versions, lines, recipe), description, touched)
+
+    def delete_row(self, sheet_name, row_index, description, plan=None):
+        """Delete a row, plus the referencing rows in ``plan`` (see delete_plan) if given"""
+        table = self.sheets_manager.get_table(sheet_name)
+        expected_version = table.version(row_index - 2)
+        changes = {sheet_name: lambda table: table.removed(row_index - 2)}
+        touched = {sheet_name: ([row_index - 2], ())}
+        for ref_sheet, rows in (plan or {}).items():
+            changes[ref_sheet] = lambda table, rows=rows: table.removed(*rows)
+            touched[ref_sheet] = (rows, ())
+        if not plan:
+            write_remote = lambda: self.sheets_manager.delete_row(sheet_name, row_index, expected_version)
+        else:
+            name = table.column(KEY_COLUMNS[sheet_name])[row_index - 2]
+            versions = self.linked_versions(plan)
+            write_remote = lambda: self.sheets_manager.delete_with_references(
+                sheet_name, row_index, plan, expected_version, name, versions)
+        self.submit_changes(changes, write_remote, description, touched)
+
+    def write_finished(self, write_id, result):
+        if isinstance(result, WriteConflict):
+            self.write_error(write_id, str(result), conflict=True)
+            return
+        if not result:
+            self.write_error(write_id, "Google Sheets rejected the change")
+            return
+        previous = self.pending.pop(write_id)[0]
+        for sheet_name in previous:
+            self.sheets_manager.end_local_write(sheet_name)
+            self.check_reconcile(sheet_name)
+
+    def write_error(self, write_id, message, conflict=False):
+        previous, description, _ = self.pending.pop(write_id)
+        affected = set(previous)
+        # Later edits to these sheets were numbered against the failed one; drop those not started yet
+        for later_id, (later_previous, _, worker) in list(self.pending.items()):
+            if later_id > write_id and set(later_previous) & set(previous) and self.pool.tryTake(worker):
+                del self.pending[later_id]
+                for sheet_name in later_previous:
+                    self.sheets_manager.end_local_write(sheet_name)
+                affected.update(later_previous)
+        for sheet_name, table in previous.items():
+            self.sheets_manager.end_local_write(sheet_name, rollback_table=table)
+            self.changed.emit(sheet_name, None)
+        self.stale.update(affected)
+        if conflict:
+            self.write_conflict.emit(description)
+        else:
+            self.write_failed.emit(description, message)
+        for sheet_name in affected:
+            self.check_reconcile(sheet_name)
 
-    def clear_recipe_ingredients(self, recipe_name):
-        """Clear all ingredients for a specific recipe"""
-        worksheet = self.get_worksheet("Recipe_Ingredients")
-        if worksheet:
-            try:
-                all_data = worksheet.get_all_values()
-                rows_to_delete = []
-                
-                for i, row in enumerate(all_data[1:], start=2):  # Skip header row
-                    if row and row[0] == recipe_name:  # Recipe Name is in first column
-                        rows_to_delete.append(i)
-                
-                # Delete rows in reverse order to maintain indices
-                for row_index in reversed(rows_to_delete):
-                    worksheet.delete_rows(row_index)
-                
-                return True
-            except Exception as e:
-                print(f"Error clearing recipe ingredients: {e}")
-        return False
+    def check_reconcile(self, sheet_name):
+        if sheet_name in self.stale and not self.sheets_manager.pending_writes.get(sheet_name):
+            self.stale.discard(sheet_name)
+            self.reconcile_needed.emit(sheet_name)
 
 class MealPlanDialog(QDialog):
-    def __init__(self, parent=None, selected_date=None, meal_data=None):
+    def __init__(self, parent=None, selected_date=None, meal_data=None, meal_row=None):
         super().__init__(parent)
         self.selected_date = selected_date or date.today()
         self.meal_data = meal_data
+        # Meal_Plan row being edited, left out when working out what the day still needs
+        self.meal_row = meal_row
         self.available_recipes = []
         self.init_ui()
         self.load_available_recipes()
+        # Load data if editing
+        if self.meal_data:
+            self.load_data()
+        self.meal_type_combo.currentIndexChanged.connect(self.update_suggestions)
+        self.update_suggestions()
 
     def init_ui(self):
         self.setWindowTitle(f"Plan Meal for {self.selected_date.strftime('%Y-%m-%d')}")
         self.setModal(True)
-        self.resize(400, 300)
+        self.resize(450, 450)
 
         layout = QVBoxLayout(self)
 
@@ -147,28 +467,65 @@ class MealPlanDialog(QDialog):
 
         layout.addLayout(form_layout)
 
+        # Recipes that best fill what is left of the day's targets
+        suggestions_group = QGroupBox("Suggestions")
+        suggestions_layout = QVBoxLayout(suggestions_group)
+        self.suggestions_label = QLabel()
+        self.suggestions_label.setWordWrap(True)
+        suggestions_layout.addWidget(self.suggestions_label)
+        self.suggestions_list = QListWidget()
+        self.suggestions_list.itemClicked.connect(self.use_suggestion)
+        suggestions_layout.addWidget(self.suggestions_list)
+        layout.addWidget(suggestions_group)
+
         # Buttons
         buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         buttons.accepted.connect(self.accept)
         buttons.rejected.connect(self.reject)
         layout.addWidget(buttons)
 
-        # Load data if editing
-        if self.meal_data:
-            self.load_data()
-
     def load_available_recipes(self):
         try:
             sheets_manager = self.parent().sheets_manager
-            recipes_data = sheets_manager.get_all_data("Recipes")
-            self.available_recipes = recipes_data
-            
+            self.available_recipes = sheets_manager.get_table("Recipes")
+
             self.recipe_combo.clear()
-            for recipe in recipes_data:
-                self.recipe_combo.addItem(recipe.get("Recipe Name", ""))
+            for recipe_name in self.available_recipes.name:
+                self.recipe_combo.addItem(recipe_name)
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Failed to load recipes: {e}")
 
+    def update_suggestions(self):
+        self.suggestions_list.clear()
+        try:
+            main_window = self.parent()
+            meal_plan = main_window.sheets_manager.get_meal_plan(self.selected_date, self.selected_date, cached_only=True)
+            mask = meal_plan.between(self.selected_date, self.selected_date)
+            if self.meal_row is not None:
+                mask[self.meal_row] = False
+            planned = np.flatnonzero(mask).tolist()
+            meal_type = self.meal_type_combo.currentText()
+            goal = meal_goal(meal_plan, self.available_recipes, mask, main_window.daily_targets(), meal_type,
+                             {meal_plan.meal_type[row] for row in planned})
+            # Like auto-plan, don't suggest a recipe that is already on the day
+            suggestions = main_window.recipe_recommender().suggest(goal, exclude={meal_plan.recipe[row] for row in planned})
+        except Exception as e:
+            print(f"Error suggesting recipes: {e}")
+            return
+
+        self.suggestions_label.setText(f"{meal_type} should bring about {goal[0]:.0f} kcal, {goal[1]:.0f} g protein, "
+                                       f"{goal[2]:.0f} g carbohydrates and {goal[3]:.0f} g fat.")
+        for name, portion, macros in suggestions:
+            item = QListWidgetItem(f"{name} x {portion:g}  ({macros[0]:.0f} kcal, {macros[1]:.0f} P / "
+                                   f"{macros[2]:.0f} C / {macros[3]:.0f} F)")
+            item.setData(Qt.UserRole, (name, portion))
+            self.suggestions_list.addItem(item)
+
+    def use_suggestion(self, item):
+        name, portion = item.data(Qt.UserRole)
+        self.recipe_combo.setCurrentIndex(self.recipe_combo.findText(name))
+        self.portion_size_spin.setValue(portion)
+
     def load_data(self):
         # Set meal type
         meal_type = self.meal_data.get("Meal Type", "Breakfast")
@@ -197,15 +554,454 @@ class MealPlanDialog(QDialog):
             "Portion Size (for the meal plan, referring to the recipe's portion size)": self.portion_size_spin.value()
         }
 
+class AutoPlanDialog(QDialog):
+    def __init__(self, parent=None, start_date=None):
+        super().__init__(parent)
+        self.start_date = start_date or date.today()
+        self.available_recipes = None
+        self.plan_rows = []
+        self.init_ui()
+        self.load_available_recipes()
+
+    def init_ui(self):
+        self.setWindowTitle("Auto-plan Meals")
+        self.setModal(True)
+        self.resize(700, 650)
+
+        layout = QVBoxLayout(self)
+
+        form_layout = QFormLayout()
+
+        # Date range
+        self.from_date_edit = QDateEdit()
+        self.from_date_edit.setCalendarPopup(True)
+        self.from_date_edit.setDate(QDate(self.start_date))
+        self.to_date_edit = QDateEdit()
+        self.to_date_edit.setCalendarPopup(True)
+        self.to_date_edit.setDate(QDate(self.start_date + timedelta(days=6)))
+        form_layout.addRow("From:", self.from_date_edit)
+        form_layout.addRow("To:", self.to_date_edit)
+
+        # Daily targets
+        self.calories_target = QDoubleSpinBox()
+        self.calories_target.setMaximum(9999.0)
+        self.calories_target.setValue(DEFAULT_DAILY_TARGETS[0])
+        self.protein_target = QDoubleSpinBox()
+        self.protein_target.setMaximum(999.0)
+        self.protein_target.setValue(DEFAULT_DAILY_TARGETS[1])
+        self.carbs_target = QDoubleSpinBox()
+        self.carbs_target.setMaximum(999.0)
+        self.carbs_target.setValue(DEFAULT_DAILY_TARGETS[2])
+        self.fat_target = QDoubleSpinBox()
+        self.fat_target.setMaximum(999.0)
+        self.fat_target.setValue(DEFAULT_DAILY_TARGETS[3])
+        form_layout.addRow("Daily Calories:", self.calories_target)
+        form_layout.addRow("Daily Protein (g):", self.protein_target)
+        form_layout.addRow("Daily Carbohydrates (g):", self.carbs_target)
+        form_layout.addRow("Daily Fat (g):", self.fat_target)
+
+        # Meal slots
+        slots_layout = QHBoxLayout()
+        self.meal_type_checks = {}
+        for meal_type in DEFAULT_MEAL_SHARES:
+            check = QCheckBox(meal_type)
+            check.setChecked(meal_type != "Snack")
+            self.meal_type_checks[meal_type] = check
+            slots_layout.addWidget(check)
+        form_layout.addRow("Meals per day:", slots_layout)
+
+        # Variety
+        self.max_uses_spin = QSpinBox()
+        self.max_uses_spin.setMinimum(0)
+        self.max_uses_spin.setMaximum(99)
+        self.max_uses_spin.setValue(2)
+        self.max_uses_spin.setSpecialValueText("Unlimited")
+        form_layout.addRow("Max uses per recipe:", self.max_uses_spin)
+
+        layout.addLayout(form_layout)
+
+        # Excluded recipes
+        layout.addWidget(QLabel("Exclude recipes:"))
+        self.excluded_list = QListWidget()
+        self.excluded_list.setSelectionMode(QListWidget.MultiSelection)
+        self.excluded_list.setMaximumHeight(120)
+        layout.addWidget(self.excluded_list)
+
+        generate_button = QPushButton("Generate Plan")
+        generate_button.clicked.connect(self.generate_plan)
+        layout.addWidget(generate_button)
+
+        # Preview
+        self.preview_table = QTableWidget()
+        self.preview_table.setColumnCount(4)
+        self.preview_table.setHorizontalHeaderLabels(["Date", "Meal Type", "Recipe Name", "Portion Size"])
+        self.preview_table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.preview_table)
+
+        # Buttons
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def load_available_recipes(self):
+        try:
+            sheets_manager = self.parent().sheets_manager
+            self.available_recipes = sheets_manager.get_table("Recipes")
+
+            self.excluded_list.clear()
+            for recipe_name in self.available_recipes.name:
+                self.excluded_list.addItem(recipe_name)
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Failed to load recipes: {e}")
+
+    def generate_plan(self):
+        start = self.from_date_edit.date().toPython()
+        end = self.to_date_edit.date().toPython()
+        if end < start:
+            QMessageBox.warning(self, "Warning", "The end date must not be before the start date.")
+            return
+
+        meal_types = [meal_type for meal_type, check in self.meal_type_checks.items() if check.isChecked()]
+        if not meal_types:
+            QMessageBox.warning(self, "Warning", "Please select at least one meal type.")
+            return
+
+        targets = [self.calories_target.value(), self.protein_target.value(),
+                   self.carbs_target.value(), self.fat_target.value()]
+        excluded = {item.text() for item in self.excluded_list.selectedItems()}
+        if self.available_recipes is None:
+            return
+
+        self.plan_rows = auto_plan_meals(self.available_recipes, targets, start, end,
+                                         meal_types=meal_types, max_uses=self.max_uses_spin.value(),
+                                         excluded=excluded)
+        if not self.plan_rows:
+            QMessageBox.warning(self, "Warning", "No recipes with calculated nutrition are available to plan with.")
+
+        self.preview_table.setRowCount(len(self.plan_rows))
+        for row, plan_row in enumerate(self.plan_rows):
+            for col, value in enumerate(plan_row):
+                self.preview_table.setItem(row, col, QTableWidgetItem(str(value)))
+        self.preview_table.resizeColumnsToContents()
+
+    def accept(self):
+        if not self.plan_rows:
+            QMessageBox.warning(self, "Warning", "Please generate a plan first.")
+            return
+        super().accept()
+
+    def get_rows(self):
+        return self.plan_rows
+
+class ShoppingListDialog(QDialog):
+    def __init__(self, parent=None, start_date=None):
+        super().__init__(parent)
+        self.start_date = start_date or date.today()
+        self.shopping_list = []
+        self.init_ui()
+        self.update_shopping_list()
+
+    def init_ui(self):
+        self.setWindowTitle("Shopping List")
+        self.resize(500, 600)
+
+        layout = QVBoxLayout(self)
+
+        # Date range
+        range_layout = QHBoxLayout()
+        self.from_date_edit = QDateEdit()
+        self.from_date_edit.setCalendarPopup(True)
+        self.from_date_edit.setDate(QDate(self.start_date))
+        self.to_date_edit = QDateEdit()
+        self.to_date_edit.setCalendarPopup(True)
+        self.to_date_edit.setDate(QDate(self.start_date + timedelta(days=6)))
+        self.from_date_edit.dateChanged.connect(self.update_shopping_list)
+        self.to_date_edit.dateChanged.connect(self.update_shopping_list)
+        range_layout.addWidget(QLabel("From:"))
+        range_layout.addWidget(self.from_date_edit)
+        range_layout.addWidget(QLabel("To:"))
+        range_layout.addWidget(self.to_date_edit)
+        range_layout.addStretch()
+        layout.addLayout(range_layout)
+
+        # Shopping list table
+        self.shopping_table = QTableWidget()
+        self.shopping_table.setColumnCount(3)
+        self.shopping_table.setHorizontalHeaderLabels(["Ingredient", "Quantity", "Unit"])
+        self.shopping_table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.shopping_table)
+
+        # Buttons
+        button_layout = QHBoxLayout()
+        export_button = QPushButton("Export CSV...")
+        close_button = QPushButton("Close")
+
+        export_button.clicked.connect(self.export_csv)
+        close_button.clicked.connect(self.accept)
+
+        button_layout.addWidget(export_button)
+        button_layout.addStretch()
+        button_layout.addWidget(close_button)
+        layout.addLayout(button_layout)
+
+    def update_shopping_list(self):
+        try:
+            sheets_manager = self.parent().sheets_manager
+            self.shopping_list = build_shopping_list(
+                sheets_manager.get_meal_plan(self.from_date_edit.date().toPython(), self.to_date_edit.date().toPython()),
+                sheets_manager.get_table("Recipes"),
+                sheets_manager.get_table("Recipe_Ingredients"),
+                self.from_date_edit.date().toPython(),
+                self.to_date_edit.date().toPython()
+            )
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Failed to build shopping list: {e}")
+            return
+
+        self.shopping_table.setRowCount(len(self.shopping_list))
+        for row, (ingredient_name, quantity, unit) in enumerate(self.shopping_list):
+            self.shopping_table.setItem(row, 0, QTableWidgetItem(ingredient_name))
+            self.shopping_table.setItem(row, 1, QTableWidgetItem(f"{quantity:g}"))
+            self.shopping_table.setItem(row, 2, QTableWidgetItem(unit))
+        self.shopping_table.resizeColumnsToContents()
+
+    def export_csv(self):
+        file_name, _ = QFileDialog.getSaveFileName(self, "Export Shopping List", "shopping_list.csv", "CSV Files (*.csv)")
+        if not file_name:
+            return
+        try:
+            with open(file_name, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["Ingredient", "Quantity", "Unit"])
+                writer.writerows(self.shopping_list)
+            QMessageBox.information(self, "Success", f"Shopping list exported to {file_name}")
+        except OSError as e:
+            QMessageBox.warning(self, "Error", f"Failed to export shopping list: {e}")
+
+class CopyMealsDialog(QDialog):
+    """Copy the meals of a day, a week or a saved template to other dates"""
+    DAY, WEEK = 0, 1
+
+    def __init__(self, parent=None, selected_date=None):
+        super().__init__(parent)
+        self.selected_date = selected_date or date.today()
+        self.sheets_manager = parent.sheets_manager
+        self.plan_rows = []
+        self.init_ui()
+        self.load_templates()
+        self.update_preview()
+
+    def init_ui(self):
+        self.setWindowTitle("Copy Meals")
+        self.setModal(True)
+        self.resize(600, 550)
+
+        layout = QVBoxLayout(self)
+        form_layout = QFormLayout()
+
+        self.source_combo = QComboBox()
+        self.source_combo.currentIndexChanged.connect(self.source_changed)
+        form_layout.addRow("Copy:", self.source_combo)
+
+        self.from_date_edit = QDateEdit()
+        self.from_date_edit.setCalendarPopup(True)
+        self.from_date_edit.setDate(QDate(self.selected_date))
+        self.from_date_edit.dateChanged.connect(self.update_preview)
+        form_layout.addRow("Starting on:", self.from_date_edit)
+
+        self.target_date_edit = QDateEdit()
+        self.target_date_edit.setCalendarPopup(True)
+        self.target_date_edit.setDate(QDate(self.selected_date + timedelta(days=1)))
+        self.target_date_edit.dateChanged.connect(self.update_preview)
+        form_layout.addRow("To:", self.target_date_edit)
+
+        self.repeat_spin = QSpinBox()
+        self.repeat_spin.setRange(1, 52)
+        self.repeat_spin.setSuffix(" time(s)")
+        self.repeat_spin.valueChanged.connect(self.update_preview)
+        form_layout.addRow("Repeat:", self.repeat_spin)
+
+        self.scale_spin = QDoubleSpinBox()
+        self.scale_spin.setRange(0.1, 10.0)
+        self.scale_spin.setSingleStep(0.25)
+        self.scale_spin.setValue(1.0)
+        self.scale_spin.valueChanged.connect(self.update_preview)
+        form_layout.addRow("Portion scale:", self.scale_spin)
+        layout.addLayout(form_layout)
+
+        template_layout = QHBoxLayout()
+        self.save_template_button = QPushButton("Save as Template...")
+        self.save_template_button.clicked.connect(self.save_template)
+        self.delete_template_button = QPushButton("Delete Template")
+        self.delete_template_button.clicked.connect(self.delete_template)
+        template_layout.addWidget(self.save_template_button)
+        template_layout.addWidget(self.delete_template_button)
+        template_layout.addStretch()
+        layout.addLayout(template_layout)
+
+        # Preview
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+        self.preview_table = QTableWidget()
+        self.preview_table.setColumnCount(4)
+        self.preview_table.setHorizontalHeaderLabels(["Date", "Meal Type", "Recipe Name", "Portion Size"])
+        self.preview_table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.preview_table)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def load_templates(self, selected=None):
+        try:
+            self.templates = self.sheets_manager.get_templates()
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Failed to load templates: {e}")
+            self.templates = MealTemplatesTable.from_values([])
+        self.source_combo.blockSignals(True)
+        self.source_combo.clear()
+        self.source_combo.addItems(["Day", "Week (7 days)"])
+        for name in self.templates.names:
+            self.source_combo.addItem(f"Template: {name}", name)
+        if selected in self.templates.names:
+            self.source_combo.setCurrentIndex(self.source_combo.findData(selected))
+        self.source_combo.blockSignals(False)
+        self.source_changed()
+
+    def template_name(self):
+        return self.source_combo.currentData()
+
+    def source_length(self):
+        return 7 if self.source_combo.currentIndex() == self.WEEK else 1
+
+    def source_changed(self):
+        is_template = self.template_name() is not None
+        self.from_date_edit.setEnabled(not is_template)
+        self.save_template_button.setEnabled(not is_template)
+        self.delete_template_button.setEnabled(is_template)
+        if not is_template:
+            start = self.from_date_edit.date().toPython()
+            self.target_date_edit.setDate(QDate(start + timedelta(days=self.source_length())))
+        self.update_preview()
+
+    def source_meals(self):
+        """Meals to copy in the meals_between shape, and the number of days they span"""
+        name = self.template_name()
+        if name is not None:
+            return template_meals(self.templates, name)
+        start = self.from_date_edit.date().toPython()
+        end = start + timedelta(days=self.source_length() - 1)
+        return meals_between(self.sheets_manager.get_meal_plan(start, end), start, end), self.source_length()
+
+    def update_preview(self):
+        try:
+            meals, length = self.source_meals()
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Failed to load meals: {e}")
+            meals, length = [], 1
+        self.plan_rows = repeat_meals(meals, length, self.target_date_edit.date().toPython(),
+                                      self.repeat_spin.value(), self.scale_spin.value())
+        if self.plan_rows:
+            self.summary_label.setText(f"{len(self.plan_rows)} meals from {self.plan_rows[0][0]} to {self.plan_rows[-1][0]}")
+        else:
+            self.summary_label.setText("No meals to copy")
+
+        self.preview_table.setRowCount(len(self.plan_rows))
+        for row, plan_row in enumerate(self.plan_rows):
+            for col, value in enumerate(plan_row):
+                self.preview_table.setItem(row, col, QTableWidgetItem(str(value)))
+        self.preview_table.resizeColumnsToContents()
+
+    def save_template(self):
+        meals, length = self.source_meals()
+        if not meals:
+            QMessageBox.warning(self, "Warning", "There are no meals to save on the selected day or week.")
+            return
+        name, ok = QInputDialog.getText(self, "Save as Template", "Template name:")
+        name = name.strip()
+        if not ok or not name:
+            return
+        try:
+            self.sheets_manager.save_template(name, meals, length)
+        except IntegrityError as e:
+            QMessageBox.warning(self, "Warning", str(e))
+            return
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Failed to save template: {e}")
+            return
+        self.load_templates(selected=name)
+
+    def delete_template(self):
+        name = self.template_name()
+        reply = QMessageBox.question(self, "Confirm Delete", f"Are you sure you want to delete the template '{name}'?")
+        if reply != QMessageBox.Yes:
+            return
+        try:
+            self.sheets_manager.delete_template(name)
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Failed to delete template: {e}")
+            return
+        self.load_templates()
+
+    def accept(self):
+        if not self.plan_rows:
+            QMessageBox.warning(self, "Warning", "There are no meals to copy.")
+            return
+        super().accept()
+
+    def get_rows(self):
+        return self.plan_rows
+
+class ReportDialog(QDialog):
+    def __init__(self, parent=None, start_date=None):
+        super().__init__(parent)
+        start_date = start_date or date.today().replace(day=1)
+        self.setWindowTitle("Export Report")
+
+        layout = QFormLayout(self)
+        self.from_date_edit = QDateEdit()
+        self.from_date_edit.setCalendarPopup(True)
+        self.from_date_edit.setDate(QDate(start_date))
+        self.to_date_edit = QDateEdit()
+        self.to_date_edit.setCalendarPopup(True)
+        self.to_date_edit.setDate(QDate(date.today()))
+        self.format_combo = QComboBox()
+        self.format_combo.addItems(["PDF file", "PNG images (one per page)"])
+        layout.addRow("From:", self.from_date_edit)
+        layout.addRow("To:", self.to_date_edit)
+        layout.addRow("Format:", self.format_combo)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+
+    def get_range(self):
+        return self.from_date_edit.date().toPython(), self.to_date_edit.date().toPython()
+
+    def is_pdf(self):
+        return self.format_combo.currentIndex() == 0
+
 class RecipeIngredientsDialog(QDialog):
-    def __init__(self, parent=None, recipe_name="", ingredients_list=None):
+    def __init__(self, parent=None, recipe_name="", ingredients_list=None, recipe_data=None):
         super().__init__(parent)
         self.recipe_name = recipe_name
         self.ingredients_list = ingredients_list or []
+        # Fields of a recipe still being added, whose row isn't in the Recipes table yet
+        self.recipe_data = recipe_data or {}
+        # The recipe's Recipes row with the saved totals, once saved
+        self.saved_recipe = None
+        self.ingredients = IngredientsTable.from_values([])
         self.available_ingredients = []
         self.recipe_ingredients = []
+        # Per-100g nutrient values of each recipe line and the running recipe totals
+        self.line_values = []
+        self.totals = np.zeros(0)
         self.init_ui()
         self.load_available_ingredients()
+        self.load_recipe_ingredients()
 
     def init_ui(self):
         self.setWindowTitle(f"Manage Ingredients for: {self.recipe_name}")
@@ -230,6 +1026,15 @@ class RecipeIngredientsDialog(QDialog):
         left_widget = QWidget()
         left_layout = QVBoxLayout(left_widget)
         left_layout.addWidget(QLabel("Available Ingredients:"))
+
+        self.search_edit = QLineEdit()
+        food_store = self.parent().food_store
+        if food_store is not None:
+            self.search_edit.setPlaceholderText(f"Search your ingredients and {len(food_store)} reference foods...")
+        else:
+            self.search_edit.setPlaceholderText("Search ingredients...")
+        self.search_edit.textChanged.connect(self.filter_available_ingredients)
+        left_layout.addWidget(self.search_edit)
         
         self.available_list = QListWidget()
         left_layout.addWidget(self.available_list)
@@ -248,11 +1053,24 @@ class RecipeIngredientsDialog(QDialog):
         self.recipe_ingredients_table = QTableWidget()
         self.recipe_ingredients_table.setColumnCount(3)
         self.recipe_ingredients_table.setHorizontalHeaderLabels(["Ingredient", "Quantity", "Unit"])
+        self.recipe_ingredients_table.itemChanged.connect(self.recipe_ingredient_edited)
         right_layout.addWidget(self.recipe_ingredients_table)
         
         remove_button = QPushButton("← Remove from Recipe")
         remove_button.clicked.connect(self.remove_ingredient_from_recipe)
         right_layout.addWidget(remove_button)
+
+        # Live nutrition totals
+        nutrition_group = QGroupBox("Nutrition")
+        nutrition_layout = QVBoxLayout(nutrition_group)
+        self.nutrition_table = QTableWidget()
+        self.nutrition_table.setColumnCount(3)
+        self.nutrition_table.setHorizontalHeaderLabels(["Nutrient", "Total", "Per Serving"])
+        self.nutrition_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.nutrition_table.verticalHeader().setVisible(False)
+        self.nutrition_table.horizontalHeader().setStretchLastSection(True)
+        nutrition_layout.addWidget(self.nutrition_table)
+        right_layout.addWidget(nutrition_group)
         
         splitter.addWidget(right_widget)
 
@@ -268,45 +1086,100 @@ class RecipeIngredientsDialog(QDialog):
         button_layout.addWidget(cancel_button)
         layout.addLayout(button_layout)
 
-        # Load existing recipe ingredients
-        self.load_recipe_ingredients()
-
     def load_available_ingredients(self):
         try:
             sheets_manager = self.parent().sheets_manager
-            ingredients_data = sheets_manager.get_all_data("Ingredients")
-            self.available_ingredients = ingredients_data
-            
-            self.available_list.clear()
-            for ingredient in ingredients_data:
-                item = QListWidgetItem(ingredient.get("Ingredient Name", ""))
-                self.available_list.addItem(item)
+            self.ingredients = sheets_manager.get_table("Ingredients")
+            self.available_ingredients = self.ingredients.name
+            self.filter_available_ingredients(self.search_edit.text())
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Failed to load ingredients: {e}")
 
+    def filter_available_ingredients(self, text):
+        """List the user's ingredients containing ``text``, then reference foods starting with it"""
+        folded = text.strip().casefold()
+        names = [name for name in self.available_ingredients if folded in name.casefold()]
+
+        self.available_list.clear()
+        for name in names:
+            self.available_list.addItem(QListWidgetItem(name))
+
+        food_store = self.parent().food_store
+        if food_store is not None and folded:
+            own = {name.casefold() for name in self.available_ingredients}
+            for name in food_store.search(folded):
+                if name.casefold() not in own:
+                    item = QListWidgetItem(name)
+                    item.setToolTip("Reference food (values per 100g)")
+                    self.available_list.addItem(item)
+
     def load_recipe_ingredients(self):
         try:
-            sheets_manager = self.parent().sheets_manager
-            recipe_ingredients_data = sheets_manager.get_all_data("Recipe_Ingredients")
-            
-            # Filter for current recipe
-            current_recipe_ingredients = [
-                ing for ing in recipe_ingredients_data 
-                if ing.get("Recipe Name") == self.recipe_name
-            ]
-            
-            self.recipe_ingredients = current_recipe_ingredients
+            lines = self.parent().sheets_manager.get_table("Recipe_Ingredients")
+            self.recipe_ingredients = [lines.record(row) for row in lines.rows_with("Recipe Name", self.recipe_name)]
             self.update_recipe_ingredients_table()
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Failed to load recipe ingredients: {e}")
 
+        # Full calculation once; every later change adds or subtracts one line's contribution
+        values, _ = ingredient_nutrients([ing["Ingredient Name"] for ing in self.recipe_ingredients],
+                                         self.ingredients, self.parent().food_store)
+        self.line_values = list(values)
+        self.totals = np.zeros(len(self.ingredients.nutrients))
+        for line in range(len(self.recipe_ingredients)):
+            self.totals += self.line_contribution(line)
+        self.update_nutrition_table()
+
+    def line_contribution(self, line):
+        """Nutrients one recipe line adds to the recipe"""
+        quantity = np.nan_to_num(parse_float(self.recipe_ingredients[line].get("Quantity", 0)))
+        return self.line_values[line] * (quantity / 100.0)
+
+    def update_nutrition_table(self):
+        recipes = self.parent().sheets_manager.get_table("Recipes")
+        i = recipes.index.get(self.recipe_name)
+        servings = recipes.servings[i] if i is not None else 1.0
+        servings = servings if np.isfinite(servings) and servings > 0 else 1.0
+
+        nutrients = self.ingredients.nutrients
+        self.nutrition_table.setRowCount(len(nutrients))
+        for row, (nutrient, total) in enumerate(zip(nutrients, self.totals.tolist())):
+            self.nutrition_table.setItem(row, 0, QTableWidgetItem(nutrient))
+            self.nutrition_table.setItem(row, 1, QTableWidgetItem(f"{total:.1f}"))
+            self.nutrition_table.setItem(row, 2, QTableWidgetItem(f"{total / servings:.1f}"))
+
     def update_recipe_ingredients_table(self):
+        self.recipe_ingredients_table.blockSignals(True)
         self.recipe_ingredients_table.setRowCount(len(self.recipe_ingredients))
         
         for row, ingredient in enumerate(self.recipe_ingredients):
-            self.recipe_ingredients_table.setItem(row, 0, QTableWidgetItem(ingredient.get("Ingredient Name", "")))
+            name_item = QTableWidgetItem(ingredient.get("Ingredient Name", ""))
+            name_item.setFlags(name_item.flags() & ~Qt.ItemIsEditable)
+            self.recipe_ingredients_table.setItem(row, 0, name_item)
             self.recipe_ingredients_table.setItem(row, 1, QTableWidgetItem(str(ingredient.get("Quantity", ""))))
             self.recipe_ingredients_table.setItem(row, 2, QTableWidgetItem(ingredient.get("Unit (of ingredient, e.g., grams, ml)", "")))
+        self.recipe_ingredients_table.blockSignals(False)
+
+    def recipe_ingredient_edited(self, item):
+        row = item.row()
+        ingredient = self.recipe_ingredients[row]
+        if item.column() == 2:
+            ingredient["Unit (of ingredient, e.g., grams, ml)"] = item.text()
+            return
+        if item.column() != 1:
+            return
+
+        quantity = parse_float(item.text())
+        if not np.isfinite(quantity) or quantity < 0:
+            QMessageBox.warning(self, "Warning", "Please enter a valid quantity.")
+            self.recipe_ingredients_table.blockSignals(True)
+            item.setText(str(ingredient.get("Quantity", "")))
+            self.recipe_ingredients_table.blockSignals(False)
+            return
+        self.totals -= self.line_contribution(row)
+        ingredient["Quantity"] = quantity
+        self.totals += self.line_contribution(row)
+        self.update_nutrition_table()
 
     def add_ingredient_to_recipe(self):
         current_item = self.available_list.currentItem()
@@ -340,7 +1213,11 @@ class RecipeIngredientsDialog(QDialog):
         }
         
         self.recipe_ingredients.append(new_ingredient)
+        values, _ = ingredient_nutrients([ingredient_name], self.ingredients, self.parent().food_store)
+        self.line_values.append(values[0])
+        self.totals += self.line_contribution(len(self.recipe_ingredients) - 1)
         self.update_recipe_ingredients_table()
+        self.update_nutrition_table()
 
     def remove_ingredient_from_recipe(self):
         current_row = self.recipe_ingredients_table.currentRow()
@@ -350,8 +1227,14 @@ class RecipeIngredientsDialog(QDialog):
 
         reply = QMessageBox.question(self, "Confirm Remove", "Remove this ingredient from the recipe?")
         if reply == QMessageBox.Yes:
+            self.totals -= self.line_contribution(current_row)
             del self.recipe_ingredients[current_row]
+            del self.line_values[current_row]
+            if not self.recipe_ingredients:
+                # Start again from exact zeros rather than accumulated rounding
+                self.totals = np.zeros(len(self.ingredients.nutrients))
             self.update_recipe_ingredients_table()
+            self.update_nutrition_table()
 
     def get_quantity_input(self):
         from PySide6.QtWidgets import QInputDialog
@@ -366,83 +1249,47 @@ class RecipeIngredientsDialog(QDialog):
 
     def save_ingredients(self):
         try:
-            sheets_manager = self.parent().sheets_manager
-            
-            # Clear existing ingredients for this recipe
-            sheets_manager.clear_recipe_ingredients(self.recipe_name)
-            
-            # Add all current ingredients
-            for ingredient in self.recipe_ingredients:
-                data_list = [
-                    ingredient["Recipe Name"],
-                    ingredient["Ingredient Name"],
-                    ingredient["Quantity"],
-                    ingredient["Unit (of ingredient, e.g., grams, ml)"]
-                ]
-                sheets_manager.add_row("Recipe_Ingredients", data_list)
-            
-            # Calculate and update recipe nutrition
-            self.calculate_recipe_nutrition()
-            
-            QMessageBox.information(self, "Success", "Recipe ingredients saved successfully!")
+            main_window = self.parent()
+            rows = [[
+                ingredient["Recipe Name"],
+                ingredient["Ingredient Name"],
+                ingredient["Quantity"],
+                ingredient["Unit (of ingredient, e.g., grams, ml)"]
+            ] for ingredient in self.recipe_ingredients]
+            recipes = main_window.sheets_manager.get_table("Recipes")
+            data = self.recipe_nutrition()
+            self.saved_recipe = dict(zip(recipes.header, data))
+            # The lines and the totals shown in the dialog go out as one write, undone together if it fails;
+            # a recipe not saved yet gets its totals from the recipe dialog (see saved_recipe)
+            main_window.writer.replace_recipe_lines(self.recipe_name, rows, data if self.recipe_name in recipes.index else None,
+                                                    f"Saving ingredients of {self.recipe_name}")
+            main_window.status_bar.showMessage("Recipe ingredients saved", 3000)
             self.accept()
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Failed to save ingredients: {e}")
 
-    def calculate_recipe_nutrition(self):
-        try:
-            sheets_manager = self.parent().sheets_manager
-            
-            total_calories = 0
-            total_protein = 0
-            total_carbs = 0
-            total_fat = 0
-            
-            # Get ingredient nutritional data
-            ingredients_data = sheets_manager.get_all_data("Ingredients")
-            ingredient_nutrition = {ing["Ingredient Name"]: ing for ing in ingredients_data}
-            
-            # Calculate totals
-            for recipe_ing in self.recipe_ingredients:
-                ing_name = recipe_ing["Ingredient Name"]
-                quantity = float(recipe_ing["Quantity"])
-                
-                if ing_name in ingredient_nutrition:
-                    nutrition = ingredient_nutrition[ing_name]
-                    
-                    # Calculate per 100g and scale by quantity
-                    scale_factor = quantity / 100.0
-                    
-                    total_calories += float(nutrition.get("Calories (per 100g)", 0)) * scale_factor
-                    total_protein += float(nutrition.get("Protein (g per 100g)", 0)) * scale_factor
-                    total_carbs += float(nutrition.get("Carbohydrates (g per 100g)", 0)) * scale_factor
-                    total_fat += float(nutrition.get("Fat (g per 100g)", 0)) * scale_factor
-            
-            # Update recipe with calculated nutrition
-            recipes_data = sheets_manager.get_all_data("Recipes")
-            for i, recipe in enumerate(recipes_data):
-                if recipe["Recipe Name"] == self.recipe_name:
-                    # Update the recipe row
-                    updated_data = [
-                        recipe["Recipe Name"],
-                        recipe["Instructions"],
-                        recipe["Notes"],
-                        round(total_calories, 2),
-                        round(total_protein, 2),
-                        round(total_carbs, 2),
-                        round(total_fat, 2),
-                        recipe["Portion Size (e.g., servings)"]
-                    ]
-                    sheets_manager.update_row("Recipes", i + 2, updated_data)
-                    break
-                    
-        except Exception as e:
-            print(f"Error calculating nutrition: {e}")
+    def recipe_nutrition(self):
+        """The recipe row with the running totals, built from ``recipe_data`` for a recipe
+        not saved yet; nothing needs to be downloaded for it"""
+        recipes = self.parent().sheets_manager.get_table("Recipes")
+        i = recipes.index.get(self.recipe_name)
+        if i is not None:
+            record = recipes.record(i)
+        else:
+            record = {column: self.recipe_data.get(column, "") for column in recipes.header}
+            record["Recipe Name"] = self.recipe_name
+        data = recipe_row_with_totals(record, self.ingredients.nutrients, self.totals.tolist())
+        if FORMULA_TOTALS_COLUMN in recipes.header:
+            # With formula totals switched on, a recipe's totals follow its ingredients once it has some
+            data[recipes.header.index(FORMULA_TOTALS_COLUMN)] = "yes" if self.recipe_ingredients else ""
+        return data
 
 class RecipeDialog(QDialog):
     def __init__(self, parent=None, recipe_data=None):
         super().__init__(parent)
         self.recipe_data = recipe_data
+        # Totals (and formula mark) saved from the ingredients dialog, written with the recipe
+        self.ingredient_totals = {}
         self.init_ui()
 
     def init_ui(self):
@@ -501,25 +1348,33 @@ class RecipeDialog(QDialog):
             QMessageBox.warning(self, "Warning", "Please enter a recipe name first.")
             return
 
-        dialog = RecipeIngredientsDialog(self.parent(), recipe_name)
-        dialog.exec()
+        dialog = RecipeIngredientsDialog(self.parent(), recipe_name, recipe_data=self.get_data())
+        if dialog.exec() == QDialog.Accepted and dialog.saved_recipe:
+            recipes = self.parent().sheets_manager.get_table("Recipes")
+            self.ingredient_totals = {column: value for column, value in dialog.saved_recipe.items()
+                                      if column in recipes.nutrient_columns or column == FORMULA_TOTALS_COLUMN}
 
     def get_data(self):
-        return {
+        # Every column of the Recipes sheet, in sheet order
+        recipes = self.parent().sheets_manager.get_table("Recipes")
+        recipe_data = dict(self.recipe_data or {}, **self.ingredient_totals)
+        data = {column: recipe_data.get(column, "") for column in recipes.header}
+        data.update({
             "Recipe Name": self.name_edit.text(),
             "Instructions": self.instructions_edit.toPlainText(),
             "Notes": self.notes_edit.toPlainText(),
-            "Total Calories": 0,  # Will be calculated
-            "Total Protein (g)": 0,  # Will be calculated
-            "Total Carbohydrates (g)": 0,  # Will be calculated
-            "Total Fat (g)": 0,  # Will be calculated
             "Portion Size (e.g., servings)": self.portion_size_edit.value()
-        }
+        })
+        for column in recipes.nutrient_columns:
+            # Rows are written RAW, so totals shown as text go back as numbers
+            data[column] = display_value(parse_float(recipe_data.get(column) or 0))  # Will be calculated
+        return data
 
 class IngredientDialog(QDialog):
     def __init__(self, parent=None, ingredient_data=None):
         super().__init__(parent)
         self.ingredient_data = ingredient_data
+        self.ingredients = parent.sheets_manager.get_table("Ingredients")
         self.init_ui()
 
     def init_ui(self):
@@ -533,25 +1388,27 @@ class IngredientDialog(QDialog):
         form_layout = QFormLayout()
 
         self.name_edit = QLineEdit()
-        self.calories_edit = QDoubleSpinBox()
-        self.calories_edit.setMaximum(9999.99)
-        self.protein_edit = QDoubleSpinBox()
-        self.protein_edit.setMaximum(999.99)
-        self.carbs_edit = QDoubleSpinBox()
-        self.carbs_edit.setMaximum(999.99)
-        self.fat_edit = QDoubleSpinBox()
-        self.fat_edit.setMaximum(999.99)
         self.unit_edit = QLineEdit()
         self.unit_edit.setText("grams")
 
         form_layout.addRow("Ingredient Name:", self.name_edit)
-        form_layout.addRow("Calories (per 100g):", self.calories_edit)
-        form_layout.addRow("Protein (g per 100g):", self.protein_edit)
-        form_layout.addRow("Carbohydrates (g per 100g):", self.carbs_edit)
-        form_layout.addRow("Fat (g per 100g):", self.fat_edit)
+
+        # One field per nutrient column of the Ingredients sheet
+        self.nutrient_edits = {}
+        for column in self.ingredients.nutrient_columns:
+            edit = QDoubleSpinBox()
+            edit.setMaximum(99999.99)
+            form_layout.addRow(f"{column}:", edit)
+            self.nutrient_edits[column] = edit
+
         form_layout.addRow("Unit:", self.unit_edit)
 
-        layout.addLayout(form_layout)
+        form_widget = QWidget()
+        form_widget.setLayout(form_layout)
+        scroll_area = QScrollArea()
+        scroll_area.setWidgetResizable(True)
+        scroll_area.setWidget(form_widget)
+        layout.addWidget(scroll_area)
 
         # Buttons
         buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
@@ -565,24 +1422,21 @@ class IngredientDialog(QDialog):
 
     def load_data(self):
         self.name_edit.setText(self.ingredient_data.get("Ingredient Name", ""))
-        try:
-            self.calories_edit.setValue(float(self.ingredient_data.get("Calories (per 100g)", 0)))
-            self.protein_edit.setValue(float(self.ingredient_data.get("Protein (g per 100g)", 0)))
-            self.carbs_edit.setValue(float(self.ingredient_data.get("Carbohydrates (g per 100g)", 0)))
-            self.fat_edit.setValue(float(self.ingredient_data.get("Fat (g per 100g)", 0)))
-        except (ValueError, TypeError):
-            pass
+        for column, edit in self.nutrient_edits.items():
+            try:
+                edit.setValue(float(self.ingredient_data.get(column) or 0))
+            except (ValueError, TypeError):
+                pass
         self.unit_edit.setText(self.ingredient_data.get("Unit (e.g., grams, ml, piece)", "grams"))
 
     def get_data(self):
-        return {
-            "Ingredient Name": self.name_edit.text(),
-            "Calories (per 100g)": self.calories_edit.value(),
-            "Protein (g per 100g)": self.protein_edit.value(),
-            "Carbohydrates (g per 100g)": self.carbs_edit.value(),
-            "Fat (g per 100g)": self.fat_edit.value(),
-            "Unit (e.g., grams, ml, piece)": self.unit_edit.text()
-        }
+        # Every column of the Ingredients sheet, in sheet order
+        data = {column: (self.ingredient_data or {}).get(column, "") for column in self.ingredients.header}
+        data["Ingredient Name"] = self.name_edit.text()
+        for column, edit in self.nutrient_edits.items():
+            data[column] = edit.value()
+        data["Unit (e.g., grams, ml, piece)"] = self.unit_edit.text()
+        return data
 
 class NutritionChart(FigureCanvas):
     def __init__(self, parent=None, width=5, height=4, dpi=100):
@@ -590,18 +1444,16 @@ class NutritionChart(FigureCanvas):
         super().__init__(self.fig)
         self.setParent(parent)
 
-    def plot_daily_nutrition(self, date_str, calories, protein, carbs, fat):
+    def plot_daily_nutrition(self, date_str, nutrients, values):
         self.fig.clear()
         ax = self.fig.add_subplot(111)
         
         # Create bar chart
-        nutrients = ['Calories', 'Protein (g)', 'Carbs (g)', 'Fat (g)']
-        values = [calories, protein, carbs, fat]
-        colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A']
-        
-        bars = ax.bar(nutrients, values, color=colors)
+        bars = ax.bar(nutrients, values, color=nutrient_colors(len(nutrients)))
         ax.set_title(f'Daily Nutrition - {date_str}')
         ax.set_ylabel('Amount')
+        if len(nutrients) > 4:
+            ax.tick_params(axis='x', labelrotation=45)
         
         # Add value labels on bars
         for bar, value in zip(bars, values):
@@ -612,11 +1464,298 @@ class NutritionChart(FigureCanvas):
         self.fig.tight_layout()
         self.draw()
 
+class TrendChart(FigureCanvas):
+    """Daily calories and macros with their moving averages, over months or years.
+
+    The lines only hold the points min_max_indices picks for the days on show at
+    the chart's width in pixels, and are refilled from the full daily arrays
+    whenever the view is panned, zoomed or resized.
+    """
+    MACRO_LABELS = ["Calories", "Protein (g)", "Carbohydrates (g)", "Fat (g)"]
+
+    def __init__(self, parent=None, width=8, height=6, dpi=100):
+        self.fig = Figure(figsize=(width, height), dpi=dpi)
+        super().__init__(self.fig)
+        self.setParent(parent)
+        self.calories_ax, self.macros_ax = self.fig.subplots(2, 1, sharex=True)
+        self.x = np.zeros(0)
+        self.lines = []
+        self.mpl_connect("resize_event", lambda event: self.view_changed())
+
+    def set_series(self, first_day, values, nutrients, window, keep_view=False):
+        """Plot the calories and macros of (days x nutrients) daily totals starting at ``first_day``;
+        with ``keep_view`` the days on show stay the same"""
+        view = self.calories_ax.get_xlim() if keep_view and len(self.x) else None
+        for ax in (self.calories_ax, self.macros_ax):
+            ax.clear()
+            # clear() drops the callbacks along with everything else
+            ax.callbacks.connect("xlim_changed", lambda ax: self.view_changed())
+        self.lines = []
+        self.x = np.zeros(0)
+        if first_day is None:
+            self.calories_ax.set_title("No meals planned in this period")
+            self.draw_idle()
+            return
+
+        self.x = mdates.date2num(first_day) + np.arange(len(values))
+        values = np.column_stack([values[:, nutrients.index(label)] if label in nutrients else np.zeros(len(values))
+                                  for label in self.MACRO_LABELS])
+        averages = moving_average(values, window)
+        colors = nutrient_colors(len(self.MACRO_LABELS))
+        for ax, columns in ((self.calories_ax, [0]), (self.macros_ax, [1, 2, 3])):
+            for column in columns:
+                daily_line, = ax.plot([], [], color=colors[column], linewidth=0.8, alpha=0.35)
+                average_line, = ax.plot([], [], color=colors[column], linewidth=1.8,
+                                        label=f"{self.MACRO_LABELS[column]}, {window}-day average")
+                self.lines += [(daily_line, values[:, column]), (average_line, averages[:, column])]
+            ax.set_ylim(0, max(float(values[:, columns].max()), 1.0) * 1.05)
+            ax.legend(loc="upper left", fontsize="small")
+        self.calories_ax.set_title("Daily Nutrition Trend")
+        self.calories_ax.set_ylabel("kcal")
+        self.macros_ax.set_ylabel("g")
+        locator = mdates.AutoDateLocator()
+        self.macros_ax.xaxis.set_major_locator(locator)
+        self.macros_ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+        self.fig.tight_layout()
+        self.calories_ax.set_xlim(view or (self.x[0] - 0.5, self.x[-1] + 0.5))
+        self.draw_idle()
+
+    def view_changed(self):
+        if not len(self.x):
+            return
+        low, high = self.calories_ax.get_xlim()
+        # One day beyond each edge so the lines run off the sides
+        start = int(np.floor(low - self.x[0])) - 1
+        stop = int(np.ceil(high - self.x[0])) + 2
+        width = self.calories_ax.bbox.width
+        for line, values in self.lines:
+            picks = min_max_indices(values, start, stop, width)
+            line.set_data(self.x[picks], values[picks])
+
+class MealCalendar(QCalendarWidget):
+    """Calendar that shades each day by planned calories against the daily target
+    and shows the number of meals planned in the corner of the cell"""
+    UNDER_COLOR = QColor(255, 193, 7)
+    ON_TARGET_COLOR = QColor(76, 175, 80)
+    OVER_COLOR = QColor(244, 67, 54)
+    TOLERANCE = 0.1
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.summary = {}
+        self.calorie_target = 2000.0
+
+    def shown_range(self):
+        """First and last date of the month on show"""
+        first = date(self.yearShown(), self.monthShown(), 1)
+        return first, date(first.year + first.month // 12, first.month % 12 + 1, 1) - timedelta(days=1)
+
+    def set_summary(self, summary):
+        self.summary = summary
+        self.updateCells()
+
+    def set_days(self, summary, days):
+        """Replace the shading of ``days`` with a calendar_summary of their meals"""
+        for day in days:
+            if day in summary:
+                self.summary[day] = summary[day]
+            else:
+                self.summary.pop(day, None)
+        self.updateCells()
+
+    def set_calorie_target(self, calories):
+        self.calorie_target = calories
+        self.updateCells()
+
+    def day_color(self, calories):
+        ratio = calories / self.calorie_target if self.calorie_target > 0 else 1.0
+        if ratio < 1 - self.TOLERANCE:
+            color = QColor(self.UNDER_COLOR)
+        elif ratio > 1 + self.TOLERANCE:
+            color = QColor(self.OVER_COLOR)
+        else:
+            color = QColor(self.ON_TARGET_COLOR)
+        # Days further from the target are shaded more strongly
+        color.setAlpha(int(60 + 120 * min(abs(ratio - 1), 1)))
+        return color
+
+    def paintCell(self, painter, rect, qdate):
+        super().paintCell(painter, rect, qdate)
+        day = self.summary.get(qdate.toPython())
+        if day:
+            painter.save()
+            # Translucent on top of the default cell, which paints its own background
+            painter.fillRect(rect, self.day_color(day[1]))
+            font = painter.font()
+            font.setPointSizeF(max(font.pointSizeF() * 0.7, 6))
+            painter.setFont(font)
+            painter.drawText(rect.adjusted(0, 0, -2, 0), Qt.AlignRight | Qt.AlignBottom, str(day[0]))
+            painter.restore()
+
+class SheetTableModel(QAbstractTableModel):
+    """The rows of a typed sheet table that pass the filter, in the order of the sorted column.
+
+    Changing the filter or the sort only replaces the array of table rows on
+    show; the view reads the cells it paints straight from the typed columns.
+    """
+
+    def __init__(self, table_class, parent=None):
+        super().__init__(parent)
+        self.table = table_class.from_values([])
+        self.query = TableQuery(self.table)
+        self.columns = []
+        self.terms, self.comparisons = [], []
+        self.mask = np.ones(0, dtype=bool)
+        self.shown = np.arange(0)
+        self.sort_column, self.descending = None, False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.shown)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.table.header)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return str(display_value(self.columns[index.column()][self.shown[index.row()]]))
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.table.header[section] if section < len(self.table.header) else None
+        # Sheet row numbers, which stay with a row however it is filtered or sorted
+        return str(int(self.shown[section]) + 2) if section < len(self.shown) else None
+
+    def table_row(self, view_row):
+        return int(self.shown[view_row])
+
+    def view_row(self, table_row):
+        """Where a table row is on show, or -1 if it is filtered out"""
+        found = np.flatnonzero(self.shown == table_row)
+        return int(found[0]) if len(found) else -1
+
+    def set_table(self, table):
+        self.beginResetModel()
+        self.table = table
+        self.query = TableQuery(table)
+        self.columns = [table.column(column) for column in table.header]
+        try:
+            self.mask = self.query.mask(self.terms, self.comparisons)
+        except ValueError:
+            # The filter names a column this table doesn't have
+            self.mask = np.ones(len(table), dtype=bool)
+        if self.sort_column not in table.header:
+            self.sort_column = None
+        self.shown = self.query.rows(self.mask, self.sort_column, self.descending)
+        self.endResetModel()
+
+    def append_table(self, chunk):
+        """Add the rows of another chunk of the sheet below the rows on show.
+
+        The new rows that pass the filter are added at the end even when a
+        column is sorted; set_table() with the whole sheet puts them in order.
+        """
+        if chunk.header != self.table.header:
+            self.set_table(type(self.table).concatenate([self.table, chunk]))
+            return
+        try:
+            chunk_mask = TableQuery(chunk).mask(self.terms, self.comparisons)
+        except ValueError:
+            chunk_mask = np.ones(len(chunk), dtype=bool)
+        added = np.flatnonzero(chunk_mask) + len(self.table)
+        self.table = type(self.table).concatenate([self.table, chunk])
+        self.query = TableQuery(self.table)
+        self.columns = [self.table.column(column) for column in self.table.header]
+        self.mask = np.concatenate([self.mask, chunk_mask])
+        if len(added):
+            self.beginInsertRows(QModelIndex(), len(self.shown), len(self.shown) + len(added) - 1)
+            self.shown = np.concatenate([self.shown, added])
+            self.endInsertRows()
+
+    def set_filter(self, text):
+        """Show only the rows matching a filter line (see table_query); raises ValueError if it can't be used"""
+        terms, comparisons = parse_filter(text)
+        mask = self.query.mask(terms, comparisons)
+        self.beginResetModel()
+        self.terms, self.comparisons, self.mask = terms, comparisons, mask
+        self.shown = self.query.rows(mask, self.sort_column, self.descending)
+        self.endResetModel()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.beginResetModel()
+        self.sort_column = self.table.header[column] if 0 <= column < len(self.table.header) else None
+        self.descending = order == Qt.DescendingOrder
+        self.shown = self.query.rows(self.mask, self.sort_column, self.descending)
+        self.endResetModel()
+
+class FilterBar(QWidget):
+    """Filter line over a SheetTableModel with a count of the rows it shows"""
+
+    def __init__(self, model, example, parent=None):
+        super().__init__(parent)
+        self.model = model
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText(f"Filter, e.g. {example}")
+        self.filter_edit.setClearButtonEnabled(True)
+        self.filter_edit.setToolTip("Words to look for and number comparisons such as protein>=30, "
+                                    "kcal<500 or fat=5..15; click a column header to sort")
+        self.filter_edit.textChanged.connect(self.apply_filter)
+        self.count_label = QLabel()
+        layout.addWidget(QLabel("Filter:"))
+        layout.addWidget(self.filter_edit, 1)
+        layout.addWidget(self.count_label)
+        model.modelReset.connect(self.update_count)
+        model.rowsInserted.connect(self.update_count)
+
+    def apply_filter(self, text):
+        try:
+            self.model.set_filter(text)
+        except ValueError as e:
+            # Keep the last rows that could be shown while the filter is being typed
+            self.count_label.setText(str(e))
+            return
+        self.update_count()
+
+    def update_count(self):
+        shown, total = self.model.rowCount(), len(self.model.table)
+        self.count_label.setText(f"{total:,} rows" if shown == total else f"{shown:,} of {total:,} rows")
+
+# Days of history the Trends tab shows; None is everything in Meal_Plan and its archives
+TREND_PERIODS = {"Last 3 months": 91, "Last year": 365, "Last 2 years": 730, "Last 5 years": 1826, "All history": None}
+
 class NutritionMealPlannerApp(QMainWindow):
     def __init__(self):
         super().__init__()
         self.is_dark_theme = True
         self.sheets_manager = GoogleSheetsManager()
+        self.food_store = open_food_store()
+        # Views redraw once per event-loop turn, after every change made in it
+        self.graph = DataGraph(lambda flush: QTimer.singleShot(0, flush))
+        self.load_scheduler = LoadScheduler(self.sheets_manager, self)
+        self.load_scheduler.loaded.connect(self.tables_loaded)
+        self.load_scheduler.load_failed.connect(lambda message: self.status_bar.showMessage(f"Failed to load data: {message}", 5000))
+        self.progressive_loader = ProgressiveLoader(self.sheets_manager, self)
+        self.progressive_loader.load_failed.connect(lambda message: self.status_bar.showMessage(f"Failed to load data: {message}", 5000))
+        self.progressive_loader.load_failed.connect(lambda message: self.update_row_buttons())
+        self.meal_plan_rows = []
+        # Ingredients and recipes edited since recipe totals were last brought up to date
+        self.edited_ingredients = set()
+        self.edited_recipes = set()
+        self.report_pool = QThreadPool(self)
+        self.report_worker = None
+        self.watchdog = StallWatchdog(self)
+        self.watchdog.start()
+        self.profiler = ActionProfiler(self)
+        self.profiler.finished.connect(lambda path: self.status_bar.showMessage(f"Profile saved to {path}", 10000))
+        self.writer = OptimisticWriter(self.sheets_manager, self)
+        self.writer.changed.connect(self.sheet_edited)
+        self.writer.write_failed.connect(self.write_failed)
+        self.writer.write_conflict.connect(self.write_conflict)
+        self.writer.reconcile_needed.connect(self.reconcile_sheet)
         self.init_ui()
 
     def init_ui(self):
@@ -645,6 +1784,7 @@ class NutritionMealPlannerApp(QMainWindow):
         self.create_ingredients_tab()
         self.create_meal_plan_tab()
         self.create_dashboard_tab()
+        self.create_trends_tab()
 
         # Create menu bar and status bar
         self.create_menu_bar()
@@ -653,6 +1793,8 @@ class NutritionMealPlannerApp(QMainWindow):
         # Apply theme
         self.apply_theme()
 
+        self.create_data_graph()
+
         # Load initial data
         self.refresh_all_data()
 
@@ -703,11 +1845,15 @@ class NutritionMealPlannerApp(QMainWindow):
         button_layout.addWidget(delete_recipe_btn)
         button_layout.addWidget(manage_ingredients_btn)
         button_layout.addStretch()
+        self.recipe_row_buttons = [edit_recipe_btn, delete_recipe_btn, manage_ingredients_btn]
 
         layout.addLayout(button_layout)
 
+        self.recipes_model = SheetTableModel(table_type("Recipes"), self)
+        layout.addWidget(FilterBar(self.recipes_model, "chicken protein>=30 kcal<500"))
+
         # Table
-        self.recipes_table = QTableWidget()
+        self.recipes_table = self.create_sheet_view(self.recipes_model)
         layout.addWidget(self.recipes_table)
 
         self.tab_widget.addTab(recipes_widget, "Recipes")
@@ -730,15 +1876,33 @@ class NutritionMealPlannerApp(QMainWindow):
         button_layout.addWidget(edit_ingredient_btn)
         button_layout.addWidget(delete_ingredient_btn)
         button_layout.addStretch()
+        self.ingredient_row_buttons = [edit_ingredient_btn, delete_ingredient_btn]
 
         layout.addLayout(button_layout)
 
+        self.ingredients_model = SheetTableModel(table_type("Ingredients"), self)
+        layout.addWidget(FilterBar(self.ingredients_model, "oil fat>=50"))
+
         # Table
-        self.ingredients_table = QTableWidget()
+        self.ingredients_table = self.create_sheet_view(self.ingredients_model)
         layout.addWidget(self.ingredients_table)
 
         self.tab_widget.addTab(ingredients_widget, "Ingredients")
 
+    def create_sheet_view(self, model):
+        view = QTableView()
+        view.setModel(model)
+        view.setSelectionBehavior(QTableView.SelectRows)
+        view.setSelectionMode(QTableView.SingleSelection)
+        view.setSortingEnabled(True)
+        # Until a header is clicked rows stay in sheet order
+        view.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        view.horizontalHeader().setStretchLastSection(True)
+        # Size columns and row numbers from the rows on screen, not from every row of a large sheet
+        view.horizontalHeader().setResizeContentsPrecision(0)
+        view.verticalHeader().setResizeContentsPrecision(0)
+        return view
+
     def create_meal_plan_tab(self):
         meal_plan_widget = QWidget()
         layout = QHBoxLayout(meal_plan_widget)
@@ -748,23 +1912,43 @@ class NutritionMealPlannerApp(QMainWindow):
         left_layout = QVBoxLayout(left_widget)
         
         left_layout.addWidget(QLabel("Select Date:"))
-        self.calendar = QCalendarWidget()
+        self.calendar = MealCalendar()
         self.calendar.clicked.connect(self.calendar_date_changed)
+        self.calendar.currentPageChanged.connect(self.calendar_month_changed)
         left_layout.addWidget(self.calendar)
 
+        target_layout = QHBoxLayout()
+        target_layout.addWidget(QLabel("Daily calorie target:"))
+        self.calorie_target = QDoubleSpinBox()
+        self.calorie_target.setMaximum(9999.0)
+        self.calorie_target.setValue(self.calendar.calorie_target)
+        self.calorie_target.valueChanged.connect(self.calendar.set_calorie_target)
+        self.calorie_target.valueChanged.connect(lambda calories: self.graph.invalidate("Calorie Target"))
+        target_layout.addWidget(self.calorie_target)
+        left_layout.addLayout(target_layout)
+
         # Meal plan buttons
         meal_buttons_layout = QVBoxLayout()
         add_meal_btn = QPushButton("Add Meal")
         edit_meal_btn = QPushButton("Edit Meal")
         delete_meal_btn = QPushButton("Delete Meal")
+        auto_plan_btn = QPushButton("Auto-plan...")
+        copy_meals_btn = QPushButton("Copy Meals...")
+        shopping_list_btn = QPushButton("Shopping List...")
 
         add_meal_btn.clicked.connect(self.add_meal_plan)
         edit_meal_btn.clicked.connect(self.edit_meal_plan)
         delete_meal_btn.clicked.connect(self.delete_meal_plan)
+        auto_plan_btn.clicked.connect(self.auto_plan)
+        copy_meals_btn.clicked.connect(self.copy_meals)
+        shopping_list_btn.clicked.connect(self.show_shopping_list)
 
         meal_buttons_layout.addWidget(add_meal_btn)
         meal_buttons_layout.addWidget(edit_meal_btn)
         meal_buttons_layout.addWidget(delete_meal_btn)
+        meal_buttons_layout.addWidget(auto_plan_btn)
+        meal_buttons_layout.addWidget(copy_meals_btn)
+        meal_buttons_layout.addWidget(shopping_list_btn)
         meal_buttons_layout.addStretch()
 
         left_layout.addLayout(meal_buttons_layout)
@@ -785,15 +1969,15 @@ class NutritionMealPlannerApp(QMainWindow):
         self.tab_widget.addTab(meal_plan_widget, "Meal Plan")
 
     def create_dashboard_tab(self):
-        dashboard_widget = QWidget()
-        layout = QVBoxLayout(dashboard_widget)
+        self.dashboard_widget = QWidget()
+        layout = QVBoxLayout(self.dashboard_widget)
 
         # Date selection for dashboard
         date_layout = QHBoxLayout()
         date_layout.addWidget(QLabel("View nutrition for:"))
         self.dashboard_date_edit = QDateEdit()
         self.dashboard_date_edit.setDate(QDate.currentDate())
-        self.dashboard_date_edit.dateChanged.connect(self.update_dashboard)
+        self.dashboard_date_edit.dateChanged.connect(self.dashboard_date_changed)
         date_layout.addWidget(self.dashboard_date_edit)
         date_layout.addStretch()
         layout.addLayout(date_layout)
@@ -802,7 +1986,36 @@ class NutritionMealPlannerApp(QMainWindow):
         self.nutrition_chart = NutritionChart(self, width=8, height=6, dpi=100)
         layout.addWidget(self.nutrition_chart)
 
-        self.tab_widget.addTab(dashboard_widget, "Dashboard")
+        self.tab_widget.addTab(self.dashboard_widget, "Dashboard")
+
+    def create_trends_tab(self):
+        self.trends_widget = QWidget()
+        layout = QVBoxLayout(self.trends_widget)
+
+        controls_layout = QHBoxLayout()
+        controls_layout.addWidget(QLabel("Show:"))
+        self.trend_period = QComboBox()
+        self.trend_period.addItems(list(TREND_PERIODS))
+        self.trend_period.setCurrentText("Last year")
+        controls_layout.addWidget(self.trend_period)
+        controls_layout.addWidget(QLabel("Moving average over:"))
+        self.trend_window = QSpinBox()
+        self.trend_window.setRange(1, 90)
+        self.trend_window.setValue(7)
+        self.trend_window.setSuffix(" days")
+        controls_layout.addWidget(self.trend_window)
+        controls_layout.addStretch()
+        layout.addLayout(controls_layout)
+
+        # Pan and zoom come from the matplotlib toolbar
+        self.trend_chart = TrendChart(self, width=8, height=6, dpi=100)
+        layout.addWidget(NavigationToolbar(self.trend_chart, self.trends_widget))
+        layout.addWidget(self.trend_chart)
+
+        self.trend_period.currentTextChanged.connect(self.load_trends)
+        self.trend_window.valueChanged.connect(lambda days: self.graph.invalidate("Trend Window"))
+        self.tab_widget.currentChanged.connect(self.tab_changed)
+        self.tab_widget.addTab(self.trends_widget, "Trends")
 
     def create_menu_bar(self):
         menubar = self.menuBar()
@@ -810,6 +2023,8 @@ class NutritionMealPlannerApp(QMainWindow):
         # File menu
         file_menu = menubar.addMenu('File')
         file_menu.addAction('Refresh Data', self.refresh_all_data)
+        file_menu.addAction('Export Report...', self.export_report)
+        file_menu.addAction('Archive Old Meals...', self.archive_old_meals)
         file_menu.addSeparator()
         file_menu.addAction('Exit', self.close)
 
@@ -821,6 +2036,8 @@ class NutritionMealPlannerApp(QMainWindow):
 
         # Help menu
         help_menu = menubar.addMenu('Help')
+        help_menu.addAction('Profile Next Action', self.profile_next_action)
+        help_menu.addSeparator()
         help_menu.addAction('About', self.show_about)
 
     def create_status_bar(self):
@@ -841,44 +2058,254 @@ class NutritionMealPlannerApp(QMainWindow):
             self.theme_button.setText("🌙 Switch to Dark Mode")
             self.status_bar.showMessage("Ready - Light theme active")
 
+    def create_data_graph(self):
+        """Register every view and derived value with what it reads (see data_graph)"""
+        graph = self.graph
+        graph.view("Recipes tab", lambda changes: self.show_sheet_data("Recipes", self.recipes_table), {"Recipes": ALL})
+        graph.view("Ingredients tab", lambda changes: self.show_sheet_data("Ingredients", self.ingredients_table),
+                   {"Ingredients": ALL})
+        # The day's list holds Meal_Plan row numbers, which removing a meal on any day shifts
+        graph.view("Meal Plan day", lambda changes: self.display_meal_plan(self.sheets_manager.get_meal_plan(
+            self.selected_day(), self.selected_day(), cached_only=True)), {"Meal_Plan": ALL, "Selected Date": ALL})
+        graph.view("Calendar", self.show_calendar_changes, {
+            "Meal_Plan": lambda: self.day_numbers(*self.calendar.shown_range()),
+            "Recipes": lambda: self.planned_recipes(*self.calendar.shown_range()),
+            "Calendar Month": ALL,
+        })
+        graph.derived("Dashboard totals", self.dashboard_totals, {
+            "Meal_Plan": lambda: self.day_numbers(self.dashboard_day(), self.dashboard_day()),
+            "Recipes": lambda: self.planned_recipes(self.dashboard_day(), self.dashboard_day()),
+            "Dashboard Date": ALL,
+        })
+        graph.view("Dashboard", self.show_dashboard, {"Dashboard totals": ALL},
+                   active=lambda: self.tab_widget.currentWidget() is self.dashboard_widget)
+        graph.derived("Trend series", self.trend_series, {"Meal_Plan": ALL, "Recipes": ALL, "Trend Period": ALL})
+        graph.view("Trends", self.show_trends, {"Trend series": ALL, "Trend Window": ALL, "Trend Period": ALL},
+                   active=lambda: self.tab_widget.currentWidget() is self.trends_widget)
+        graph.derived("Recommender", lambda changes: RecipeRecommender(self.sheets_manager.get_table("Recipes"), self.daily_targets()),
+                      {"Recipes": ALL, "Calorie Target": ALL})
+        # Editing an ingredient changes the totals of every recipe using it, and through them the day totals
+        graph.view("Recipe totals", self.recipe_lines_changed, {"Ingredients": ALL, "Recipe_Ingredients": ALL})
+
+    def data_changed(self, sheet_name, keys=ALL):
+        """Pass a change to a cached sheet on to the views and values reading it"""
+        if sheet_name.startswith(MEAL_PLAN_ARCHIVE_PREFIX):
+            # Views read the meal plan with its archives as one table
+            sheet_name = "Meal_Plan"
+        self.graph.invalidate(sheet_name, keys)
+
+    def sheet_edited(self, sheet_name, keys):
+        # A local edit replaces the tab's rows, so chunks still arriving for it would be appended to the wrong rows
+        self.progressive_loader.cancel(sheet_name)
+        self.update_row_buttons()
+        self.data_changed(sheet_name, keys)
+
+    def tables_loaded(self, tables):
+        for sheet_name in tables:
+            self.data_changed(sheet_name)
+
+    def selected_day(self):
+        return self.calendar.selectedDate().toPython()
+
+    def dashboard_day(self):
+        return self.dashboard_date_edit.date().toPython()
+
+    @staticmethod
+    def day_numbers(first, last):
+        return range(first.toordinal(), last.toordinal() + 1)
+
+    def planned_recipes(self, first, last):
+        """Names of the recipes planned from first to last in the cached meals"""
+        if "Meal_Plan" not in self.sheets_manager.cache:
+            return set()
+        meal_plan = self.sheets_manager.get_meal_plan(first, last, cached_only=True)
+        return {meal_plan.recipe[row] for row in np.flatnonzero(meal_plan.between(first, last)).tolist()}
+
     def refresh_all_data(self):
+        self.load_scheduler.cancel("meal_plan")
+        self.load_scheduler.cancel("dashboard")
+        calendar_day = self.selected_day()
+        dashboard_day = self.dashboard_day()
+        try:
+            # Another device may have archived meals since the last refresh
+            self.sheets_manager.worksheet_titles(refresh=True)
+            sheet_names = self.sheets_manager.meal_plan_sheets(calendar_day, calendar_day)
+            sheet_names += [name for name in self.sheets_manager.archive_sheet_names(dashboard_day, dashboard_day)
+                            if name not in sheet_names]
+            # One batchGet for the meal plan sheets; recipes and ingredients can be large and stream in below
+            tables = self.sheets_manager.get_tables_batch(sheet_names)
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Failed to refresh data: {e}")
+            return
+        self.tables_loaded(tables)
+        self.status_bar.showMessage("Loading data from Google Sheets...")
         self.load_recipes_data()
         self.load_ingredients_data()
-        self.load_meal_plan_data()
-        self.update_dashboard()
-        self.status_bar.showMessage("Data refreshed from Google Sheets", 3000)
 
     def load_recipes_data(self):
-        try:
-            recipes_data = self.sheets_manager.get_all_data("Recipes")
-            self.populate_table(self.recipes_table, recipes_data)
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"Failed to load recipes data: {e}")
+        self.stream_sheet("Recipes", self.recipes_table, self.recipes_loaded)
 
     def load_ingredients_data(self):
+        self.stream_sheet("Ingredients", self.ingredients_table, lambda table: self.sheet_loaded())
+
+    def recipes_loaded(self, recipes):
+        # The month on show may need archive sheets, whose meals count only once recipes are known
+        self.calendar_month_changed()
+        self.sheet_loaded()
+
+    def sheet_loaded(self):
+        if not self.progressive_loader.loads:
+            self.status_bar.showMessage("Data refreshed from Google Sheets", 3000)
+
+    def stream_sheet(self, sheet_name, view, on_finished):
+        """Fill a tab with a sheet range by range while it downloads"""
+        def show_chunk(header, rows, first):
+            chunk = table_type(sheet_name)(header, rows)
+            if first or not view.model().columnCount():
+                self.show_sheet_table(view, chunk)
+            else:
+                view.model().append_table(chunk)
+
+        def finished(table):
+            # Redraws the tab from the cached table, which also has the edits made while it was
+            # loading and puts rows that arrived while a column was sorted in their place
+            self.update_row_buttons()
+            self.data_changed(sheet_name)
+            on_finished(table)
+
+        self.progressive_loader.load(sheet_name, show_chunk, finished)
+        self.update_row_buttons()
+
+    def update_row_buttons(self):
+        """Rows of a tab still streaming in can't be edited or deleted: the rows shown
+        don't line up with the cached table the edit would be made against yet"""
+        for sheet_name, buttons in [("Recipes", self.recipe_row_buttons), ("Ingredients", self.ingredient_row_buttons)]:
+            for button in buttons:
+                button.setEnabled(not self.progressive_loader.is_loading(sheet_name))
+
+    def still_loading(self, sheet_name):
+        if self.progressive_loader.is_loading(sheet_name):
+            self.status_bar.showMessage(f"{sheet_name} are still loading - try again in a moment", 3000)
+            return True
+        return False
+
+    def show_sheet_data(self, sheet_name, view):
+        # A sheet still streaming in is shown whole once its last chunk arrives
+        if not self.progressive_loader.is_loading(sheet_name):
+            self.show_sheet_table(view, self.sheets_manager.get_table(sheet_name))
+
+    def display_meal_plan(self, meal_plan):
+        selected_date = self.selected_day()
+
+        # Filter for selected date, remembering which table row each line shows
+        self.meal_plan_rows = np.flatnonzero(meal_plan.between(selected_date, selected_date)).tolist()
+        daily_meals = [meal_plan.record(row) for row in self.meal_plan_rows]
+
+        self.populate_table(self.meal_plan_table, daily_meals)
+        self.selected_date_label.setText(f"Meals for: {selected_date.strftime('%A, %B %d, %Y')}")
+
+    def write_failed(self, description, message):
+        self.status_bar.showMessage(f"{description} failed - change undone", 10000)
+        QMessageBox.warning(self, "Error", f"{description} could not be saved to Google Sheets and has been undone.\n\n{message}")
+
+    def write_conflict(self, description):
+        self.status_bar.showMessage(f"{description} conflicted with another device - change undone", 10000)
+        QMessageBox.warning(self, "Edit Conflict",
+                            f"{description} was not saved: the row was changed or deleted on another device "
+                            "since it was loaded here.\n\nThe latest data is being loaded; review it and "
+                            "make your change again if it still applies.")
+
+    def reconcile_sheet(self, sheet_name):
+        # The download reaches the views through tables_loaded
+        self.load_scheduler.request(f"reconcile {sheet_name}", [sheet_name], delay_ms=0)
+
+    def calendar_date_changed(self):
+        # Show the new date from the data we have right away, then reconcile with Sheets
+        selected_date = self.selected_day()
+        self.graph.invalidate("Selected Date")
+        self.load_scheduler.request("meal_plan", self.sheets_manager.meal_plan_sheets(selected_date, selected_date))
+
+    def calendar_month_changed(self):
+        """Shade the new month from the cached meals, downloading archive sheets it needs first"""
+        self.graph.invalidate("Calendar Month")
+        first, last = self.calendar.shown_range()
+        missing = [name for name in self.sheets_manager.archive_sheet_names(first, last)
+                   if name not in self.sheets_manager.cache]
+        if missing:
+            self.load_scheduler.request("calendar", missing)
+
+    def show_calendar_changes(self, changes):
+        """Sum again only the days whose meals changed, or the whole month for anything else"""
+        days = changes.get("Meal_Plan")
+        if set(changes) == {"Meal_Plan"} and days is not None:
+            self.show_calendar_days(days)
+        else:
+            self.show_calendar_month()
+
+    def show_calendar_month(self):
+        """One aggregation pass over the cached meals of the month on show"""
+        first, last = self.calendar.shown_range()
         try:
-            ingredients_data = self.sheets_manager.get_all_data("Ingredients")
-            self.populate_table(self.ingredients_table, ingredients_data)
+            meal_plan = self.sheets_manager.get_meal_plan(first, last, cached_only=True)
+            self.calendar.set_summary(calendar_summary(meal_plan, self.sheets_manager.get_table("Recipes"), first, last))
         except Exception as e:
-            QMessageBox.warning(self, "Error", f"Failed to load ingredients data: {e}")
+            print(f"Error shading calendar: {e}")
 
-    def load_meal_plan_data(self):
+    def show_calendar_days(self, days):
+        """Shade again the days (day numbers) of the month on show whose meals changed"""
+        first, last = self.calendar.shown_range()
+        days = [day for day in days if day in self.day_numbers(first, last)]
+        if not days:
+            return
         try:
-            selected_date = self.calendar.selectedDate().toPython()
-            date_str = selected_date.strftime('%Y-%m-%d')
-            
-            meal_plan_data = self.sheets_manager.get_all_data("Meal_Plan")
-            
-            # Filter for selected date
-            daily_meals = [meal for meal in meal_plan_data if meal.get("Date") == date_str]
-            
-            self.populate_table(self.meal_plan_table, daily_meals)
-            self.selected_date_label.setText(f"Meals for: {selected_date.strftime('%A, %B %d, %Y')}")
+            meal_plan = self.sheets_manager.get_meal_plan(first, last, cached_only=True)
+            rows = np.flatnonzero(np.isin(meal_plan.day, days))
+            self.calendar.set_days(calendar_summary(meal_plan, self.sheets_manager.get_table("Recipes"), first, last, rows),
+                                   [date.fromordinal(day) for day in days])
         except Exception as e:
-            QMessageBox.warning(self, "Error", f"Failed to load meal plan data: {e}")
-
-    def calendar_date_changed(self):
-        self.load_meal_plan_data()
+            print(f"Error shading calendar: {e}")
+
+    def dashboard_date_changed(self):
+        selected_date = self.dashboard_day()
+        self.graph.invalidate("Dashboard Date")
+        sheet_names = self.sheets_manager.meal_plan_sheets(selected_date, selected_date)
+        if "Recipes" not in self.sheets_manager.cache:
+            sheet_names.append("Recipes")
+        self.load_scheduler.request("dashboard", sheet_names)
+
+    def tab_changed(self, index):
+        if self.tab_widget.widget(index) is self.trends_widget:
+            self.load_trends()
+        else:
+            # Views of a tab that was hidden kept their changes for now
+            self.graph.flush()
+
+    def trend_range(self):
+        days = TREND_PERIODS[self.trend_period.currentText()]
+        today = date.today()
+        return (today - timedelta(days=days - 1) if days else date.min), today
+
+    def load_trends(self):
+        """Plot the trend from the cached meals, downloading archive sheets the period needs first"""
+        self.graph.invalidate("Trend Period")
+        start, end = self.trend_range()
+        missing = [name for name in self.sheets_manager.archive_sheet_names(start, end)
+                   if name not in self.sheets_manager.cache]
+        if missing:
+            # Show the whole period again once the older meals are in
+            self.load_scheduler.request("trends", missing, lambda tables: self.graph.invalidate("Trend Period"))
+
+    def trend_series(self, changes):
+        start, end = self.trend_range()
+        recipes = self.sheets_manager.get_table("Recipes")
+        first_day, values = daily_series(self.sheets_manager.get_meal_plan(start, end, cached_only=True), recipes, start, end)
+        return first_day, values, recipes.nutrients
+
+    def show_trends(self, changes):
+        first_day, values, nutrients = self.graph.value("Trend series")
+        # A new period starts from the whole range; new meals or smoothing keep the user's zoom
+        self.trend_chart.set_series(first_day, values, nutrients, self.trend_window.value(),
+                                    keep_view="Trend Period" not in changes)
 
     def populate_table(self, table, data):
         if not data:
@@ -897,122 +2324,167 @@ class NutritionMealPlannerApp(QMainWindow):
                 item = QTableWidgetItem(str(value))
                 table.setItem(row_idx, col_idx, item)
 
+        # Version stamps are bookkeeping for concurrent edits, not something to read
+        for col_idx, key in enumerate(data[0]):
+            table.setColumnHidden(col_idx, key == VERSION_COLUMN)
+
         # Resize columns
         table.horizontalHeader().setStretchLastSection(True)
         table.resizeColumnsToContents()
 
+    def show_sheet_table(self, view, table):
+        """Show a typed table in a Recipes or Ingredients view, keeping the selected row selected"""
+        model = view.model()
+        selected = self.selected_row(view)
+        new_columns = model.table.header != table.header
+        model.set_table(table)
+        if new_columns:
+            for col_idx, column in enumerate(table.header):
+                view.setColumnHidden(col_idx, column == VERSION_COLUMN)
+            # Styled sizing is slow, so widths are kept across edits and reloads
+            view.resizeColumnsToContents()
+        if 0 <= selected < len(table):
+            row = model.view_row(selected)
+            if row >= 0:
+                view.selectRow(row)
+
+    def selected_row(self, view):
+        """Table row of the line selected in a Recipes or Ingredients view, or -1"""
+        index = view.currentIndex()
+        return view.model().table_row(index.row()) if index.isValid() else -1
+
     def add_recipe(self):
         dialog = RecipeDialog(self)
         if dialog.exec() == QDialog.Accepted:
             recipe_data = dialog.get_data()
+            if recipe_data["Recipe Name"] in self.sheets_manager.get_table("Recipes").index:
+                QMessageBox.warning(self, "Warning", f"There is already a recipe named '{recipe_data['Recipe Name']}'.")
+                return
             data_list = list(recipe_data.values())
-            if self.sheets_manager.add_row("Recipes", data_list):
-                self.load_recipes_data()
-                QMessageBox.information(self, "Success", "Recipe added successfully!")
-            else:
-                QMessageBox.warning(self, "Error", "Failed to add recipe.")
+            self.writer.add_rows("Recipes", [data_list], "Adding recipe")
+            self.status_bar.showMessage("Recipe added", 3000)
 
     def edit_recipe(self):
-        current_row = self.recipes_table.currentRow()
+        if self.still_loading("Recipes"):
+            return
+        current_row = self.selected_row(self.recipes_table)
         if current_row < 0:
             QMessageBox.warning(self, "Warning", "Please select a recipe to edit.")
             return
 
         # Get current recipe data
-        recipe_data = {}
-        for col in range(self.recipes_table.columnCount()):
-            header = self.recipes_table.horizontalHeaderItem(col).text()
-            item = self.recipes_table.item(current_row, col)
-            recipe_data[header] = item.text() if item else ""
+        recipe_data = {header: str(value) for header, value in self.recipes_model.table.record(current_row).items()}
 
         dialog = RecipeDialog(self, recipe_data)
         if dialog.exec() == QDialog.Accepted:
             updated_data = dialog.get_data()
             data_list = list(updated_data.values())
-            if self.sheets_manager.update_row("Recipes", current_row + 2, data_list):
-                self.load_recipes_data()
-                QMessageBox.information(self, "Success", "Recipe updated successfully!")
-            else:
-                QMessageBox.warning(self, "Error", "Failed to update recipe.")
+            if self.save_edited_row("Recipes", current_row, updated_data["Recipe Name"], data_list, "Updating recipe"):
+                self.status_bar.showMessage("Recipe updated", 3000)
 
     def delete_recipe(self):
-        current_row = self.recipes_table.currentRow()
+        if self.still_loading("Recipes"):
+            return
+        current_row = self.selected_row(self.recipes_table)
         if current_row < 0:
             QMessageBox.warning(self, "Warning", "Please select a recipe to delete.")
             return
 
-        reply = QMessageBox.question(self, "Confirm Delete", "Are you sure you want to delete this recipe?")
+        plan = self.delete_plan("Recipes", current_row)
+        if plan is None:
+            return
+        message = "Are you sure you want to delete this recipe?"
+        if plan:
+            message += "\n\nThis also deletes " + " and ".join(f"{len(rows)} row(s) from {sheet}" for sheet, rows in plan.items()) + "."
+        reply = QMessageBox.question(self, "Confirm Delete", message)
         if reply == QMessageBox.Yes:
-            if self.sheets_manager.delete_row("Recipes", current_row + 2):
-                self.load_recipes_data()
-                QMessageBox.information(self, "Success", "Recipe deleted successfully!")
-            else:
-                QMessageBox.warning(self, "Error", "Failed to delete recipe.")
+            self.writer.delete_row("Recipes", current_row + 2, "Deleting recipe", plan)
+            self.status_bar.showMessage("Recipe deleted", 3000)
+
+    def save_edited_row(self, sheet_name, current_row, new_name, data_list, description):
+        """Update a recipe or ingredient; a new name is carried over to every row that used the old one"""
+        old_name = self.sheets_manager.get_table(sheet_name).column(KEY_COLUMNS[sheet_name])[current_row]
+        if new_name == old_name:
+            self.writer.update_row(sheet_name, current_row + 2, data_list, description)
+            return True
+        try:
+            plan = self.sheets_manager.rename_plan(sheet_name, old_name, new_name)
+        except IntegrityError as e:
+            QMessageBox.warning(self, "Warning", str(e))
+            return False
+        self.writer.rename_row(sheet_name, current_row + 2, data_list, plan, description)
+        return True
+
+    def delete_plan(self, sheet_name, current_row):
+        """Rows that go with a recipe or ingredient when it is deleted, or None if it can't be deleted"""
+        name = self.sheets_manager.get_table(sheet_name).column(KEY_COLUMNS[sheet_name])[current_row]
+        try:
+            return self.sheets_manager.delete_plan(sheet_name, name)
+        except IntegrityError as e:
+            QMessageBox.warning(self, "Warning", str(e))
+            return None
 
     def manage_recipe_ingredients(self):
-        current_row = self.recipes_table.currentRow()
+        if self.still_loading("Recipes"):
+            return
+        current_row = self.selected_row(self.recipes_table)
         if current_row < 0:
             QMessageBox.warning(self, "Warning", "Please select a recipe to manage ingredients.")
             return
 
         # Get recipe name
-        recipe_name_item = self.recipes_table.item(current_row, 0)  # Assuming first column is recipe name
-        if not recipe_name_item:
+        recipe_name = self.recipes_model.table.name[current_row]
+        if not recipe_name:
             QMessageBox.warning(self, "Warning", "Could not get recipe name.")
             return
 
-        recipe_name = recipe_name_item.text()
         dialog = RecipeIngredientsDialog(self, recipe_name)
-        if dialog.exec() == QDialog.Accepted:
-            self.load_recipes_data()  # Refresh to show updated nutrition values
+        # The dialog saves the recipe's new totals through the writer, which updates every view showing them
+        dialog.exec()
 
     def add_ingredient(self):
         dialog = IngredientDialog(self)
         if dialog.exec() == QDialog.Accepted:
             ingredient_data = dialog.get_data()
+            if ingredient_data["Ingredient Name"] in self.sheets_manager.get_table("Ingredients").index:
+                QMessageBox.warning(self, "Warning", f"There is already an ingredient named '{ingredient_data['Ingredient Name']}'.")
+                return
             data_list = list(ingredient_data.values())
-            if self.sheets_manager.add_row("Ingredients", data_list):
-                self.load_ingredients_data()
-                QMessageBox.information(self, "Success", "Ingredient added successfully!")
-            else:
-                QMessageBox.warning(self, "Error", "Failed to add ingredient.")
+            self.writer.add_rows("Ingredients", [data_list], "Adding ingredient")
+            self.status_bar.showMessage("Ingredient added", 3000)
 
     def edit_ingredient(self):
-        current_row = self.ingredients_table.currentRow()
+        if self.still_loading("Ingredients"):
+            return
+        current_row = self.selected_row(self.ingredients_table)
         if current_row < 0:
             QMessageBox.warning(self, "Warning", "Please select an ingredient to edit.")
             return
 
         # Get current ingredient data
-        ingredient_data = {}
-        for col in range(self.ingredients_table.columnCount()):
-            header = self.ingredients_table.horizontalHeaderItem(col).text()
-            item = self.ingredients_table.item(current_row, col)
-            ingredient_data[header] = item.text() if item else ""
+        ingredient_data = {header: str(value) for header, value in self.ingredients_model.table.record(current_row).items()}
 
         dialog = IngredientDialog(self, ingredient_data)
         if dialog.exec() == QDialog.Accepted:
             updated_data = dialog.get_data()
             data_list = list(updated_data.values())
-            if self.sheets_manager.update_row("Ingredients", current_row + 2, data_list):
-                self.load_ingredients_data()
-                QMessageBox.information(self, "Success", "Ingredient updated successfully!")
-            else:
-                QMessageBox.warning(self, "Error", "Failed to update ingredient.")
+            if self.save_edited_row("Ingredients", current_row, updated_data["Ingredient Name"], data_list, "Updating ingredient"):
+                self.status_bar.showMessage("Ingredient updated", 3000)
 
     def delete_ingredient(self):
-        current_row = self.ingredients_table.currentRow()
+        if self.still_loading("Ingredients"):
+            return
+        current_row = self.selected_row(self.ingredients_table)
         if current_row < 0:
             QMessageBox.warning(self, "Warning", "Please select an ingredient to delete.")
             return
 
+        if self.delete_plan("Ingredients", current_row) is None:
+            return
         reply = QMessageBox.question(self, "Confirm Delete", "Are you sure you want to delete this ingredient?")
         if reply == QMessageBox.Yes:
-            if self.sheets_manager.delete_row("Ingredients", current_row + 2):
-                self.load_ingredients_data()
-                QMessageBox.information(self, "Success", "Ingredient deleted successfully!")
-            else:
-                QMessageBox.warning(self, "Error", "Failed to delete ingredient.")
+            self.writer.delete_row("Ingredients", current_row + 2, "Deleting ingredient")
+            self.status_bar.showMessage("Ingredient deleted", 3000)
 
     def add_meal_plan(self):
         selected_date = self.calendar.selectedDate().toPython()
@@ -1020,18 +2492,16 @@ class NutritionMealPlannerApp(QMainWindow):
         if dialog.exec() == QDialog.Accepted:
             meal_data = dialog.get_data()
             data_list = list(meal_data.values())
-            if self.sheets_manager.add_row("Meal_Plan", data_list):
-                self.load_meal_plan_data()
-                self.update_dashboard()
-                QMessageBox.information(self, "Success", "Meal added to plan successfully!")
-            else:
-                QMessageBox.warning(self, "Error", "Failed to add meal to plan.")
+            self.writer.add_rows("Meal_Plan", [data_list], "Adding meal to plan")
+            self.status_bar.showMessage("Meal added to plan", 3000)
 
     def edit_meal_plan(self):
         current_row = self.meal_plan_table.currentRow()
         if current_row < 0:
             QMessageBox.warning(self, "Warning", "Please select a meal to edit.")
             return
+        if self.is_archived_meal(current_row):
+            return
 
         # Get current meal data
         meal_data = {}
@@ -1039,96 +2509,182 @@ class NutritionMealPlannerApp(QMainWindow):
             header = self.meal_plan_table.horizontalHeaderItem(col).text()
             item = self.meal_plan_table.item(current_row, col)
             meal_data[header] = item.text() if item else ""
+        row_index = self.meal_plan_rows[current_row] + 2
 
         selected_date = self.calendar.selectedDate().toPython()
-        dialog = MealPlanDialog(self, selected_date, meal_data)
+        dialog = MealPlanDialog(self, selected_date, meal_data, meal_row=row_index - 2)
         if dialog.exec() == QDialog.Accepted:
             updated_data = dialog.get_data()
             data_list = list(updated_data.values())
-            
-            # Find the actual row in the full meal plan data
-            meal_plan_data = self.sheets_manager.get_all_data("Meal_Plan")
-            for i, meal in enumerate(meal_plan_data):
-                if (meal.get("Date") == meal_data.get("Date") and 
-                    meal.get("Meal Type") == meal_data.get("Meal Type") and
-                    meal.get("Recipe Name") == meal_data.get("Recipe Name")):
-                    if self.sheets_manager.update_row("Meal_Plan", i + 2, data_list):
-                        self.load_meal_plan_data()
-                        self.update_dashboard()
-                        QMessageBox.information(self, "Success", "Meal updated successfully!")
-                    else:
-                        QMessageBox.warning(self, "Error", "Failed to update meal.")
-                    break
+            self.writer.update_row("Meal_Plan", row_index, data_list, "Updating meal")
+            self.status_bar.showMessage("Meal updated", 3000)
 
     def delete_meal_plan(self):
         current_row = self.meal_plan_table.currentRow()
         if current_row < 0:
             QMessageBox.warning(self, "Warning", "Please select a meal to delete.")
             return
+        if self.is_archived_meal(current_row):
+            return
 
         reply = QMessageBox.question(self, "Confirm Delete", "Are you sure you want to delete this meal?")
         if reply == QMessageBox.Yes:
-            # Get current meal data
-            meal_data = {}
-            for col in range(self.meal_plan_table.columnCount()):
-                header = self.meal_plan_table.horizontalHeaderItem(col).text()
-                item = self.meal_plan_table.item(current_row, col)
-                meal_data[header] = item.text() if item else ""
-
-            # Find the actual row in the full meal plan data
-            meal_plan_data = self.sheets_manager.get_all_data("Meal_Plan")
-            for i, meal in enumerate(meal_plan_data):
-                if (meal.get("Date") == meal_data.get("Date") and 
-                    meal.get("Meal Type") == meal_data.get("Meal Type") and
-                    meal.get("Recipe Name") == meal_data.get("Recipe Name")):
-                    if self.sheets_manager.delete_row("Meal_Plan", i + 2):
-                        self.load_meal_plan_data()
-                        self.update_dashboard()
-                        QMessageBox.information(self, "Success", "Meal deleted successfully!")
-                    else:
-                        QMessageBox.warning(self, "Error", "Failed to delete meal.")
-                    break
-
-    def update_dashboard(self):
+            self.writer.delete_row("Meal_Plan", self.meal_plan_rows[current_row] + 2, "Deleting meal")
+            self.status_bar.showMessage("Meal deleted", 3000)
+
+    def is_archived_meal(self, current_row):
+        """Meals shown from an archive sheet are history and cannot be changed from the day view"""
+        if self.meal_plan_rows[current_row] < len(self.sheets_manager.get_table("Meal_Plan")):
+            return False
+        QMessageBox.warning(self, "Warning", "This meal has been archived and can no longer be changed.")
+        return True
+
+    def auto_plan(self):
+        selected_date = self.calendar.selectedDate().toPython()
+        dialog = AutoPlanDialog(self, selected_date)
+        if dialog.exec() == QDialog.Accepted:
+            plan_rows = dialog.get_rows()
+            self.writer.add_rows("Meal_Plan", plan_rows, f"Adding {len(plan_rows)} planned meals")
+            self.status_bar.showMessage(f"{len(plan_rows)} meals added to plan", 3000)
+
+    def daily_targets(self):
+        """Calories/protein/carbs/fat per day: the default targets scaled to the calendar's calorie target"""
+        return [value * self.calorie_target.value() / DEFAULT_DAILY_TARGETS[0] for value in DEFAULT_DAILY_TARGETS]
+
+    def recipe_recommender(self):
+        """Recommender over the cached recipes, rebuilt only after they or the targets change"""
+        return self.graph.value("Recommender")
+
+    def recipe_lines_changed(self, changes):
+        """Note the ingredients and recipes edited here and bring the recipes' totals up to date"""
+        ingredient_names = changes.get("Ingredients", set())
+        recipe_names = changes.get("Recipe_Ingredients", set())
+        if ingredient_names is None or recipe_names is None:
+            # A download, not an edit: totals entered on the sheet stay as they are
+            return
+        self.edited_ingredients |= ingredient_names
+        self.edited_recipes |= recipe_names
+        if "Recipe_Ingredients" in self.sheets_manager.cache:
+            self.update_recipe_totals()
+        else:
+            self.load_scheduler.request("recipe totals", ["Recipe_Ingredients"], lambda tables: self.update_recipe_totals(),
+                                        delay_ms=0)
+
+    def update_recipe_totals(self):
+        """Recompute the recipes using the edited ingredients and save the totals that changed"""
+        recipe_names, ingredient_names = self.edited_recipes, self.edited_ingredients
+        self.edited_recipes, self.edited_ingredients = set(), set()
+        try:
+            lines = self.sheets_manager.get_table("Recipe_Ingredients")
+            for name in ingredient_names:
+                recipe_names.update(lines.recipe[row] for row in lines.rows_with("Ingredient Name", name))
+            if not recipe_names:
+                return
+            recipes = self.sheets_manager.get_table("Recipes")
+            updates = recompute_recipe_nutrition(recipes, lines, self.sheets_manager.get_table("Ingredients"),
+                                                 recipe_names, self.food_store)
+        except Exception as e:
+            print(f"Error updating recipe totals: {e}")
+            return
+        # Sheets works formula totals out itself; only the copy shown here needs them
+        formula_totals = recipes.formula_totals
+        computed = {row: data for row, data in updates.items() if formula_totals[row - 2]}
+        if computed:
+            self.sheets_manager.update_cached_rows("Recipes", computed)
+            self.data_changed("Recipes", recipes.change_keys(row - 2 for row in computed))
+        updates = {row: data for row, data in updates.items() if row not in computed}
+        if updates:
+            self.writer.update_rows("Recipes", updates, f"Updating nutrition of {len(updates)} recipes")
+
+    def copy_meals(self):
+        selected_date = self.calendar.selectedDate().toPython()
+        dialog = CopyMealsDialog(self, selected_date)
+        if dialog.exec() == QDialog.Accepted:
+            plan_rows = dialog.get_rows()
+            # All copies go to Sheets in one append
+            self.writer.add_rows("Meal_Plan", plan_rows, f"Copying {len(plan_rows)} meals")
+            self.status_bar.showMessage(f"{len(plan_rows)} meals copied", 3000)
+
+    def show_shopping_list(self):
+        selected_date = self.calendar.selectedDate().toPython()
+        dialog = ShoppingListDialog(self, selected_date)
+        dialog.exec()
+
+    def dashboard_totals(self, changes):
+        selected_date = self.dashboard_day()
+        meal_plan = self.sheets_manager.get_meal_plan(selected_date, selected_date, cached_only=True)
+        recipes = self.sheets_manager.get_table("Recipes")
+        return recipes.nutrients, meal_totals(meal_plan, recipes, meal_plan.between(selected_date, selected_date))
+
+    def show_dashboard(self, changes):
+        nutrients, totals = self.graph.value("Dashboard totals")
+        self.nutrition_chart.plot_daily_nutrition(self.dashboard_day().strftime('%Y-%m-%d'), nutrients, totals)
+
+    def export_report(self):
+        if self.report_worker is not None:
+            QMessageBox.warning(self, "Warning", "A report is already being rendered.")
+            return
+        dialog = ReportDialog(self)
+        if dialog.exec() != QDialog.Accepted:
+            return
+        start_date, end_date = dialog.get_range()
+        if end_date < start_date:
+            QMessageBox.warning(self, "Warning", "The end date must not be before the start date.")
+            return
+        if dialog.is_pdf():
+            output, _ = QFileDialog.getSaveFileName(self, "Export Report", "nutrition_report.pdf", "PDF Files (*.pdf)")
+            if output and not output.lower().endswith(".pdf"):
+                output += ".pdf"
+        else:
+            output = QFileDialog.getExistingDirectory(self, "Export Report To Folder")
+        if not output:
+            return
+
         try:
-            selected_date = self.dashboard_date_edit.date().toPython()
-            date_str = selected_date.strftime('%Y-%m-%d')
-            
-            # Get meal plan for the selected date
-            meal_plan_data = self.sheets_manager.get_all_data("Meal_Plan")
-            daily_meals = [meal for meal in meal_plan_data if meal.get("Date") == date_str]
-            
-            # Get recipes data
-            recipes_data = self.sheets_manager.get_all_data("Recipes")
-            recipes_dict = {recipe["Recipe Name"]: recipe for recipe in recipes_data}
-            
-            # Calculate daily totals
-            total_calories = 0
-            total_protein = 0
-            total_carbs = 0
-            total_fat = 0
-            
-            for meal in daily_meals:
-                recipe_name = meal.get("Recipe Name")
-                portion_size = float(meal.get("Portion Size (for the meal plan, referring to the recipe's portion size)", 1.0))
-                
-                if recipe_name in recipes_dict:
-                    recipe = recipes_dict[recipe_name]
-                    recipe_portions = float(recipe.get("Portion Size (e.g., servings)", 1))
-                    
-                    # Calculate nutrition per portion and scale by meal portion size
-                    scale_factor = portion_size / recipe_portions
-                    
-                    total_calories += float(recipe.get("Total Calories", 0)) * scale_factor
-                    total_protein += float(recipe.get("Total Protein (g)", 0)) * scale_factor
-                    total_carbs += float(recipe.get("Total Carbohydrates (g)", 0)) * scale_factor
-                    total_fat += float(recipe.get("Total Fat (g)", 0)) * scale_factor
-            
-            # Update chart
-            self.nutrition_chart.plot_daily_nutrition(date_str, total_calories, total_protein, total_carbs, total_fat)
-            
+            tables = self.sheets_manager.get_tables_batch(self.sheets_manager.meal_plan_sheets(start_date, end_date) + ["Recipes"])
+            meal_plan = self.sheets_manager.get_meal_plan(start_date, end_date)
         except Exception as e:
-            print(f"Error updating dashboard: {e}")
+            QMessageBox.warning(self, "Error", f"Failed to load data for the report: {e}")
+            return
+
+        # Rendering runs in worker processes; this thread only waits for them off the GUI thread
+        from report_renderer import render_report
+        self.report_worker = LoadWorker(0, lambda: render_report(meal_plan, tables["Recipes"], start_date, end_date, output))
+        self.report_worker.signals.finished.connect(self.report_finished)
+        self.report_worker.signals.failed.connect(self.report_failed)
+        self.report_pool.start(self.report_worker)
+        self.status_bar.showMessage("Rendering report...")
+
+    def report_finished(self, _, paths):
+        self.report_worker = None
+        self.status_bar.showMessage(f"Report saved to {paths[0] if len(paths) == 1 else os.path.dirname(paths[0])}", 10000)
+
+    def report_failed(self, _, message):
+        self.report_worker = None
+        self.status_bar.clearMessage()
+        QMessageBox.warning(self, "Error", f"Failed to render report: {message}")
+
+    def archive_old_meals(self):
+        if self.sheets_manager.pending_writes:
+            QMessageBox.warning(self, "Warning", "Changes are still being saved. Please try again in a moment.")
+            return
+        cutoff = archive_cutoff(date.today(), DEFAULT_ARCHIVE_MONTHS)
+        reply = QMessageBox.question(self, "Archive Old Meals",
+                                     f"Move meals planned before {cutoff.strftime('%B %d, %Y')} into yearly archive sheets?\n\n"
+                                     "They stay visible in the calendar and dashboard but can no longer be edited.")
+        if reply != QMessageBox.Yes:
+            return
+        try:
+            moved = self.sheets_manager.archive_meal_plan(cutoff)
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Failed to archive meals: {e}")
+            return
+        self.refresh_all_data()
+        self.status_bar.showMessage(f"{sum(moved.values())} meals archived", 5000)
+
+    def profile_next_action(self):
+        self.profiler.arm()
+        self.status_bar.showMessage("Profiling the next click or key press...")
 
     def show_about(self):
         QMessageBox.about(self, "About", "Nutrition Meal Planner v1.0\n\nA desktop application for managing recipes, ingredients, and meal planning with Google Sheets integration.")
@@ -0,0 +1,471 @@
+"""
+Typed, column-oriented copies of the worksheets.
+
+Each sheet is parsed once into a table whose numeric columns are float64 numpy
+arrays, whose name columns are lists of interned strings and whose dates are
+``date`` objects. Columns are reached through short attribute names
+(``recipes.kcal``, ``meal_plan.portion``) instead of the long sheet headers, and
+no string-to-number conversion is left for the nutrition calculations.
+
+Nutrients are not fixed: every Ingredients column named "<Nutrient> (per 100g)"
+or "<Nutrient> (<unit> per 100g)" is one, and the matching Recipes column is
+"Total <Nutrient> (<unit>)". Adding a pair of such columns to the sheets adds a
+nutrient everywhere.
+"""
+
+import re
+import sys
+from datetime import date
+import numpy as np
+
+TEXT, FLOAT, DATE = "text", "float", "date"
+
+# Optional last column holding a stamp that changes on every write to the row
+VERSION_COLUMN = "Version"
+
+# Optional Recipes column marking ("yes") the recipes whose totals are Sheets formulas over their ingredients
+FORMULA_TOTALS_COLUMN = "Totals From Ingredients"
+
+# Per-year archive sheets of old meals are named Meal_Plan_2024 and so on
+MEAL_PLAN_ARCHIVE_PREFIX = "Meal_Plan_"
+
+INGREDIENT_NUTRIENT_PATTERN = re.compile(r"^(.+?) \((?:(.+?) )?per 100g\)$")
+RECIPE_TOTAL_PREFIX = "Total "
+
+def ingredient_nutrient(column):
+    """Nutrient ("Protein (g)") held by an Ingredients column, or None"""
+    match = INGREDIENT_NUTRIENT_PATTERN.match(column)
+    if not match:
+        return None
+    name, unit = match.groups()
+    return f"{name} ({unit})" if unit else name
+
+def recipe_nutrient(column):
+    """Nutrient ("Protein (g)") held by a Recipes column, or None"""
+    if column.startswith(RECIPE_TOTAL_PREFIX):
+        return column[len(RECIPE_TOTAL_PREFIX):] or None
+    return None
+
+def ingredient_column(nutrient):
+    """Ingredients header of a nutrient ("Protein (g per 100g)" for "Protein (g)")"""
+    name, _, unit = nutrient.rpartition(" (")
+    if name and unit.endswith(")"):
+        return f"{name} ({unit[:-1]} per 100g)"
+    return f"{nutrient} (per 100g)"
+
+def recipe_column(nutrient):
+    """Recipes header of a nutrient ("Total Protein (g)" for "Protein (g)")"""
+    return RECIPE_TOTAL_PREFIX + nutrient
+
+def parse_float(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace(",", ""))
+    except ValueError:
+        return np.nan
+
+def parse_date(value):
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value).strip())
+    except ValueError:
+        # Keep whatever was typed so the record can still be shown and written back
+        return sys.intern(str(value))
+
+def parse_column(cells, kind):
+    if kind == FLOAT:
+        return np.fromiter((parse_float(cell) for cell in cells), dtype=np.float64, count=len(cells))
+    if kind == DATE:
+        # Several meals share each day, so share the parsed date objects too
+        parsed = {}
+        return [parsed[cell] if cell in parsed else parsed.setdefault(cell, parse_date(cell)) for cell in cells]
+    return [sys.intern(str(cell)) for cell in cells]
+
+def is_marked(value):
+    return str(value).strip().lower() in ("yes", "true")
+
+def display_value(value):
+    """Cell value as get_all_records() would have returned it"""
+    if isinstance(value, float):
+        if value != value:
+            return ""
+        return int(value) if value.is_integer() else float(value)
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+class SheetTable:
+    """A worksheet stored column by column.
+
+    ``schema`` maps short attribute names to (sheet header, kind). Columns that
+    are not in the schema are kept as plain string lists in ``extra`` so the
+    table can still be turned back into complete records.
+    """
+
+    __slots__ = ("header", "extra", "size", "_index", "_groups")
+    schema = {}
+    key = None
+    # Attribute naming what a row is about, reported to views when the row changes
+    change_key = None
+
+    def __init__(self, header, rows):
+        self.header = [str(column) for column in header]
+        self.size = len(rows)
+        self._index = None
+        self._groups = {}
+
+        positions = {column: i for i, column in enumerate(self.header)}
+        width = len(self.header)
+        rows = [row if len(row) >= width else list(row) + [""] * (width - len(row)) for row in rows]
+
+        columns = {}
+        for attr, (column, kind) in self.schema.items():
+            i = positions.get(column)
+            cells = [row[i] for row in rows] if i is not None else [""] * self.size
+            columns[column] = parse_column(cells, kind)
+        for column, i in positions.items():
+            if column not in columns:
+                columns[column] = [row[i] for row in rows]
+        self._set_columns(columns)
+
+    def _set_columns(self, columns):
+        """Take parsed columns ({header: values}, schema columns included) as the table's data"""
+        for attr, (column, _) in self.schema.items():
+            setattr(self, attr, columns[column])
+        known = {column for column, _ in self.schema.values()}
+        self.extra = {column: columns[column] for column in self.header if column not in known}
+
+    @classmethod
+    def from_values(cls, values):
+        """Build from a header row followed by data rows (values.get / batchGet shape)"""
+        if not values:
+            return cls([column for column, _ in cls.schema.values()], [])
+        return cls(values[0], values[1:])
+
+    @classmethod
+    def from_records(cls, records):
+        if not records:
+            return cls([column for column, _ in cls.schema.values()], [])
+        header = list(records[0].keys())
+        return cls(header, [[record.get(column, "") for column in header] for record in records])
+
+    @classmethod
+    def from_columns(cls, header, columns, size):
+        """Build from columns that are already parsed, without going through the cells again"""
+        table = cls.__new__(cls)
+        table.header = list(header)
+        table.size = size
+        table._index = None
+        table._groups = {}
+        table._set_columns(columns)
+        return table
+
+    @classmethod
+    def concatenate(cls, tables):
+        """One table with the rows of several (a sheet and its archives), in the order given"""
+        tables = [table for table in tables if len(table)]
+        if not tables:
+            return cls.from_values([])
+        if len(tables) == 1:
+            return tables[0]
+        header = tables[0].header
+        if all(type(table) is cls and table.header == header for table in tables):
+            # Same layout (chunks of one sheet, most archives): join the parsed columns
+            columns = {}
+            for attr, (column, kind) in cls.schema.items():
+                parts = [getattr(table, attr) for table in tables]
+                columns[column] = np.concatenate(parts) if kind == FLOAT else [value for part in parts for value in part]
+            for column in tables[0].extra:
+                columns[column] = [value for table in tables for value in table.extra[column]]
+            return cls.from_columns(header, columns, sum(len(table) for table in tables))
+        rows = []
+        for table in tables:
+            columns = [table.column(column) if column in table.header else [""] * len(table) for column in header]
+            rows.extend([display_value(values[row]) for values in columns] for row in range(len(table)))
+        return cls(header, rows)
+
+    @classmethod
+    def is_number_column(cls, column):
+        """Whether a column of this sheet holds numbers"""
+        return any(header == column and kind == FLOAT for header, kind in cls.schema.values())
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def index(self):
+        """Row number by key column value (the last row wins, as with a dict of records)"""
+        if self._index is None:
+            self._index = {name: i for i, name in enumerate(getattr(self, self.key))} if self.key else {}
+        return self._index
+
+    def rows_with(self, header, value):
+        """Rows whose ``header`` column holds ``value``.
+
+        The first call for a column builds a value -> rows index over it; later
+        lookups on the same table are dictionary hits.
+        """
+        if header not in self._groups:
+            groups = {}
+            for row, cell in enumerate(self.column(header)):
+                groups.setdefault(cell, []).append(row)
+            self._groups[header] = groups
+        return self._groups[header].get(value, [])
+
+    def change_keys(self, rows):
+        """Values of ``change_key`` in the given rows, or None for a table without one"""
+        if self.change_key is None:
+            return None
+        values = getattr(self, self.change_key)
+        return {values[row].item() if isinstance(values, np.ndarray) else values[row] for row in rows}
+
+    def column(self, header):
+        for attr, (column, _) in self.schema.items():
+            if column == header:
+                return getattr(self, attr)
+        return self.extra[header]
+
+    def record(self, row):
+        """One row as a record keyed by the sheet headers"""
+        return {column: display_value(self.column(column)[row]) for column in self.header}
+
+    def version(self, row):
+        """Version stamp of a row, or "" if the sheet or row has none"""
+        versions = self.extra.get(VERSION_COLUMN)
+        return str(versions[row]) if versions is not None else ""
+
+    def stamped(self, data, version):
+        """Row data with ``version`` placed in the version column, if the sheet has one"""
+        if VERSION_COLUMN not in self.header:
+            return list(data)
+        position = self.header.index(VERSION_COLUMN)
+        data = list(data) + [""] * (position + 1 - len(data))
+        data[position] = version
+        return data
+
+    def rows(self):
+        """All rows as lists of cell values in header order"""
+        columns = [self.column(column) for column in self.header]
+        return [[display_value(values[row]) for values in columns] for row in range(self.size)]
+
+    def _columns(self):
+        """The parsed columns, {header: values}, schema columns included"""
+        columns = {column: getattr(self, attr) for attr, (column, _) in self.schema.items()}
+        columns.update(self.extra)
+        return columns
+
+    def _keeps_index(self, rows, changed):
+        """Whether ``changed``, a copy of the table with ``rows`` replaced, names those rows as before"""
+        if self._index is None or not self.key:
+            return False
+        old, new = getattr(self, self.key), getattr(changed, self.key)
+        return all(old[row] == new[row] for row in rows)
+
+    # Edits copy the parsed columns and parse only the rows they change, so an
+    # optimistic edit doesn't go through every cell of a large sheet again
+
+    def appended(self, new_rows):
+        """Copy of the table with rows added at the end"""
+        added = type(self)(self.header, [list(row) for row in new_rows])
+        columns = {column: np.concatenate([values, new]) if isinstance(values, np.ndarray) else values + new
+                   for (column, values), new in zip(self._columns().items(), added._columns().values())}
+        table = type(self).from_columns(self.header, columns, self.size + added.size)
+        if self._index is not None and self.key:
+            table._index = dict(self._index)
+            table._index.update((name, self.size + i) for i, name in enumerate(getattr(added, self.key)))
+        return table
+
+    def replaced(self, row, data):
+        return self.with_rows({row: data})
+
+    def with_rows(self, rows_by_row):
+        """Copy of the table with whole rows ({row: data}) replaced"""
+        rows = list(rows_by_row)
+        changed = type(self)(self.header, [list(rows_by_row[row]) for row in rows])
+        columns = {}
+        for (column, values), new in zip(self._columns().items(), changed._columns().values()):
+            values = values.copy() if isinstance(values, np.ndarray) else list(values)
+            for row, value in zip(rows, new):
+                values[row] = value
+            columns[column] = values
+        table = type(self).from_columns(self.header, columns, self.size)
+        if self._keeps_index(rows, table):
+            table._index = self._index
+        return table
+
+    def with_cells(self, cells):
+        """Copy of the table with {(row, header): value} cells changed"""
+        kinds = {column: kind for column, kind in self.schema.values()}
+        columns = self._columns()
+        for column in {column for _, column in cells}:
+            values = columns[column]
+            columns[column] = values.copy() if isinstance(values, np.ndarray) else list(values)
+        for (row, column), value in cells.items():
+            columns[column][row] = parse_column([value], kinds[column])[0] if column in kinds else value
+        table = type(self).from_columns(self.header, columns, self.size)
+        if self._keeps_index({row for row, _ in cells}, table):
+            table._index = self._index
+        return table
+
+    def removed(self, *rows):
+        keep = np.ones(self.size, dtype=bool)
+        keep[list(rows)] = False
+        kept = np.flatnonzero(keep).tolist()
+        columns = {column: values[keep] if isinstance(values, np.ndarray) else [values[row] for row in kept]
+                   for column, values in self._columns().items()}
+        return type(self).from_columns(self.header, columns, len(kept))
+
+    def to_records(self):
+        columns = [self.column(column) for column in self.header]
+        return [{column: display_value(values[row]) for column, values in zip(self.header, columns)}
+                for row in range(self.size)]
+
+class NutrientTable(SheetTable):
+    """A sheet with one column per nutrient, found from its header by ``nutrient_of``"""
+    __slots__ = ("_macros", "_nutrients")
+    nutrient_of = staticmethod(lambda column: None)
+
+    def _set_columns(self, columns):
+        super()._set_columns(columns)
+        self._macros = None
+        self._nutrients = None
+
+    @classmethod
+    def is_number_column(cls, column):
+        return super().is_number_column(column) or bool(cls.nutrient_of(column))
+
+    def _nutrient_data(self):
+        if self._nutrients is None:
+            columns = [column for column in self.header if self.nutrient_of(column)]
+            known = {column: attr for attr, (column, _) in self.schema.items()}
+            arrays = [getattr(self, known[column]) if column in known else parse_column(self.extra[column], FLOAT)
+                      for column in columns]
+            values = np.nan_to_num(np.column_stack(arrays)) if arrays else np.zeros((self.size, 0))
+            self._nutrients = (columns, [self.nutrient_of(column) for column in columns], values)
+        return self._nutrients
+
+    @property
+    def nutrient_columns(self):
+        """Headers of the nutrient columns, in sheet order"""
+        return self._nutrient_data()[0]
+
+    @property
+    def nutrients(self):
+        """Nutrient names ("Calories", "Protein (g)", ...) of the nutrient columns"""
+        return self._nutrient_data()[1]
+
+    @property
+    def nutrient_values(self):
+        """(rows x nutrients) array of every nutrient column with blanks as zero"""
+        return self._nutrient_data()[2]
+
+    @property
+    def macros(self):
+        """(rows x 4) array of calories, protein, carbs and fat with blanks as zero"""
+        if self._macros is None:
+            self._macros = np.nan_to_num(np.column_stack([self.kcal, self.protein, self.carbs, self.fat]))
+        return self._macros
+
+class RecipesTable(NutrientTable):
+    __slots__ = ("name", "kcal", "protein", "carbs", "fat", "servings")
+    schema = {
+        "name": ("Recipe Name", TEXT),
+        "kcal": ("Total Calories", FLOAT),
+        "protein": ("Total Protein (g)", FLOAT),
+        "carbs": ("Total Carbohydrates (g)", FLOAT),
+        "fat": ("Total Fat (g)", FLOAT),
+        "servings": ("Portion Size (e.g., servings)", FLOAT),
+    }
+    key = "name"
+    change_key = "name"
+    nutrient_of = staticmethod(recipe_nutrient)
+
+    @property
+    def per_serving(self):
+        """Macros of one serving; recipes without a usable serving count count as one serving"""
+        servings = np.where(np.isfinite(self.servings) & (self.servings > 0), self.servings, 1.0)
+        return self.macros / servings[:, None]
+
+    @property
+    def formula_totals(self):
+        """Boolean array of the recipes whose totals Sheets computes (see FORMULA_TOTALS_COLUMN)"""
+        marks = self.extra.get(FORMULA_TOTALS_COLUMN, [""] * self.size)
+        return np.fromiter((is_marked(mark) for mark in marks), dtype=bool, count=self.size)
+
+class IngredientsTable(NutrientTable):
+    __slots__ = ("name", "kcal", "protein", "carbs", "fat", "unit")
+    schema = {
+        "name": ("Ingredient Name", TEXT),
+        "kcal": ("Calories (per 100g)", FLOAT),
+        "protein": ("Protein (g per 100g)", FLOAT),
+        "carbs": ("Carbohydrates (g per 100g)", FLOAT),
+        "fat": ("Fat (g per 100g)", FLOAT),
+        "unit": ("Unit (e.g., grams, ml, piece)", TEXT),
+    }
+    key = "name"
+    change_key = "name"
+    nutrient_of = staticmethod(ingredient_nutrient)
+
+class RecipeIngredientsTable(SheetTable):
+    __slots__ = ("recipe", "ingredient", "quantity", "unit")
+    schema = {
+        "recipe": ("Recipe Name", TEXT),
+        "ingredient": ("Ingredient Name", TEXT),
+        "quantity": ("Quantity", FLOAT),
+        "unit": ("Unit (of ingredient, e.g., grams, ml)", TEXT),
+    }
+    change_key = "recipe"
+
+class MealPlanTable(SheetTable):
+    __slots__ = ("date", "meal_type", "recipe", "portion", "day")
+    schema = {
+        "date": ("Date", DATE),
+        "meal_type": ("Meal Type", TEXT),
+        "recipe": ("Recipe Name", TEXT),
+        "portion": ("Portion Size (for the meal plan, referring to the recipe's portion size)", FLOAT),
+    }
+    # Day numbers, as MealPlanTable.day and between() use
+    change_key = "day"
+
+    def _set_columns(self, columns):
+        super()._set_columns(columns)
+        # Day number of each meal (-1 when the date could not be parsed) for range masks
+        self.day = np.fromiter((d.toordinal() if isinstance(d, date) else -1 for d in self.date),
+                               dtype=np.int64, count=self.size)
+
+    def between(self, start_date, end_date):
+        """Boolean mask of meals planned from start_date to end_date inclusive"""
+        return (self.day >= start_date.toordinal()) & (self.day <= end_date.toordinal())
+
+class MealTemplatesTable(SheetTable):
+    """Saved groups of meals; ``day`` counts from 1 within a template of ``length`` days"""
+    __slots__ = ("template", "day", "meal_type", "recipe", "portion", "length")
+    schema = {
+        "template": ("Template Name", TEXT),
+        "day": ("Day", FLOAT),
+        "meal_type": ("Meal Type", TEXT),
+        "recipe": ("Recipe Name", TEXT),
+        "portion": ("Portion Size", FLOAT),
+        "length": ("Length (days)", FLOAT),
+    }
+    change_key = "template"
+
+    @property
+    def names(self):
+        """Template names in the order they were first saved"""
+        return list(dict.fromkeys(self.template))
+
+TABLE_TYPES = {
+    "Recipes": RecipesTable,
+    "Ingredients": IngredientsTable,
+    "Recipe_Ingredients": RecipeIngredientsTable,
+    "Meal_Plan": MealPlanTable,
+    "Meal_Templates": MealTemplatesTable,
+}
+
+def table_type(sheet_name):
+    if sheet_name.startswith(MEAL_PLAN_ARCHIVE_PREFIX):
+        return MealPlanTable
+    return TABLE_TYPES.get(sheet_name, SheetTable)
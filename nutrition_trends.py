@@ -0,0 +1,53 @@
+"""
+Daily nutrition trends over months or years.
+
+daily_series turns the meal plan into one row of totals per day, from the first
+to the last day with meals, and moving_average smooths it with a trailing
+window. Years of history are thousands of points per line, many more than the
+pixels across a chart, so a chart should not plot them all: min_max_indices
+keeps, for every pixel column of the range on show, the first, lowest, highest
+and last point. A line through those points covers the same pixels as one
+through every day, and redrawing it after a pan or zoom touches at most four
+points per pixel however long the history is.
+"""
+
+from datetime import date
+import numpy as np
+
+from nutrition_core import daily_total_values
+
+def daily_series(meal_plan, recipes, start_date, end_date):
+    """(first day, days x nutrients array of daily totals) covering the first to the
+    last day with meals in the range; (None, empty array) when there are none"""
+    days = meal_plan.day[meal_plan.between(start_date, end_date)]
+    if not len(days):
+        return None, np.zeros((0, len(recipes.nutrients)))
+    first, last = date.fromordinal(int(days.min())), date.fromordinal(int(days.max()))
+    return first, daily_total_values(meal_plan, recipes, first, last)
+
+def moving_average(values, window):
+    """Trailing mean over ``window`` days of each column (over the days there are at the start)"""
+    values = np.asarray(values, dtype=np.float64)
+    window = max(int(window), 1)
+    sums = np.cumsum(values, axis=0)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return sums / counts.reshape((-1,) + (1,) * (values.ndim - 1))
+
+def min_max_indices(values, start, stop, buckets):
+    """Indices, in order, of the points of values[start:stop] worth drawing across
+    ``buckets`` pixel columns: the first, lowest, highest and last of each"""
+    start, stop = max(int(start), 0), min(int(stop), len(values))
+    count = stop - start
+    buckets = max(int(buckets), 1)
+    if count <= 4 * buckets:
+        return np.arange(start, max(stop, start))
+
+    size = -(-count // buckets)
+    segment = np.asarray(values[start:stop], dtype=np.float64)
+    # Pad the last bucket with its last value; argmin/argmax pick the first of equal points
+    padded = np.concatenate([segment, np.full(-(-count // size) * size - count, segment[-1])]).reshape(-1, size)
+    first = start + np.arange(len(padded)) * size
+    picks = np.stack([first, first + padded.argmin(axis=1), first + padded.argmax(axis=1), first + size - 1], axis=1)
+    picks = np.minimum(np.sort(picks, axis=1), stop - 1).ravel()
+    return picks[np.concatenate([[True], picks[1:] != picks[:-1]])]
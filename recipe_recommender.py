@@ -0,0 +1,140 @@
+"""
+"What should I eat next" suggestions for the meal planner.
+
+Recipes are points in macro space: one row per recipe with the calories,
+protein, carbohydrates and fat of a serving, each divided by its daily target
+so that grams and calories weigh the same (as in auto_plan_meals). For a goal g
+(what the next meal should bring) the best portion p of a recipe v is
+(v . g) / (v . v), and the error left is |g|^2 sin^2 of the angle between v and
+g. The recipes that can fill the goal best are therefore the ones pointing the
+same way, i.e. the nearest neighbours of g/|g| among the unit recipe vectors.
+
+A k-d tree over those unit vectors finds them without looking at every recipe;
+the candidates it returns are then scored exactly with portions rounded and
+clipped to the allowed range. The tree depends on the targets, so it is built
+once per recipe table and set of targets and reused for every query.
+"""
+
+import heapq
+import numpy as np
+
+from nutrition_core import DEFAULT_MEAL_SHARES, build_recipe_matrix, meal_scales
+
+class KDTree:
+    """Static k-d tree for nearest-neighbour queries over the rows of a low-dimensional array"""
+
+    def __init__(self, points, leaf_size=32):
+        points = np.asarray(points, dtype=np.float64)
+        self.leaf_size = leaf_size
+        self.order = np.arange(len(points))
+        self.ranges, self.children, lower, upper = [], [], [], []
+        if len(points):
+            self._build(points, 0, len(points), lower, upper)
+        # Points stored in tree order, so every leaf is one contiguous block
+        self.points = points[self.order]
+        self.lower = np.array(lower)
+        self.upper = np.array(upper)
+
+    def _build(self, points, start, end, lower, upper):
+        node = len(self.ranges)
+        block = points[self.order[start:end]]
+        lower.append(block.min(axis=0))
+        upper.append(block.max(axis=0))
+        self.ranges.append((start, end))
+        self.children.append(None)
+        if end - start > self.leaf_size:
+            # Split the widest dimension at its median
+            dim = int(np.argmax(upper[node] - lower[node]))
+            middle = (start + end) // 2
+            split = np.argpartition(block[:, dim], middle - start)
+            self.order[start:end] = self.order[start:end][split]
+            self.children[node] = (self._build(points, start, middle, lower, upper),
+                                   self._build(points, middle, end, lower, upper))
+        return node
+
+    def __len__(self):
+        return len(self.order)
+
+    def query(self, point, k):
+        """Row numbers of the k points nearest to ``point`` and their squared distances, nearest first"""
+        k = min(k, len(self))
+        best_distances = np.full(k, np.inf)
+        best_rows = np.full(k, -1, dtype=np.int64)
+        if not k:
+            return best_rows, best_distances
+
+        # Best-first search: visit nodes by the distance from the point to their bounding box
+        heap = [(0.0, 0)]
+        while heap:
+            bound, node = heapq.heappop(heap)
+            if bound >= best_distances[-1]:
+                break
+            children = self.children[node]
+            if children is None:
+                start, end = self.ranges[node]
+                distances = ((self.points[start:end] - point) ** 2).sum(axis=1)
+                merged_distances = np.concatenate([best_distances, distances])
+                merged_rows = np.concatenate([best_rows, self.order[start:end]])
+                nearest = np.argsort(merged_distances, kind="stable")[:k]
+                best_distances, best_rows = merged_distances[nearest], merged_rows[nearest]
+            else:
+                for child in children:
+                    gap = np.maximum(self.lower[child] - point, 0) + np.maximum(point - self.upper[child], 0)
+                    heapq.heappush(heap, (float(gap @ gap), child))
+        found = best_rows >= 0
+        return best_rows[found], best_distances[found]
+
+class RecipeRecommender:
+    """Recipes and portions that best fill what is left of the daily targets"""
+
+    def __init__(self, recipes, targets, leaf_size=32):
+        self.names, self.matrix = build_recipe_matrix(recipes)
+        target = np.asarray(targets, dtype=np.float64)
+        self.targets = target
+        self.weights = 1.0 / np.where(target > 0, target, 1.0)
+        self.scaled = self.matrix * self.weights
+        self.norms = np.einsum("ij,ij->i", self.scaled, self.scaled)
+        lengths = np.sqrt(self.norms)
+        self.tree = KDTree(self.scaled / np.where(lengths > 0, lengths, 1.0)[:, None], leaf_size)
+
+    def suggest(self, goal, count=5, exclude=(), min_portion=0.25, max_portion=3.0, portion_step=0.25, oversample=8):
+        """Up to ``count`` (recipe name, portion, macros eaten) tuples for a meal that should
+        bring ``goal`` calories/protein/carbs/fat, best first.
+
+        Only the ``oversample`` x count recipes nearest in direction are scored, so
+        rounding and clipping the portion can reorder them but never brings in a
+        recipe the index did not return.
+        """
+        scaled_goal = np.maximum(np.asarray(goal, dtype=np.float64), 0) * self.weights
+        length = np.sqrt(scaled_goal @ scaled_goal)
+        if not length or not len(self.tree):
+            return []
+
+        rows, _ = self.tree.query(scaled_goal / length, count * oversample + len(exclude))
+        if exclude:
+            rows = rows[[self.names[row] not in exclude for row in rows.tolist()]]
+        candidates = self.scaled[rows]
+        portions = np.divide(candidates @ scaled_goal, self.norms[rows], out=np.zeros(len(rows)), where=self.norms[rows] > 0)
+        portions = np.clip(np.round(portions / portion_step) * portion_step, min_portion, max_portion)
+        residual = scaled_goal - candidates * portions[:, None]
+        errors = np.einsum("ij,ij->i", residual, residual)
+
+        best = np.argsort(errors, kind="stable")[:count]
+        return [(self.names[rows[i]], float(portions[i]), (self.matrix[rows[i]] * portions[i]).tolist())
+                for i in best.tolist()]
+
+def meal_goal(meal_plan, recipes, mask, targets, meal_type, planned_types=(), meal_shares=None):
+    """Calories/protein/carbs/fat the next ``meal_type`` meal should bring.
+
+    What the meals selected by ``mask`` leave of the daily targets is shared out
+    over the meal types not planned yet (``planned_types`` are taken), in the
+    proportions auto_plan_meals uses.
+    """
+    _, recipe_rows, scales = meal_scales(meal_plan, recipes, mask)
+    remaining = np.asarray(targets, dtype=np.float64) - (recipes.macros[recipe_rows] * scales[:, None]).sum(axis=0)
+    meal_shares = meal_shares or DEFAULT_MEAL_SHARES
+    open_types = {t for t in meal_shares if t not in planned_types} | {meal_type}
+    share = meal_shares.get(meal_type, 0.0)
+    open_share = sum(meal_shares.get(t, 0.0) for t in open_types)
+    fraction = share / open_share if share and open_share else 1.0
+    return np.maximum(remaining, 0) * fraction
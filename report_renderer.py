@@ -0,0 +1,177 @@
+"""
+Batch nutrition reports rendered to PDF or PNG.
+
+The report for a date range has a summary page (averages and weekly trends), a
+top recipes page and one page of daily bar charts per week. The parent process
+only prepares plain page data; every page is drawn by a worker process with the
+Agg backend, so a year of daily charts uses all cores and nothing here touches
+Qt. Workers are spawned rather than forked, which keeps them safe to start from
+the running desktop application.
+
+PNG output writes one file per page into a directory. PDF output puts the
+rendered pages into a single multi-page file (the pages are images at the
+requested dpi).
+"""
+
+import io
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from nutrition_core import daily_totals, meal_scales
+
+NUTRIENT_COLORS = ["#FF6B6B", "#4ECDC4", "#45B7D1", "#FFA07A", "#98D8C8", "#F7DC6F", "#BB8FCE", "#85C1E9",
+                   "#F8B88B", "#82E0AA"]
+PAGE_SIZE = (11.69, 8.27)  # A4 landscape, inches
+TOP_RECIPES = 15
+
+def nutrient_colors(count):
+    """One color per nutrient; the palette repeats when there are more nutrients than colors"""
+    return [NUTRIENT_COLORS[i % len(NUTRIENT_COLORS)] for i in range(count)]
+
+def short_name(nutrient):
+    """Nutrient name without its unit, for crowded axes"""
+    return nutrient.rpartition(" (")[0] or nutrient
+
+def build_report_pages(meal_plan, recipes, start_date, end_date, title="Nutrition Report"):
+    """Plain (picklable) description of every page of the report"""
+    nutrients = recipes.nutrients
+    totals = daily_totals(meal_plan, recipes, start_date, end_date)
+    dates = list(totals)
+    values = np.array(list(totals.values())).reshape(len(dates), len(nutrients))
+    subtitle = f"{start_date:%B %d, %Y} - {end_date:%B %d, %Y}"
+
+    # Weekly averages over the days that have any meals planned
+    planned = values[:, 0] > 0
+    weeks = [(dates[i], values[i:i + 7][planned[i:i + 7]]) for i in range(0, len(dates), 7)]
+    weekly = [(week_start, week.mean(axis=0) if len(week) else np.zeros(len(nutrients))) for week_start, week in weeks]
+
+    rows, recipe_rows, scales = meal_scales(meal_plan, recipes, meal_plan.between(start_date, end_date))
+    counts = np.bincount(recipe_rows, minlength=len(recipes))
+    calories = np.bincount(recipe_rows, weights=recipes.macros[recipe_rows, 0] * scales, minlength=len(recipes))
+    top = [i for i in np.argsort(-counts, kind="stable")[:TOP_RECIPES].tolist() if counts[i]]
+
+    pages = [{
+        "kind": "summary", "title": title, "subtitle": subtitle, "nutrients": nutrients,
+        "average": (values[planned].mean(axis=0) if planned.any() else np.zeros(len(nutrients))).tolist(),
+        "planned_days": int(planned.sum()), "days": len(dates),
+        "week_starts": [week_start for week_start, _ in weekly],
+        "weekly": [average.tolist() for _, average in weekly],
+    }, {
+        "kind": "top_recipes", "title": f"{title} - Top Recipes", "subtitle": subtitle,
+        "names": [recipes.name[i] for i in top], "counts": [int(counts[i]) for i in top],
+        "calories": [float(calories[i]) for i in top],
+    }]
+    for i in range(0, len(dates), 7):
+        pages.append({
+            "kind": "week", "title": f"{title} - Week of {dates[i]}", "subtitle": subtitle, "nutrients": nutrients,
+            "dates": dates[i:i + 7], "totals": values[i:i + 7].tolist(),
+        })
+    return pages
+
+def render_page(page, dpi=100):
+    """Draw one page with Agg and return it as PNG bytes (runs in a worker process)"""
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=PAGE_SIZE, dpi=dpi)
+    FigureCanvasAgg(fig)
+    fig.suptitle(f"{page['title']}\n{page['subtitle']}", fontsize=14)
+
+    if page["kind"] == "summary":
+        ax = fig.add_subplot(2, 1, 1)
+        ax.axis("off")
+        lines = [f"{nutrient}: {value:.1f} per day" for nutrient, value in zip(page["nutrients"], page["average"])]
+        ax.text(0.02, 0.9, f"{page['planned_days']} of {page['days']} days planned\n\n" + "\n".join(lines),
+                va="top", fontsize=12, family="monospace")
+
+        ax = fig.add_subplot(2, 1, 2)
+        nutrients = page["nutrients"]
+        colors = nutrient_colors(len(nutrients))
+        weekly = np.array(page["weekly"]).reshape(-1, len(nutrients))
+        x = np.arange(len(weekly))
+        # The first nutrient (calories) is on its own axis, the rest share the right-hand one
+        if nutrients:
+            ax.plot(x, weekly[:, 0], color=colors[0], marker="o", label=nutrients[0])
+            ax.set_ylabel(f"{nutrients[0]} per day")
+        others = ax.twinx()
+        for j in range(1, len(nutrients)):
+            others.plot(x, weekly[:, j], color=colors[j], marker=".", label=nutrients[j])
+        others.set_ylabel("Amount per day")
+        step = max(1, len(x) // 12)
+        ax.set_xticks(x[::step], page["week_starts"][::step], rotation=30, ha="right")
+        ax.set_title("Weekly averages")
+        fig.legend(loc="upper right", bbox_to_anchor=(0.95, 0.82), ncol=1 + len(nutrients) // 12)
+        fig.subplots_adjust(left=0.08, right=0.92, top=0.85, bottom=0.12)
+
+    elif page["kind"] == "top_recipes":
+        ax = fig.add_subplot(1, 1, 1)
+        names = page["names"][::-1]
+        ax.barh(names, page["counts"][::-1], color=NUTRIENT_COLORS[2])
+        for y, (count, calories) in enumerate(zip(page["counts"][::-1], page["calories"][::-1])):
+            ax.text(count, y, f"  {count}x, {calories:.0f} kcal", va="center")
+        ax.set_xlabel("Times planned")
+        if not names:
+            ax.text(0.5, 0.5, "No meals planned", ha="center", transform=ax.transAxes)
+        fig.subplots_adjust(left=0.25, right=0.9, top=0.85, bottom=0.08)
+
+    else:
+        nutrients = page["nutrients"]
+        for i, (date_str, values) in enumerate(zip(page["dates"], page["totals"])):
+            ax = fig.add_subplot(2, 4, i + 1)
+            bars = ax.bar(range(len(nutrients)), values, color=nutrient_colors(len(nutrients)))
+            ax.set_xticks(range(len(nutrients)), [short_name(nutrient) for nutrient in nutrients],
+                          rotation=45, ha="right", fontsize=7)
+            ax.set_title(date_str, fontsize=10)
+            for bar, value in zip(bars, values):
+                ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height(), f"{value:.0f}",
+                        ha="center", va="bottom", fontsize=8)
+        # Fixed margins: tight_layout would measure every label and double the drawing time
+        fig.subplots_adjust(left=0.06, right=0.97, top=0.85, bottom=0.1, wspace=0.3, hspace=0.45)
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=dpi)
+    return buffer.getvalue()
+
+def render_pages(pages, dpi=100, workers=None):
+    """PNG bytes of every page, drawn in parallel by a pool of worker processes"""
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                             mp_context=multiprocessing.get_context("spawn")) as pool:
+        return list(pool.map(render_page, pages, [dpi] * len(pages)))
+
+def write_report(images, output, dpi=100):
+    """Save rendered pages as one PDF (output ending in .pdf) or as PNGs in the output directory.
+
+    Returns the paths written.
+    """
+    if output.lower().endswith(".pdf"):
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.image as mpimg
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_pdf import PdfPages
+
+        with PdfPages(output) as pdf:
+            for image in images:
+                pixels = mpimg.imread(io.BytesIO(image), format="png")
+                height, width = pixels.shape[:2]
+                fig = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+                fig.figimage(pixels)
+                pdf.savefig(fig, dpi=dpi)
+        return [output]
+
+    os.makedirs(output, exist_ok=True)
+    paths = []
+    for number, image in enumerate(images, start=1):
+        path = os.path.join(output, f"page-{number:03d}.png")
+        with open(path, "wb") as f:
+            f.write(image)
+        paths.append(path)
+    return paths
+
+def render_report(meal_plan, recipes, start_date, end_date, output, title="Nutrition Report", dpi=100, workers=None):
+    pages = build_report_pages(meal_plan, recipes, start_date, end_date, title)
+    return write_report(render_pages(pages, dpi, workers), output, dpi)
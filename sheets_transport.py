@@ -0,0 +1,112 @@
+"""
+HTTP transport for the Google Sheets client.
+
+gspread's default client opens a plain AuthorizedSession and renews the access
+token only when a request finds it (nearly) expired, so roughly once an hour a
+load or save on whichever thread happens to run it first waits for the token
+endpoint as well. PooledHTTPClient, passed to gspread as its ``http_client``:
+
+- keeps one keep-alive connection pool sized for the background loaders,
+  writer, server threads and report workers that share it;
+- retries failed connects and dropped keep-alive connections on idempotent
+  requests, so reconnecting after sleep or a network change is invisible;
+- asks for gzip-compressed responses (Google only compresses for clients whose
+  User-Agent says "gzip");
+- renews the token on a daemon thread a few minutes before it expires.
+"""
+
+import threading
+from datetime import datetime, timezone
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from google.auth.transport.requests import AuthorizedSession, Request
+from gspread.http_client import HTTPClient
+from gspread.utils import convert_credentials
+
+POOL_SIZE = 16
+# (connect, read) seconds; a connection that went away must not hang a worker forever
+TIMEOUT = (10, 120)
+USER_AGENT = "nutrition-meal-planner (gzip)"
+
+# Renew this long before expiry; google-auth itself refreshes, blocking, inside 3m45s
+TOKEN_REFRESH_MARGIN = 300
+TOKEN_RETRY_DELAY = 30
+
+def pooled_session(credentials, pool_size=POOL_SIZE):
+    """AuthorizedSession with a sized keep-alive pool, connection retries and gzip"""
+    session = AuthorizedSession(credentials)
+    # Only connection failures are retried for writes, which cannot have reached Sheets
+    retry = Retry(total=3, connect=3, read=2, status=0, backoff_factor=0.3,
+                  allowed_methods=Retry.DEFAULT_ALLOWED_METHODS)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip", "User-Agent": USER_AGENT})
+    return session
+
+class TokenRefresher(threading.Thread):
+    """Daemon thread that renews the access token shortly before it expires"""
+
+    def __init__(self, credentials, margin=TOKEN_REFRESH_MARGIN):
+        super().__init__(name="sheets-token-refresh", daemon=True)
+        self.credentials = credentials
+        self.margin = margin
+        self.request = Request(requests.Session())
+        self.stopped = threading.Event()
+
+    def seconds_left(self):
+        """Seconds until the token should be renewed (0 when there is none yet)"""
+        expiry = self.credentials.expiry
+        if not self.credentials.token or expiry is None:
+            return 0
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return max((expiry - now).total_seconds() - self.margin, 0)
+
+    def run(self):
+        while not self.stopped.wait(self.seconds_left()):
+            try:
+                self.credentials.refresh(self.request)
+            except Exception as e:
+                # Requests keep refreshing by themselves if this keeps failing
+                print(f"Error refreshing Google credentials: {e}")
+                if self.stopped.wait(TOKEN_RETRY_DELAY):
+                    break
+
+    def stop(self):
+        self.stopped.set()
+
+class PooledHTTPClient(HTTPClient):
+    """gspread HTTP client over pooled_session with background token renewal"""
+
+    def __init__(self, auth, session=None):
+        credentials = convert_credentials(auth)
+        super().__init__(credentials, session or pooled_session(credentials))
+        self.auth = credentials
+        self.timeout = TIMEOUT
+        self.token_refresher = TokenRefresher(credentials)
+        self.token_refresher.start()
+
+    def close(self):
+        self.token_refresher.stop()
+        self.session.close()
+
+class RequestCounter:
+    """Counts the requests made through a session, and the (decompressed) bytes they
+    returned, while used as a context manager"""
+
+    def __init__(self, session):
+        self.session = session
+        self.requests = 0
+        self.received = 0
+
+    def count(self, response, *args, **kwargs):
+        self.requests += 1
+        self.received += len(response.content)
+
+    def __enter__(self):
+        self.session.hooks["response"].append(self.count)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.session.hooks["response"].remove(self.count)
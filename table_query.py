@@ -0,0 +1,151 @@
+"""
+Filtering and sorting of the Recipes and Ingredients tabs.
+
+A filter is a line of words and comparisons, e.g.
+
+    chicken protein>=30 kcal<500 "stir fry" servings=2..4
+
+Words (or quoted phrases) must all appear, ignoring case, in one of the row's
+text cells. A comparison names a number column, either by its short name in the
+table schema (``kcal``, ``protein``, ``carbs``, ``fat``, ``servings``) or by any
+part of its header ("calories", "Fiber"), and takes <, <=, >, >=, = or a
+``low..high`` range. Blank cells never satisfy a comparison.
+
+Comparisons are whole-column numpy operations on the table's float arrays, and
+words are only looked for in the rows the comparisons left. Sorting uses an
+order computed once per column and table, so a sorted filter result is that
+order with the hidden rows dropped and no sort runs while typing.
+"""
+
+import re
+import numpy as np
+
+from nutrition_tables import FLOAT, VERSION_COLUMN, parse_column, parse_float
+
+NUMBER = r"-?(?:\d+(?:\.\d+)?|\.\d+)"
+FILTER_TOKEN = re.compile(rf'\s*(?:"(?P<quoted>[^"]*)"?|(?P<word>[^\s<>="]+))'
+                          rf'(?:\s*(?P<op><=|>=|<|>|=)\s*(?P<low>{NUMBER})(?:\.\.(?P<high>{NUMBER}))?)?')
+COMPARISONS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "=": np.equal,
+}
+
+def parse_filter(text):
+    """Words and (column, operator, number) comparisons of a filter line.
+
+    Raises ValueError for text that is neither, such as a comparison without a number.
+    """
+    terms, comparisons = [], []
+    position, text = 0, text.rstrip()
+    while position < len(text):
+        match = FILTER_TOKEN.match(text, position)
+        if not match or match.end() == position:
+            raise ValueError(f"Could not read the filter at '{text[position:].strip()}'")
+        position = match.end()
+        name = match.group("quoted") if match.group("quoted") is not None else match.group("word")
+        op, low, high = match.group("op", "low", "high")
+        if op is None:
+            if name.strip():
+                terms.append(name.casefold())
+        elif high is not None:
+            if op != "=":
+                raise ValueError(f"Use '=' with a range: {name}={low}..{high}")
+            comparisons += [(name, ">=", float(low)), (name, "<=", float(high))]
+        else:
+            comparisons.append((name, op, float(low)))
+    return terms, comparisons
+
+class TableQuery:
+    """Filter masks and sort orders over one SheetTable, with per-column keys computed once"""
+
+    def __init__(self, table):
+        self.table = table
+        self._numbers = {}
+        self._text = None
+        self._orders = {}
+
+    def numbers(self, header):
+        """Float array of a column, or None if it holds text"""
+        if header not in self._numbers:
+            kinds = {column: kind for column, kind in self.table.schema.values()}
+            if header == VERSION_COLUMN:
+                values = None
+            elif header in kinds:
+                values = self.table.column(header) if kinds[header] == FLOAT else None
+            else:
+                # Columns outside the schema are numbers when every filled-in cell is one
+                cells = self.table.column(header)
+                first = next((cell for cell in cells if str(cell).strip()), None)
+                values = None
+                if first is not None and not np.isnan(parse_float(first)):
+                    values = parse_column(cells, FLOAT)
+                    filled = np.fromiter((str(cell).strip() != "" for cell in cells), dtype=bool, count=len(cells))
+                    if np.isnan(values[filled]).any():
+                        values = None
+            self._numbers[header] = values
+        return self._numbers[header]
+
+    @property
+    def number_columns(self):
+        return [column for column in self.table.header if self.numbers(column) is not None]
+
+    def resolve(self, name):
+        """Header of the number column a comparison names"""
+        key = name.casefold()
+        for attr, (column, kind) in self.table.schema.items():
+            if attr == key and kind == FLOAT and column in self.table.header:
+                return column
+        matches = [column for column in self.number_columns if key in column.casefold()]
+        if not matches:
+            raise ValueError(f"No number column matches '{name}'")
+        # "fat" means "Total Fat (g)" rather than "Total Saturated Fat (g)"
+        return min(matches, key=len)
+
+    def text(self):
+        """Casefolded text cells of each row, joined, for word matching"""
+        if self._text is None:
+            columns = [[str(cell).casefold() for cell in self.table.column(column)] for column in self.table.header
+                       if column != VERSION_COLUMN and self.numbers(column) is None]
+            self._text = list(map("\n".join, zip(*columns))) if columns else [""] * len(self.table)
+        return self._text
+
+    def mask(self, terms=(), comparisons=()):
+        """Boolean mask of the rows that contain every word and pass every comparison"""
+        mask = np.ones(len(self.table), dtype=bool)
+        for name, op, value in comparisons:
+            mask &= COMPARISONS[op](self.numbers(self.resolve(name)), value)
+        if terms:
+            text = self.text()
+            rows = np.flatnonzero(mask)
+            for term in terms:
+                rows = rows[np.fromiter((term in text[row] for row in rows.tolist()), dtype=bool, count=len(rows))]
+            mask = np.zeros(len(self.table), dtype=bool)
+            mask[rows] = True
+        return mask
+
+    def order(self, header, descending=False):
+        """Every row number sorted by a column, blank cells last either way and ties in sheet order"""
+        if (header, descending) not in self._orders:
+            values = self.numbers(header)
+            if values is not None:
+                # NaN (blank) sorts last whatever the sign
+                order = np.argsort(-values if descending else values, kind="stable")
+            else:
+                keys = [str(cell).casefold() for cell in self.table.column(header)]
+                order = np.array(sorted(range(len(keys)), key=keys.__getitem__, reverse=descending), dtype=np.int64)
+                if not descending:
+                    # Blanks sort first as text; put them behind the filled cells
+                    blank = keys.count("")
+                    order = np.concatenate([order[blank:], order[:blank]])
+            self._orders[header, descending] = order
+        return self._orders[header, descending]
+
+    def rows(self, mask, sort_column=None, descending=False):
+        """Row numbers the mask keeps, in sheet order or sorted by ``sort_column``"""
+        if sort_column is None:
+            return np.flatnonzero(mask)
+        order = self.order(sort_column, descending)
+        return order[mask[order]]
@@ -6,6 +6,7 @@ This script tests the core functionality without requiring a GUI display
 
 import sys
 import os
+import traceback
 
 # Add the current directory to the Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -43,7 +44,7 @@ def test_google_sheets_manager():
     print("\nTesting GoogleSheetsManager...")
     try:
         # Import the class from our application
-        from nutrition_meal_planner_final import GoogleSheetsManager
+        from nutrition_core import GoogleSheetsManager
         
         # Test initialization (this will try to connect)
         manager = GoogleSheetsManager()
@@ -90,24 +91,766 @@ def test_application_structure():
         print(f"[FAIL] Application structure error: {e}")
         return False
 
+CATALOG_RECIPES = [
+    {"Recipe Name": "Oats", "Total Calories": 800, "Total Protein (g)": 30,
+     "Total Carbohydrates (g)": 120, "Total Fat (g)": 15, "Portion Size (e.g., servings)": 2},
+    {"Recipe Name": "Chicken Rice", "Total Calories": 1400, "Total Protein (g)": 120,
+     "Total Carbohydrates (g)": 150, "Total Fat (g)": 30, "Portion Size (e.g., servings)": 2},
+    {"Recipe Name": "Salad", "Total Calories": 300, "Total Protein (g)": 10,
+     "Total Carbohydrates (g)": 20, "Total Fat (g)": 20, "Portion Size (e.g., servings)": 1},
+    {"Recipe Name": "Unused", "Total Calories": 0, "Total Protein (g)": 0,
+     "Total Carbohydrates (g)": 0, "Total Fat (g)": 0, "Portion Size (e.g., servings)": 1},
+]
+
+def test_auto_plan():
+    """Test the auto-planner against a small in-memory recipe catalog"""
+    print("\nTesting auto-plan...")
+    from datetime import date
+    from nutrition_core import auto_plan_meals
+    from nutrition_tables import RecipesTable
+
+    rows = auto_plan_meals(RecipesTable.from_records(CATALOG_RECIPES), [2000, 150, 200, 65], date(2024, 1, 1), date(2024, 1, 2),
+                           meal_types=["Breakfast", "Lunch", "Dinner"], max_uses=0,
+                           excluded={"Salad"})
+
+    names = {row[2] for row in rows}
+    assert len(rows) == 4
+    assert "Salad" not in names
+    assert "Unused" not in names
+    print(f"[OK] Auto-plan produced {len(rows)} meals")
+
+def test_recommender():
+    """Test recipe suggestions for what is left of the daily targets"""
+    print("\nTesting recipe suggestions...")
+    from nutrition_tables import RecipesTable
+    from recipe_recommender import RecipeRecommender
+    suggestions = RecipeRecommender(RecipesTable.from_records(CATALOG_RECIPES), [2000, 150, 200, 65]).suggest(
+        [700, 60, 75, 15], count=2, exclude={"Salad"})
+    assert [name for name, _, _ in suggestions] == ["Chicken Rice", "Oats"]
+    assert suggestions[0][1] == 1.0
+    print("[OK] Recipes suggested for the remaining targets")
+
+# Sample data shared by the tests of the GUI-free core
+SAMPLE_RECIPES = [{"Recipe Name": "Oats", "Total Calories": 800, "Total Protein (g)": 30,
+                   "Total Carbohydrates (g)": 120, "Total Fat (g)": 15, "Portion Size (e.g., servings)": 2}]
+SAMPLE_MEALS = [{"Date": "2024-01-01", "Meal Type": "Breakfast", "Recipe Name": "Oats",
+                 "Portion Size (for the meal plan, referring to the recipe's portion size)": 1.5}]
+
+def sample_tables():
+    from nutrition_tables import RecipesTable, MealPlanTable
+    return MealPlanTable.from_records(SAMPLE_MEALS), RecipesTable.from_records(SAMPLE_RECIPES)
+
+class Formula(str):
+    """A cell Sheets holds as a formula rather than as text"""
+
+def cell_text(value):
+    """A cell as values.get returns it (formatted text)"""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def parse_a1(a1):
+    """0-based (first row, first column, last row, last column) of an A1 range, None where it is open"""
+    import re
+    from gspread.utils import a1_to_rowcol
+    if not a1:
+        return None, None, None, None
+    corners = []
+    for corner in a1.split(":"):
+        letters, digits = re.fullmatch(r"\$?([A-Z]*)\$?(\d*)", corner).groups()
+        column = a1_to_rowcol(f"{letters}1")[1] - 1 if letters else None
+        corners.append((int(digits) - 1 if digits else None, column))
+    (first_row, first_column), (last_row, last_column) = corners[0], corners[-1]
+    return first_row, first_column, last_row, last_column
+
+class FakeWorksheet:
+    """A worksheet held in memory with the cells as Sheets would store them"""
+
+    def __init__(self, spreadsheet, sheet_id, title, values):
+        self.spreadsheet = spreadsheet
+        self.id = sheet_id
+        self.title = title
+        self.rows = [list(row) for row in values]
+
+    @property
+    def row_count(self):
+        return len(self.rows)
+
+    @property
+    def col_count(self):
+        return max((len(row) for row in self.rows), default=0)
+
+    def enter(self, row, column, value, value_input_option="RAW"):
+        """Store a value the way the Sheets API does for the given valueInputOption"""
+        if value_input_option == "USER_ENTERED" and isinstance(value, str):
+            from nutrition_tables import parse_float
+            if value.startswith("="):
+                value = Formula(value)
+            elif parse_float(value) == parse_float(value):
+                # Text that looks like a number (or a date, or "+1") stops being text
+                value = parse_float(value)
+        while len(self.rows) <= row:
+            self.rows.append([])
+        cells = self.rows[row]
+        cells.extend([""] * (column + 1 - len(cells)))
+        cells[column] = value
+
+    def write(self, first_row, first_column, values, value_input_option="RAW"):
+        for row, cells in enumerate(values, start=first_row):
+            for column, value in enumerate(cells, start=first_column):
+                self.enter(row, column, value, value_input_option)
+
+    def cell_value(self, row, column):
+        cells = self.rows[row] if row < len(self.rows) else []
+        return cells[column] if column < len(cells) else ""
+
+    def get_all_values(self):
+        self.spreadsheet.log("get_all_values", self.title)
+        return [[cell_text(value) for value in row] for row in self.rows]
+
+    def row_values(self, row):
+        self.spreadsheet.log("row_values", self.title)
+        return [cell_text(value) for value in self.rows[row - 1]]
+
+    def col_values(self, column):
+        self.spreadsheet.log("col_values", self.title)
+        return [cell_text(self.cell_value(row, column - 1)) for row in range(len(self.rows))]
+
+    def cell(self, row, column):
+        from types import SimpleNamespace
+        self.spreadsheet.log("cell", self.title)
+        return SimpleNamespace(value=cell_text(self.cell_value(row - 1, column - 1)))
+
+    def append_rows(self, rows, value_input_option="RAW"):
+        self.spreadsheet.log("append_rows", self.title)
+        self.write(len(self.rows), 0, rows, value_input_option)
+
+    def append_row(self, row, value_input_option="RAW"):
+        self.append_rows([row], value_input_option)
+
+    def batch_update(self, data, raw=True):
+        self.spreadsheet.log("batch_update", self.title)
+        for update in data:
+            first_row, first_column, _, _ = parse_a1(update["range"])
+            self.write(first_row, first_column, update["values"], "RAW" if raw else "USER_ENTERED")
+
+    def update_cell(self, row, column, value):
+        self.spreadsheet.log("update_cell", self.title)
+        self.enter(row - 1, column - 1, value, "USER_ENTERED")
+
+    def delete_rows(self, row):
+        self.spreadsheet.log("delete_rows", self.title)
+        del self.rows[row - 1]
+
+    def add_cols(self, count):
+        self.spreadsheet.log("add_cols", self.title)
+
+class FakeSpreadsheet:
+    """In-memory stand-in for a gspread Spreadsheet, logging every request made to it"""
+
+    def __init__(self, sheets):
+        self.requests = []
+        self.sheets = {title: FakeWorksheet(self, sheet_id, title, values)
+                       for sheet_id, (title, values) in enumerate(sheets.items())}
+
+    def log(self, request, title):
+        self.requests.append((request, title))
+
+    def worksheets(self):
+        self.log("worksheets", None)
+        return list(self.sheets.values())
+
+    def by_id(self, sheet_id):
+        return next(worksheet for worksheet in self.sheets.values() if worksheet.id == sheet_id)
+
+    def locate(self, a1_range):
+        title, _, a1 = a1_range.rpartition("!") if "!" in a1_range else (a1_range, "", "")
+        return self.sheets[title.strip("'").replace("''", "'")], parse_a1(a1)
+
+    def read(self, a1_range):
+        worksheet, (first_row, first_column, last_row, last_column) = self.locate(a1_range)
+        rows = [[cell_text(value) for value in row] for row in worksheet.rows]
+        rows = rows[first_row or 0:None if last_row is None else last_row + 1]
+        if first_column is not None:
+            rows = [row[first_column:None if last_column is None else last_column + 1] for row in rows]
+        while rows and not any(rows[-1]):
+            rows.pop()
+        return {"range": a1_range, "values": rows}
+
+    def values_get(self, a1_range):
+        self.log("values_get", a1_range)
+        return self.read(a1_range)
+
+    def values_batch_get(self, ranges):
+        self.log("values_batch_get", tuple(ranges))
+        return {"valueRanges": [self.read(a1_range) for a1_range in ranges]}
+
+    def values_batch_update(self, body):
+        self.log("values_batch_update", body["valueInputOption"])
+        for update in body["data"]:
+            worksheet, (first_row, first_column, _, _) = self.locate(update["range"])
+            worksheet.write(first_row, first_column, update["values"], body["valueInputOption"])
+
+    def batch_update(self, body):
+        self.log("batch_update", tuple(next(iter(request)) for request in body["requests"]))
+        for request in body["requests"]:
+            kind, details = next(iter(request.items()))
+            if kind == "deleteDimension":
+                grid = details["range"]
+                del self.by_id(grid["sheetId"]).rows[grid["startIndex"]:grid["endIndex"]]
+            elif kind in ("updateCells", "appendCells"):
+                worksheet = self.by_id(details["start"]["sheetId"] if kind == "updateCells" else details["sheetId"])
+                first_row = details["start"]["rowIndex"] if kind == "updateCells" else len(worksheet.rows)
+                first_column = details["start"]["columnIndex"] if kind == "updateCells" else 0
+                for row, data in enumerate(details["rows"], start=first_row):
+                    for column, cell in enumerate(data.get("values", []), start=first_column):
+                        value = cell.get("userEnteredValue", {})
+                        if "formulaValue" in value:
+                            worksheet.enter(row, column, Formula(value["formulaValue"]))
+                        else:
+                            worksheet.enter(row, column, next(iter(value.values()), ""))
+            else:
+                raise ValueError(f"Unsupported request {kind}")
+
+    def add_worksheet(self, title, rows, cols):
+        self.log("add_worksheet", title)
+        self.sheets[title] = FakeWorksheet(self, len(self.sheets), title, [])
+        return self.sheets[title]
+
+def sample_sheets():
+    """Cells of a small database with version stamps, as get_all_values returns them"""
+    return {
+        "Recipes": [["Recipe Name", "Instructions", "Notes", "Total Calories", "Total Protein (g)",
+                     "Total Carbohydrates (g)", "Total Fat (g)", "Portion Size (e.g., servings)", "Version"],
+                    ["Oats", "", "", 800, 30, 120, 15, 2, "r1"],
+                    ["Chicken Rice", "", "", 1400, 120, 150, 30, 2, "r2"]],
+        "Ingredients": [["Ingredient Name", "Calories (per 100g)", "Protein (g per 100g)", "Carbohydrates (g per 100g)",
+                         "Fat (g per 100g)", "Unit (e.g., grams, ml, piece)", "Version"],
+                        ["Rice", 130, 2.7, 28, 0.3, "grams", "i1"],
+                        ["Chicken", 165, 31, 0, 3.6, "grams", "i2"]],
+        "Recipe_Ingredients": [["Recipe Name", "Ingredient Name", "Quantity", "Unit (of ingredient, e.g., grams, ml)", "Version"],
+                               ["Chicken Rice", "Rice", 300, "grams", "l1"],
+                               ["Oats", "Rice", 10, "grams", "l2"],
+                               ["Chicken Rice", "Chicken", 200, "grams", "l3"]],
+        "Meal_Plan": [["Date", "Meal Type", "Recipe Name",
+                       "Portion Size (for the meal plan, referring to the recipe's portion size)", "Version"],
+                      ["2024-01-01", "Breakfast", "Oats", 1, "m1"]],
+    }
+
+def qt_app():
+    """The QApplication shared by the tests of Qt objects, drawing nowhere"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+def fake_sheets_manager(sheets=None):
+    """A GoogleSheetsManager working on a FakeSpreadsheet of ``sheets`` (sample_sheets by default)"""
+    from nutrition_core import GoogleSheetsManager
+
+    class FakeSheetsManager(GoogleSheetsManager):
+        def connect(self):
+            self.spreadsheet = FakeSpreadsheet(sample_sheets() if sheets is None else sheets)
+            self.worksheets = {}
+            return True
+
+    return FakeSheetsManager()
+
+def test_headless_core():
+    """Test that the core and CLI load without the GUI libraries"""
+    print("\nTesting headless core...")
+    import subprocess
+    code = ("import sys, nutrition_core, meal_prep_cli; "
+            "print(','.join(m for m in ('PySide6', 'matplotlib') if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert result.returncode == 0
+    assert not result.stdout.strip()
+    print("[OK] nutrition_core and meal_prep_cli import without PySide6 or matplotlib")
+
+def test_daily_totals():
+    """Test daily and calendar totals over the typed tables"""
+    print("\nTesting daily totals...")
+    from datetime import date
+    from nutrition_core import daily_totals, calendar_summary
+    meal_plan, recipes = sample_tables()
+    totals = daily_totals(meal_plan, recipes, date(2024, 1, 1), date(2024, 1, 2))
+    assert totals == {"2024-01-01": [600.0, 22.5, 90.0, 11.25], "2024-01-02": [0.0, 0.0, 0.0, 0.0]}, f"Unexpected daily totals: {totals}"
+    print("[OK] Daily totals calculated")
+
+    summary = calendar_summary(meal_plan, recipes, date(2024, 1, 1), date(2024, 1, 31))
+    assert summary == {date(2024, 1, 1): [1, 600.0]}, f"Unexpected calendar summary: {summary}"
+    print("[OK] Calendar month summarised")
+
+def test_copy_meals():
+    """Test copying a range of meals to later dates"""
+    print("\nTesting meal copies...")
+    from datetime import date
+    from nutrition_core import copy_meals
+    meal_plan, _ = sample_tables()
+    copies = copy_meals(meal_plan, date(2024, 1, 1), date(2024, 1, 7), date(2024, 1, 8), repeat=2, portion_scale=2)
+    assert copies == [["2024-01-08", "Breakfast", "Oats", 3.0], ["2024-01-15", "Breakfast", "Oats", 3.0]], f"Unexpected copied meals: {copies}"
+    print("[OK] Week of meals copied")
+
+def test_nutrient_columns():
+    """Test that a nutrient column added to the sheet is picked up without code changes"""
+    print("\nTesting nutrient columns...")
+    from datetime import date
+    from nutrition_core import daily_totals
+    from nutrition_tables import RecipesTable
+    meal_plan, _ = sample_tables()
+    fiber = RecipesTable.from_records([dict(SAMPLE_RECIPES[0], **{"Total Fiber (g)": 10})])
+    totals = daily_totals(meal_plan, fiber, date(2024, 1, 1), date(2024, 1, 1))
+    assert fiber.nutrients[-1] == "Fiber (g)"
+    assert totals["2024-01-01"] == [600.0, 22.5, 90.0, 11.25, 7.5]
+    print("[OK] Extra nutrient columns totalled")
+
+def test_archive():
+    """Test that archived meals are read together with the meal plan"""
+    print("\nTesting meal archives...")
+    from datetime import date
+    from nutrition_core import archive_cutoff, daily_totals
+    from nutrition_tables import MealPlanTable
+    meal_plan, recipes = sample_tables()
+    archived = MealPlanTable.from_records([dict(SAMPLE_MEALS[0], Date="2023-12-31")])
+    combined = MealPlanTable.concatenate([meal_plan, archived])
+    totals = daily_totals(combined, recipes, date(2023, 12, 31), date(2024, 1, 1))
+    assert archive_cutoff(date(2024, 2, 15), 3) == date(2023, 11, 1)
+    assert totals["2023-12-31"] == totals["2024-01-01"]
+    print("[OK] Archived meals combined with the meal plan")
+
+def test_references():
+    """Test the reverse index used to cascade renames and deletes"""
+    print("\nTesting references...")
+    from nutrition_tables import MealPlanTable
+    meal = SAMPLE_MEALS[0]
+    table = MealPlanTable.from_records([meal, dict(meal, Date="2024-01-02"), dict(meal, **{"Recipe Name": "Salad"})])
+    renamed = table.with_cells({(row, "Recipe Name"): "Porridge" for row in table.rows_with("Recipe Name", "Oats")})
+    assert table.rows_with("Recipe Name", "Oats") == [0, 1]
+    assert list(renamed.removed(2).recipe) == ["Porridge", "Porridge"]
+    print("[OK] References found, renamed and removed")
+
+def test_table_query():
+    """Test filtering and sorting the Recipes tab"""
+    print("\nTesting table filters...")
+    from nutrition_tables import RecipesTable
+    from table_query import TableQuery, parse_filter
+    oats = SAMPLE_RECIPES[0]
+    query = TableQuery(RecipesTable.from_records([oats,
+                                                  dict(oats, **{"Recipe Name": "Chicken Salad", "Total Calories": 450, "Total Protein (g)": 45}),
+                                                  dict(oats, **{"Recipe Name": "Chicken Pie", "Total Calories": 900, "Total Protein (g)": 35})]))
+    matches = query.mask(*parse_filter("chicken protein>=30 kcal<500"))
+    ranked = query.rows(query.mask(*parse_filter("protein=30..50")), "Total Protein (g)", descending=True)
+    assert matches.tolist() == [False, True, False]
+    assert ranked.tolist() == [1, 2, 0]
+    print("[OK] Recipes filtered by words and number ranges and sorted")
+
+def test_table_edits():
+    """Test that edited copies of a table match the table built from the edited rows"""
+    print("\nTesting table edits...")
+    from nutrition_tables import RecipesTable, MealPlanTable
+    recipes = RecipesTable.from_records(CATALOG_RECIPES)
+    recipes.index
+    meals = MealPlanTable.from_records(SAMPLE_MEALS * 3)
+    rows = recipes.rows()
+    renamed = recipes.with_cells({(1, "Recipe Name"): "Rice", (2, "Total Calories"): "350"})
+    appended = recipes.appended([["Soup", 200, 8, 30, 5, 2]])
+    removed = recipes.removed(0, 2)
+    moved = meals.replaced(1, ["2024-02-01", "Dinner", "Oats", "2"])
+    expected = [
+        (renamed, [rows[0], ["Rice"] + rows[1][1:], rows[2][:1] + [350] + rows[2][2:], rows[3]]),
+        (appended, rows + [["Soup", 200, 8, 30, 5, 2]]),
+        (removed, [rows[1], rows[3]]),
+    ]
+    for table, want in expected:
+        assert table.rows() == want
+        assert table.index == RecipesTable(recipes.header, want).index
+    assert renamed.kcal[2] == 350
+    assert moved.day.tolist() == [meals.day[0], moved.date[1].toordinal(), meals.day[2]]
+    assert moved.portion.tolist() == [1.5, 2.0, 1.5]
+    assert recipes.rows() == rows
+    print("[OK] Edited copies parse only the changed rows and match rebuilt tables")
+
+def test_trends():
+    """Test the daily trend series, its moving average and downsampling"""
+    print("\nTesting trends...")
+    from datetime import date
+    import numpy as np
+    from nutrition_tables import MealPlanTable
+    from nutrition_trends import daily_series, moving_average, min_max_indices
+    meal_plan, recipes = sample_tables()
+    combined = MealPlanTable.concatenate([meal_plan, MealPlanTable.from_records([dict(SAMPLE_MEALS[0], Date="2023-12-31")])])
+    first_day, values = daily_series(combined, recipes, date(2023, 1, 1), date(2024, 12, 31))
+    spikes = np.zeros(1000)
+    spikes[[10, 500]] = [5, -5]
+    kept = min_max_indices(spikes, 0, 1000, 50)
+    assert first_day == date(2023, 12, 31)
+    assert values[:, 0].tolist() == [600.0, 600.0]
+    assert moving_average([1, 2, 3, 4], 2).tolist() == [1, 1.5, 2.5, 3.5]
+    assert len(kept) <= 200
+    assert {10, 500} <= set(kept.tolist())
+    print("[OK] Daily trend averaged and downsampled")
+
+def test_data_graph():
+    """Test that changes redraw only the views that read them"""
+    print("\nTesting data graph...")
+    from data_graph import ALL, DataGraph
+    flushes, drawn = [], []
+    graph = DataGraph(flushes.append)
+    graph.derived("Day totals", lambda changes: drawn.append("totals") or len(drawn), {"Meal_Plan": lambda: {1, 2}})
+    graph.view("Dashboard", lambda changes: drawn.append(("dashboard", graph.value("Day totals"))), {"Day totals": ALL})
+    graph.view("Calendar", lambda changes: drawn.append(("calendar", changes)), {"Meal_Plan": ALL, "Recipes": ALL})
+    graph.invalidate("Meal_Plan", [5])
+    graph.invalidate("Meal_Plan", [2])
+    graph.invalidate("Recipes")
+    for flush in flushes:
+        flush()
+    assert len(flushes) == 1
+    assert drawn == ["totals", ("dashboard", 1), ("calendar", {"Meal_Plan": {2, 5}, "Recipes": ALL})]
+    print("[OK] Changes redraw only the views that read them, once per flush")
+
+def test_formula_totals():
+    """Test the Sheets formulas of recipe totals and the recipes marked for them"""
+    print("\nTesting formula totals...")
+    from nutrition_core import total_formulas
+    from nutrition_tables import RecipesTable
+    formulas = total_formulas(["Recipe Name", "Total Calories", "Totals From Ingredients"],
+                              ["Recipe Name", "Ingredient Name", "Quantity"],
+                              ["Ingredient Name", "Calories (per 100g)"])
+    oats = dict(SAMPLE_RECIPES[0], **{"Totals From Ingredients": ""})
+    marked = RecipesTable.from_records([oats, dict(oats, **{"Recipe Name": "Rice", "Totals From Ingredients": "yes"})])
+    formula = formulas.get("Total Calories", "")
+    assert list(formulas) == ["Total Calories"]
+    assert "'Recipe_Ingredients'!$C$2:$C" in formula
+    assert "'Ingredients'!$B$2:$B" in formula
+    assert marked.formula_totals.tolist() == [False, True]
+    print("[OK] Recipe total formulas built for marked recipes")
+
+def test_cli_import():
+    """Test that imported CSV rows are stored as numbers with version stamps"""
+    print("\nTesting CLI import...")
+    import tempfile
+    import meal_prep_cli
+    manager = fake_sheets_manager()
+    with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+        f.write("Ingredient Name,Calories (per 100g),Protein (g per 100g),\"Unit (e.g., grams, ml, piece)\"\n"
+                "Lentils,\"1,116\",9.0,grams\n=Beans,,n/a,grams\n")
+    connect = meal_prep_cli.GoogleSheetsManager
+    meal_prep_cli.GoogleSheetsManager = lambda credentials: manager
+    try:
+        status = meal_prep_cli.main(["import", "Ingredients", f.name])
+    finally:
+        meal_prep_cli.GoogleSheetsManager = connect
+        os.unlink(f.name)
+    rows = manager.spreadsheet.sheets["Ingredients"].rows[-2:]
+    versions = [row[6] for row in rows]
+    assert status == 0
+    assert rows[0][:3] + rows[0][5:6] == ["Lentils", 1116, 9, "grams"]
+    assert rows[1][:3] == ["=Beans", "", "n/a"]
+    assert not isinstance(rows[1][0], Formula)
+    assert all(versions)
+    assert len(set(versions)) == 2
+    print("[OK] Imported numbers stored as numbers, text as text, rows stamped")
+
+def test_http_api():
+    """Test the local HTTP API's status codes and conditional requests"""
+    print("\nTesting HTTP API...")
+    import http.client
+    import threading
+    from http.server import ThreadingHTTPServer
+    from meal_prep_server import NutritionDataCache, NutritionRequestHandler
+    cache = NutritionDataCache(fake_sheets_manager())
+    cache.refresh()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), NutritionRequestHandler)
+    server.cache, server.verbose = cache, False
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        etag = cache.snapshot["etag"]
+
+        def status(path, headers=None):
+            connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+            connection.request("GET", path, headers=headers or {})
+            response = connection.getresponse()
+            response.read()
+            connection.close()
+            return response.status
+
+        statuses = [status("/recipes"), status("/recipes", {"If-None-Match": etag}),
+                    status("/nothing", {"If-None-Match": etag}), status("/meals?from=2024-02-01&to=2024-01-01", {"If-None-Match": etag})]
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert statuses == [200, 304, 404, 400], f"Unexpected statuses: {statuses}"
+    print("[OK] Known endpoints answer 304 when unchanged, unknown ones 404 and bad ranges 400")
+
+def test_versioned_writes():
+    """Test compare-and-set row updates against a fake spreadsheet"""
+    print("\nTesting versioned writes...")
+    from nutrition_core import WriteConflict
+    manager = fake_sheets_manager()
+    sheet = manager.spreadsheet.sheets["Ingredients"]
+    ingredients = manager.get_table("Ingredients")
+    row = ingredients.rows()[0]
+    row[1], row[-1] = 140, "i1b"
+    manager.spreadsheet.requests.clear()
+    assert manager.update_row("Ingredients", 2, row, expected_version="i1"), "Update of an unchanged row refused"
+    requests = [request for request, _ in manager.spreadsheet.requests]
+    assert requests == ["cell", "batch_update"]
+    assert sheet.rows[1][:2] == ["Rice", 140]
+    assert sheet.rows[1][-1] == "i1b"
+    print("[OK] Row checked with one read and written with one request")
+
+    # Another device inserted a row above and then changed the row this client is about to write
+    sheet.rows.insert(1, ["Oil", 884, 0, 0, 100, "ml", "i3"])
+    row[1], row[-1] = 150, "i1c"
+    moved = manager.update_row("Ingredients", 2, row, expected_version="i1b")
+    sheet.rows[2][-1] = "elsewhere"
+    try:
+        manager.update_row("Ingredients", 3, row, expected_version="i1c")
+        conflict = False
+    except WriteConflict:
+        conflict = True
+    assert moved
+    assert sheet.rows[2][:2] == ["Rice", 150]
+    assert sheet.rows[1][0] == "Oil"
+    assert conflict
+    print("[OK] Moved rows found by their stamp, changed rows refused")
+
+def test_recipe_line_deletes():
+    """Test that clearing a recipe's lines deletes those lines even after the sheet changed elsewhere"""
+    print("\nTesting recipe line deletes...")
+    from nutrition_core import WriteConflict
+    manager = fake_sheets_manager()
+    sheet = manager.spreadsheet.sheets["Recipe_Ingredients"]
+    lines = manager.get_table("Recipe_Ingredients")
+    versions = [lines.version(row) for row in lines.rows_with("Recipe Name", "Chicken Rice")]
+    # Another device added a line at the top after the lines were loaded here
+    sheet.rows.insert(1, ["Salad", "Chicken", 50, "grams", "l4"])
+    manager.clear_recipe_ingredients("Chicken Rice", versions)
+    left = [row[-1] for row in sheet.rows[1:]]
+    assert left == ["l4", "l2"], f"Wrong lines deleted: {left}"
+
+    sheet.rows[1][-1] = "changed"
+    try:
+        manager.clear_recipe_ingredients("Salad", ["l4"])
+        conflict = False
+    except WriteConflict:
+        conflict = True
+    assert conflict
+    assert len(sheet.rows) == 3
+
+    # Without version stamps the lines are found from a fresh read, not from cached positions
+    unstamped = {name: [row[:-1] for row in values] for name, values in sample_sheets().items()}
+    manager = fake_sheets_manager(unstamped)
+    manager.get_table("Recipe_Ingredients")
+    sheet = manager.spreadsheet.sheets["Recipe_Ingredients"]
+    sheet.rows.insert(1, ["Salad", "Chicken", 50, "grams"])
+    manager.clear_recipe_ingredients("Chicken Rice")
+    assert [row[0] for row in sheet.rows[1:]] == ["Salad", "Oats"], f"Unstamped lines deleted at stale positions: {sheet.rows}"
+    print("[OK] Lines deleted by stamp or fresh read, changed lines refused")
+
+def test_formula_cells():
+    """Test that only the total formulas of marked recipes are entered as formulas"""
+    print("\nTesting formula and plain cells...")
+    from datetime import date
+    from nutrition_core import MEAL_PLAN_ARCHIVE_PREFIX
+    sheets = sample_sheets()
+    sheets["Recipes"] = [row + [value] for row, value in zip(sheets["Recipes"], ["Totals From Ingredients", "", ""])]
+    sheets["Meal_Plan"].append(["2023-01-05", "Lunch", "+1", 1, "m2"])
+    manager = fake_sheets_manager(sheets)
+    manager.add_rows("Recipes", [["=Oats", "", "", 0, 0, 0, 0, 1, "v1", "yes"], ["+1", "", "", 5, 0, 0, 0, 1, "v2", ""]])
+    manager.rename_with_references("Recipes", 2, ["-2", "", "", 800, 30, 120, 15, 2, "v3", ""], {}, expected_version="r1")
+    manager.archive_meal_plan(date(2024, 1, 1))
+    spreadsheet = manager.spreadsheet
+    recipes = spreadsheet.sheets["Recipes"].rows
+    archive = next(worksheet.rows for title, worksheet in spreadsheet.sheets.items()
+                   if title.startswith(MEAL_PLAN_ARCHIVE_PREFIX))
+    assert recipes[3][0] == "=Oats"
+    assert not isinstance(recipes[3][0], Formula)
+    assert isinstance(recipes[3][3], Formula)
+    assert recipes[4][:4] == ["+1", "", "", 5]
+    assert recipes[1][0] == "-2"
+    assert archive[-1][:3] == ["2023-01-05", "Lunch", "+1"]
+    print("[OK] Total formulas entered as formulas, names and archived meals as they are")
+
+def test_recipe_line_saves():
+    """Test that a recipe's lines and totals are saved as one optimistic write"""
+    print("\nTesting recipe line saves...")
+    from nutrition_meal_planner_final import OptimisticWriter
+    app = qt_app()
+    manager = fake_sheets_manager()
+    writer = OptimisticWriter(manager)
+    changes, conflicts = [], []
+    writer.changed.connect(lambda sheet_name, keys: changes.append((sheet_name, keys)))
+    writer.write_conflict.connect(conflicts.append)
+
+    def save(quantity, calories):
+        recipe = manager.get_table("Recipes").rows()[1]
+        recipe[3] = calories
+        writer.replace_recipe_lines("Chicken Rice", [["Chicken Rice", "Chicken", quantity, "grams"]], recipe, "Saving")
+        local = manager.get_table("Recipe_Ingredients").rows()
+        writer.pool.waitForDone()
+        app.processEvents()
+        return local
+
+    manager.get_table("Recipe_Ingredients")
+    manager.spreadsheet.requests.clear()
+    local = save(250, 412)
+    sheets = manager.spreadsheet.sheets
+    writes = [request for request in manager.spreadsheet.requests if request[0] == "batch_update"]
+    assert len(writes) == 1
+    assert [row[:3] for row in local] == [["Oats", "Rice", 10], ["Chicken Rice", "Chicken", 250]]
+    assert [row[:3] for row in sheets["Recipe_Ingredients"].rows[1:]] == [["Oats", "Rice", 10], ["Chicken Rice", "Chicken", 250]]
+    assert sheets["Recipes"].rows[2][3] == 412
+    assert changes == [("Recipe_Ingredients", {"Chicken Rice"}), ("Recipes", {"Chicken Rice"})]
+    print("[OK] Lines and totals applied locally, announced and written with one request")
+
+    # The line was changed on another device before this save reached Sheets
+    sheets["Recipe_Ingredients"].rows[2][-1] = "elsewhere"
+    changes.clear()
+    local = save(300, 495)
+    after = manager.get_table("Recipe_Ingredients").rows()
+    assert local[-1][2] == 300
+    assert after[-1][2] == 250
+    assert manager.get_table("Recipes").kcal[1] == 412
+    assert conflicts == ["Saving"]
+    assert changes[-2:] == [("Recipe_Ingredients", None), ("Recipes", None)]
+    assert sheets["Recipes"].rows[2][3] == 412
+    print("[OK] Conflicting save rolled back in both sheets")
+
+def test_stream_after_edit():
+    """Test that a sheet download finishing after a local delete doesn't bring the deleted row back"""
+    print("\nTesting streams overtaken by edits...")
+    from nutrition_meal_planner_final import OptimisticWriter
+    app = qt_app()
+    manager = fake_sheets_manager()
+    writer = OptimisticWriter(manager)
+    manager.get_table("Ingredients")
+    chunks = manager.iter_table_chunks("Ingredients", chunk_rows=2)
+    first = next(chunks)[1]
+    writer.delete_row("Ingredients", 2, "Deleting ingredient")
+    writer.pool.waitForDone()
+    app.processEvents()
+    # The rest of the download arrives after the delete was confirmed
+    for _ in chunks:
+        pass
+    names = list(manager.get_table("Ingredients").name)
+    assert [row[0] for row in first] == ["Rice"]
+    assert not manager.pending_writes
+    assert names == ["Chicken"]
+    print("[OK] Download started before a confirmed delete dropped, local table kept")
+
+def test_reference_cascades():
+    """Test that renames and deletes reach the referencing rows where they are now"""
+    print("\nTesting reference cascades...")
+    from nutrition_core import WriteConflict
+    manager = fake_sheets_manager()
+    sheets = manager.spreadsheet.sheets
+    meals = sheets["Meal_Plan"]
+
+    def versions(plan):
+        return {ref_sheet: [manager.get_table(ref_sheet).version(row) for row in sorted({cell if isinstance(cell, int) else cell[0] for cell in rows})]
+                for ref_sheet, rows in plan.items()}
+
+    plan = manager.rename_plan("Recipes", "Oats", "Porridge")
+    read = versions(plan)
+    # Another device planned a meal at the top after the meal plan was loaded here
+    meals.rows.insert(1, ["2024-01-02", "Lunch", "Chicken Rice", 1, "m2"])
+    oats = manager.get_table("Recipes").rows()[0]
+    oats[0] = "Porridge"
+    manager.rename_with_references("Recipes", 2, oats, plan, "r1", "Oats", read)
+    assert [row[2] for row in meals.rows[1:]] == ["Chicken Rice", "Porridge"]
+    assert [row[0] for row in sheets["Recipe_Ingredients"].rows[1:]] == ["Chicken Rice", "Porridge", "Chicken Rice"]
+
+    plan = manager.delete_plan("Recipes", "Chicken Rice")
+    read = versions(plan)
+    meals.rows.insert(1, ["2024-01-03", "Dinner", "Porridge", 1, "m3"])
+    manager.delete_with_references("Recipes", 3, plan, "r2", "Chicken Rice", read)
+    assert [row[-1] for row in meals.rows[1:]] == ["m3", meals.rows[2][-1]]
+    assert meals.rows[2][2] == "Porridge"
+    assert [row[0] for row in sheets["Recipe_Ingredients"].rows[1:]] == ["Porridge"]
+
+    # A referencing meal changed on another device makes the cascade a conflict
+    plan = manager.rename_plan("Recipes", "Porridge", "Oats")
+    read = versions(plan)
+    meals.rows[1][-1] = "changed"
+    try:
+        manager.rename_with_references("Recipes", 2, oats, plan, manager.get_table("Recipes").version(0), "Porridge", read)
+        conflict = False
+    except WriteConflict:
+        conflict = True
+    assert conflict
+    assert meals.rows[1][2] == "Porridge"
+    print("[OK] Referencing rows found by stamp, changed ones refused")
+
+def test_recipe_ingredients_dialog():
+    """Test that the ingredients dialog works from the cached tables and keeps a new recipe's totals"""
+    print("\nTesting recipe ingredients dialog...")
+    from PySide6.QtWidgets import QStatusBar, QWidget
+    from nutrition_meal_planner_final import OptimisticWriter, RecipeIngredientsDialog
+    app = qt_app()
+    manager = fake_sheets_manager()
+    for sheet_name in ["Recipes", "Ingredients", "Recipe_Ingredients"]:
+        manager.get_table(sheet_name)
+
+    class Window(QWidget):
+        def __init__(self):
+            super().__init__()
+            self.sheets_manager = manager
+            self.writer = OptimisticWriter(manager)
+            self.food_store = None
+            self.status_bar = QStatusBar(self)
+
+    window = Window()
+    manager.spreadsheet.requests.clear()
+    dialog = RecipeIngredientsDialog(window, "Chicken Rice")
+    assert not manager.spreadsheet.requests
+    assert [line["Ingredient Name"] for line in dialog.recipe_ingredients] == ["Rice", "Chicken"]
+
+    # A recipe that is still being added in the recipe dialog
+    dialog = RecipeIngredientsDialog(window, "Soup", recipe_data={"Recipe Name": "Soup", "Instructions": "Simmer"})
+    dialog.available_list.setCurrentRow(dialog.available_ingredients.index("Chicken"))
+    dialog.get_quantity_input = lambda: (200, True)
+    dialog.get_unit_input = lambda: ("grams", True)
+    dialog.add_ingredient_to_recipe()
+    dialog.save_ingredients()
+    window.writer.pool.waitForDone()
+    app.processEvents()
+    saved = dialog.saved_recipe or {}
+    sheets = manager.spreadsheet.sheets
+    assert saved.get("Total Calories") == 330
+    assert saved.get("Instructions") == "Simmer"
+    assert sheets["Recipe_Ingredients"].rows[-1][:3] == ["Soup", "Chicken", 200]
+    assert len(sheets["Recipes"].rows) == 3
+    print("[OK] Lines read from the cache, a new recipe's totals kept for the recipe dialog")
+
+TESTS = [test_imports, test_google_sheets_manager, test_application_structure, test_auto_plan, test_recommender,
+         test_headless_core, test_daily_totals, test_copy_meals, test_nutrient_columns, test_archive, test_references,
+         test_table_query, test_table_edits, test_trends, test_data_graph, test_formula_totals,
+         test_cli_import, test_http_api, test_versioned_writes,
+         test_recipe_line_deletes, test_formula_cells, test_recipe_line_saves,
+         test_stream_after_edit, test_reference_cascades,
+         test_recipe_ingredients_dialog]
+
+def run(test):
+    """Run one test, printing why it failed: the first tests return False, the others raise"""
+    try:
+        return test() is not False
+    except AssertionError as e:
+        line = traceback.extract_tb(e.__traceback__)[-1]
+        print(f"[FAIL] {test.__name__}, line {line.lineno}: {str(e) or line.line}")
+    except Exception as e:
+        print(f"[FAIL] {test.__name__} error: {e!r}")
+    return False
+
 def main():
     """Run all tests"""
     print("=" * 50)
     print("Nutrition Meal Planner - Test Suite")
     print("=" * 50)
     
-    tests_passed = 0
-    total_tests = 3
-    
-    if test_imports():
-        tests_passed += 1
-    
-    if test_google_sheets_manager():
-        tests_passed += 1
-    
-    if test_application_structure():
-        tests_passed += 1
-    
+    tests_passed = sum(1 for test in TESTS if run(test))
+    total_tests = len(TESTS)
+
     print("\n" + "=" * 50)
     print(f"Tests completed: {tests_passed}/{total_tests} passed")
     
@@ -0,0 +1,127 @@
+"""
+Diagnostics for "the app hangs" reports.
+
+StallWatchdog keeps a heartbeat timer on the Qt event loop and a background
+thread watching it. When the GUI thread stops turning the loop for longer than
+the threshold, the thread logs the GUI thread's Python stack while the stall is
+still in progress, and the heartbeat logs how long it lasted once it ends.
+
+ActionProfiler runs cProfile around whatever the next click or key press
+triggers and saves the statistics, so a slow handler can be pinned down without
+attaching a debugger.
+
+Both write into a ``diagnostics`` directory under the working directory.
+"""
+
+import os
+import re
+import sys
+import time
+import pstats
+import cProfile
+import threading
+import traceback
+from datetime import datetime
+from PySide6.QtCore import QObject, QTimer, QEvent, Signal
+from PySide6.QtWidgets import QApplication, QWidget
+
+DIAGNOSTICS_DIR = "diagnostics"
+STALL_THRESHOLD = 0.5
+
+def diagnostics_path(file_name):
+    os.makedirs(DIAGNOSTICS_DIR, exist_ok=True)
+    return os.path.join(DIAGNOSTICS_DIR, file_name)
+
+class StallWatchdog(QObject):
+    """Logs event-loop stalls longer than ``threshold`` seconds with the GUI thread's stack"""
+
+    def __init__(self, parent=None, threshold=STALL_THRESHOLD, interval=0.1):
+        super().__init__(parent)
+        self.threshold = threshold
+        self.interval = interval
+        self.gui_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.stall_started = None
+        self.lock = threading.Lock()
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.beat)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._monitor, name="stall-watchdog", daemon=True)
+
+    def start(self):
+        self.last_beat = time.monotonic()
+        self.timer.start(int(self.interval * 1000))
+        self._thread.start()
+
+    def stop(self):
+        self.timer.stop()
+        self._stop.set()
+
+    def beat(self):
+        now = time.monotonic()
+        self.last_beat = now
+        if self.stall_started is not None:
+            self.log(f"GUI thread responsive again after {now - self.stall_started:.2f}s")
+            self.stall_started = None
+
+    def _monitor(self):
+        while not self._stop.wait(self.interval / 2):
+            last_beat = self.last_beat
+            # Event-loop latency: how far past its due time the next heartbeat is
+            stalled = time.monotonic() - last_beat - self.interval
+            if stalled > self.threshold and self.stall_started is None:
+                self.stall_started = last_beat
+                frame = sys._current_frames().get(self.gui_thread_id)
+                stack = "".join(traceback.format_stack(frame)) if frame else "  (stack not available)\n"
+                self.log(f"GUI thread stalled for more than {stalled:.2f}s, currently at:\n{stack}")
+
+    def log(self, message):
+        entry = f"{datetime.now():%Y-%m-%d %H:%M:%S} {message}"
+        print(entry, file=sys.stderr)
+        try:
+            with self.lock, open(diagnostics_path("stalls.log"), "a") as f:
+                f.write(entry.rstrip("\n") + "\n")
+        except OSError as e:
+            print(f"Error writing stall log: {e}", file=sys.stderr)
+
+class ActionProfiler(QObject):
+    """Profiles the handler run by the next click or key press.
+
+    Profiling starts when the triggering event arrives and stops when control
+    gets back to an event loop, so a button that opens a dialog is profiled up to
+    the point the dialog is shown.
+    """
+    finished = Signal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.profile = None
+        self.target = ""
+
+    def arm(self):
+        QApplication.instance().installEventFilter(self)
+
+    def eventFilter(self, watched, event):
+        # Input reaches the native window first; wait for the widget it is meant for
+        if not isinstance(watched, QWidget):
+            return False
+        if event.type() == QEvent.MouseButtonRelease or (event.type() == QEvent.KeyPress and not event.isAutoRepeat()):
+            QApplication.instance().removeEventFilter(self)
+            text = watched.text() if hasattr(watched, "text") and callable(watched.text) else ""
+            self.target = f"{type(watched).__name__} {text}".strip()
+            self.profile = cProfile.Profile()
+            QTimer.singleShot(0, self.stop)
+            self.profile.enable()
+        return False
+
+    def stop(self):
+        self.profile.disable()
+        name = re.sub(r"[^A-Za-z0-9]+", "-", self.target).strip("-") or "action"
+        path = diagnostics_path(f"profile-{datetime.now():%Y%m%d-%H%M%S}-{name}")
+        self.profile.dump_stats(path + ".prof")
+        with open(path + ".txt", "w") as f:
+            f.write(f"Profile of {self.target}\n\n")
+            pstats.Stats(self.profile, stream=f).sort_stats("cumulative").print_stats(40)
+        self.profile = None
+        self.finished.emit(path + ".txt")